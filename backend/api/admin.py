@@ -0,0 +1,94 @@
+"""
+Admin endpoints (usage and cost accounting, deployment routing, FAQ bank, degraded mode, retention)
+"""
+from fastapi import APIRouter, HTTPException, Depends, Header, Request
+from typing import Optional
+import hmac
+from services.usage_service import usage_tracker
+from config import settings
+import logging
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+_LOOPBACK_HOSTS = {"127.0.0.1", "::1", "localhost"}
+
+
+def verify_admin_key(request: Request, x_admin_key: Optional[str] = Header(None)):
+    """Require X-Admin-Key when an admin key is configured; otherwise only local clients are allowed"""
+    if settings.admin_api_key:
+        if not x_admin_key or not hmac.compare_digest(x_admin_key, settings.admin_api_key):
+            raise HTTPException(status_code=403, detail="Invalid admin key")
+    elif request.client is None or request.client.host not in _LOOPBACK_HOSTS:
+        raise HTTPException(status_code=403, detail="Admin endpoints are local-only unless ADMIN_API_KEY is set")
+
+
+@router.get("/usage", dependencies=[Depends(verify_admin_key)])
+async def get_usage(top: int = 10):
+    """
+    Token usage and estimated cost by stage, language, day and top conversations
+    """
+    return usage_tracker.summary(top_conversations=top)
+
+
+@router.get("/usage/conversations/{conversation_id}", dependencies=[Depends(verify_admin_key)])
+async def get_conversation_usage(conversation_id: str):
+    """
+    Token usage and estimated cost of one conversation
+    """
+    usage = usage_tracker.conversation_usage(conversation_id)
+    if usage is None:
+        raise HTTPException(status_code=404, detail="No usage recorded for this conversation")
+    return {"conversation_id": conversation_id, **usage}
+
+
+@router.get("/faq", dependencies=[Depends(verify_admin_key)])
+async def get_faq():
+    """
+    FAQ answer bank: size, KB version it was built from and whether it is stale
+    """
+    from services.faq_service import get_faq_bank
+    return get_faq_bank().stats()
+
+
+@router.get("/degradation", dependencies=[Depends(verify_admin_key)])
+async def get_degradation():
+    """
+    Current degradation level and active steps
+    """
+    from services.degradation import degradation
+    return degradation.stats()
+
+
+@router.get("/retention", dependencies=[Depends(verify_admin_key)])
+async def get_retention():
+    """
+    Last retention pass report (what was deleted, archived and reclaimed) and archive size
+    """
+    from services.retention_service import retention
+    return retention.stats()
+
+
+@router.post("/retention/run", dependencies=[Depends(verify_admin_key)])
+async def run_retention():
+    """
+    Run a retention pass now and return its report
+    """
+    from services.retention_service import retention
+    report = await retention.run_now()
+    if "skipped" in report:
+        raise HTTPException(status_code=409, detail=report["skipped"])
+    return report
+
+
+@router.get("/deployments", dependencies=[Depends(verify_admin_key)])
+async def get_deployments():
+    """
+    Load, latency, quota and health of the chat and embedding deployments
+    """
+    from services.llm_router import get_chat_router, get_embedding_router
+    return {
+        "chat": get_chat_router().stats(),
+        "embedding": get_embedding_router().stats()
+    }
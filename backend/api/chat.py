@@ -1,19 +1,33 @@
 """
 Chat endpoint for conversational interface
 """
-from fastapi import APIRouter, HTTPException, Depends
-from models.schemas import ChatRequest, ChatResponse
-from services.rag_service import RAGService
+from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, Request
+from fastapi.responses import StreamingResponse
+from typing import Any, Dict, List
+from models.schemas import ChatRequest, ChatResponse, ChatBatchRequest
 from services.conversation_service import ConversationService
+from services.tts_prerender import get_prerender_queue
+from services.admission import llm_admission, OverloadedError
+from services.coalescing import chat_flights, normalize_query
+from services.metrics import timed, record_stage
+from config import settings
+from ipaddress import ip_address
+import asyncio
+import json
 import logging
+import time
 import uuid
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# Latest messages loaded as history (the prompt uses the last 5, fewer when degraded)
+HISTORY_MESSAGES = 10
+
 
 def get_rag_service():
-    """Dependency to get RAG service"""
+    """Dependency to get RAG service (imported on first use: langchain is slow to load)"""
+    from services.rag_service import RAGService
     return RAGService()
 
 
@@ -22,30 +36,100 @@ def get_conversation_service():
     return ConversationService()
 
 
-@router.post("/", response_model=ChatResponse)
-async def chat(
-    request: ChatRequest,
-    rag_service: RAGService = Depends(get_rag_service),
-    conv_service: ConversationService = Depends(get_conversation_service)
-):
+def _is_trusted_proxy(host: str) -> bool:
+    try:
+        address = ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in settings.trusted_proxy_networks)
+
+
+def get_client_id(http_request: Request) -> str:
     """
-    Main chat endpoint - handles user messages and returns AI responses
+    Client identity for fair queueing: the peer address
+
+    X-Client-Id is honored only from TRUSTED_PROXIES, since any other client
+    could rotate it to get a fresh queue share per request.
     """
-    try:
-        # Generate or use existing conversation ID
-        conversation_id = request.conversation_id or str(uuid.uuid4())
-        
-        # Load conversation history
-        history = conv_service.get_conversation_messages(conversation_id)
-        
-        # Generate response using RAG
-        response = await rag_service.generate_response(
-            query=request.message,
-            history=history,
-            language=request.language
+    if http_request.client is None:
+        return "anonymous"
+    peer = http_request.client.host
+    client_id = http_request.headers.get("x-client-id")
+    if client_id and _is_trusted_proxy(peer):
+        return client_id[:64]
+    return peer
+
+
+def overloaded_exception(error: OverloadedError) -> HTTPException:
+    """429 with Retry-After for a rejected or rate-limited request"""
+    return HTTPException(
+        status_code=429,
+        detail=f"Too many requests ({error.reason}), please retry later",
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+
+async def load_history(conv_service: ConversationService, conversation_id: str) -> List[Dict[str, str]]:
+    """Read the latest conversation history in a worker thread (file I/O)"""
+    with timed("history_load"):
+        return await asyncio.to_thread(
+            conv_service.get_conversation_messages, conversation_id, HISTORY_MESSAGES
         )
-        
-        # Save messages to conversation
+
+
+async def generate(
+    rag_service,
+    request: ChatRequest,
+    conversation_id: str,
+    client_id: str,
+    history,
+    retrieved=None
+) -> Dict[str, Any]:
+    """Generate a response once admitted (raises OverloadedError when overloaded)"""
+    async with llm_admission.admit(client_id):
+        with timed("rag_total"):
+            return await rag_service.generate_response(
+                query=request.message,
+                history=history,
+                language=request.language,
+                conversation_id=conversation_id,
+                retrieved=retrieved
+            )
+
+
+async def generate_shared(
+    rag_service,
+    request: ChatRequest,
+    conversation_id: str,
+    client_id: str,
+    retrieved=None
+) -> Dict[str, Any]:
+    """
+    Generate a response for a history-free request, sharing it with identical in-flight ones
+    
+    Requests with the same normalized message and language wait for the
+    first one's generation instead of starting their own; each caller still
+    persists its own conversation.
+    """
+    started = time.perf_counter()
+    response, shared = await chat_flights.do(
+        (normalize_query(request.message), request.language),
+        lambda: generate(rag_service, request, conversation_id, client_id, [], retrieved)
+    )
+    if shared:
+        record_stage("coalesced_wait", time.perf_counter() - started, started)
+    return response
+
+
+def save_turn(
+    conv_service: ConversationService,
+    conversation_id: str,
+    request: ChatRequest,
+    history: List[Dict[str, str]],
+    answer: str
+):
+    """Persist the user message and the answer; title new conversations (blocking)"""
+    with timed("persist"):
         conv_service.add_message(
             conversation_id=conversation_id,
             role="user",
@@ -56,7 +140,7 @@ async def chat(
         conv_service.add_message(
             conversation_id=conversation_id,
             role="assistant",
-            content=response["answer"],
+            content=answer,
             language=request.language
         )
         
@@ -64,16 +148,151 @@ async def chat(
         if len(history) == 0:
             title = request.message[:50] + ("..." if len(request.message) > 50 else "")
             conv_service.update_conversation_title(conversation_id, title)
+
+
+def chat_response(conversation_id: str, response: Dict[str, Any]) -> ChatResponse:
+    return ChatResponse(
+        message=response["answer"],
+        conversation_id=conversation_id,
+        follow_up_questions=response.get("follow_up_questions", []),
+        sources=response.get("sources", []),
+        links=response.get("links", []),
+        degraded=response.get("degraded", [])
+    )
+
+
+@router.post("/", response_model=ChatResponse)
+async def chat(
+    request: ChatRequest,
+    background_tasks: BackgroundTasks,
+    client_id: str = Depends(get_client_id),
+    rag_service=Depends(get_rag_service),
+    conv_service: ConversationService = Depends(get_conversation_service)
+):
+    """
+    Main chat endpoint - handles user messages and returns AI responses
+    """
+    try:
+        # Generate or use existing conversation ID
+        conversation_id = request.conversation_id or str(uuid.uuid4())
         
-        return ChatResponse(
-            message=response["answer"],
-            conversation_id=conversation_id,
-            follow_up_questions=response.get("follow_up_questions", []),
-            sources=response.get("sources", []),
-            links=response.get("links", [])
-        )
+        if request.conversation_id is None and settings.chat_coalescing_enabled:
+            # New conversation: no history, and identical first questions share one generation
+            history = []
+            response = await generate_shared(rag_service, request, conversation_id, client_id)
+        else:
+            # Load conversation history while the RAG pipeline retrieves context
+            history_task = asyncio.create_task(load_history(conv_service, conversation_id))
+            
+            # Generate response using RAG, once admitted (429 when overloaded)
+            try:
+                response = await generate(rag_service, request, conversation_id, client_id, history_task)
+            except BaseException:
+                history_task.cancel()
+                raise
+            history = await history_task
+        
+        # Save messages to conversation
+        # File and search index writes block: keep them off the event loop
+        await asyncio.to_thread(save_turn, conv_service, conversation_id, request, history, response["answer"])
+        
+        # Speculatively synthesize the answer once the response is sent
+        if settings.tts_prerender_enabled:
+            background_tasks.add_task(
+                get_prerender_queue().submit,
+                conversation_id,
+                response["answer"],
+                request.language
+            )
         
+        return chat_response(conversation_id, response)
+        
+    except OverloadedError as e:
+        raise overloaded_exception(e)
     except Exception as e:
         logger.error(f"Error in chat endpoint: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error processing chat: {str(e)}")
 
+
+@router.post("/batch")
+async def chat_batch(
+    batch: ChatBatchRequest,
+    client_id: str = Depends(get_client_id),
+    rag_service=Depends(get_rag_service),
+    conv_service: ConversationService = Depends(get_conversation_service)
+):
+    """
+    Answer many messages in one request, streamed back as NDJSON as each item completes
+    
+    All queries are embedded in one call and retrieved concurrently; answers
+    are then generated at most CHAT_BATCH_CONCURRENCY at a time, each admitted
+    like a single chat request. Items of the same conversation run in order.
+    Each line is {"index", "status": "ok", "response"} or
+    {"index", "status": "error", "error"} (plus "retry_after" when overloaded).
+    """
+    items = batch.items
+    if len(items) > settings.chat_batch_max_items:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many items (max {settings.chat_batch_max_items} per batch)"
+        )
+    
+    conversation_ids = [item.conversation_id or str(uuid.uuid4()) for item in items]
+    # Items sharing a conversation run sequentially so each sees the previous answer
+    conversations: Dict[str, List[int]] = {}
+    for index, conversation_id in enumerate(conversation_ids):
+        conversations.setdefault(conversation_id, []).append(index)
+    
+    async def stream():
+        results: asyncio.Queue = asyncio.Queue()
+        semaphore = asyncio.Semaphore(settings.chat_batch_concurrency)
+        retrieved = await rag_service.retrieve_batch(
+            [item.message for item in items],
+            [item.language for item in items],
+            conversation_ids
+        )
+        
+        async def answer(index: int):
+            item, conversation_id = items[index], conversation_ids[index]
+            try:
+                async with semaphore:
+                    if item.conversation_id is None and settings.chat_coalescing_enabled:
+                        history = []
+                        response = await generate_shared(
+                            rag_service, item, conversation_id, client_id, retrieved[index]
+                        )
+                    else:
+                        history = await load_history(conv_service, conversation_id)
+                        response = await generate(
+                            rag_service, item, conversation_id, client_id, history, retrieved[index]
+                        )
+                    await asyncio.to_thread(
+                        save_turn, conv_service, conversation_id, item, history, response["answer"]
+                    )
+                line = {
+                    "index": index,
+                    "status": "ok",
+                    "response": chat_response(conversation_id, response).model_dump()
+                }
+            except OverloadedError as e:
+                line = {"index": index, "status": "error", "error": str(e), "retry_after": e.retry_after}
+            except Exception as e:
+                logger.error(f"Error in batch chat item {index}: {str(e)}", exc_info=True)
+                line = {"index": index, "status": "error", "error": f"Error processing chat: {str(e)}"}
+            await results.put(line)
+        
+        async def run_conversation(indexes: List[int]):
+            for index in indexes:
+                await answer(index)
+        
+        tasks = [asyncio.create_task(run_conversation(indexes)) for indexes in conversations.values()]
+        try:
+            for _ in items:
+                yield json.dumps(await results.get(), ensure_ascii=False) + "\n"
+        finally:
+            # Client went away: stop generating
+            for task in tasks:
+                task.cancel()
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
@@ -0,0 +1,129 @@
+"""
+Response compression middleware (brotli / gzip) for JSON payloads
+"""
+import gzip
+import logging
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, fall back to gzip only
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_TYPES = ("application/json",)
+
+
+def _choose_encoding(accept_encoding: str) -> str:
+    """Pick the best supported encoding from an Accept-Encoding header"""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if token:
+            accepted[token.lower()] = q
+
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return ""
+
+
+def _tag_encoded_etag(headers: MutableHeaders, encoding: str):
+    """Append the encoding suffix to a strong ETag"""
+    etag = headers.get("etag")
+    if etag and etag.startswith('"') and etag.endswith('"'):
+        headers["ETag"] = f'{etag[:-1]}-{encoding}"'
+
+
+class CompressionMiddleware:
+    """
+    Compress JSON responses above a size threshold
+
+    Prefers brotli when the `brotli` package is installed, otherwise gzip.
+    Strong ETags get an encoding suffix so each representation keeps a
+    distinct validator (see api.http_cache.etag_matches).
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        encoding = _choose_encoding(request_headers.get("accept-encoding", ""))
+        if not encoding:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Message = {}
+        body_parts = []
+        passthrough = False
+
+        async def send_wrapper(message: Message):
+            nonlocal start_message, passthrough
+
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                content_type = headers.get("content-type", "")
+                if message["status"] == 304:
+                    # Echo the encoded validator if that is what the client cached
+                    if f'-{encoding}"' in request_headers.get("if-none-match", ""):
+                        headers = MutableHeaders(raw=message["headers"])
+                        _tag_encoded_etag(headers, encoding)
+                        headers.add_vary_header("Accept-Encoding")
+                    passthrough = True
+                    await send(message)
+                elif (
+                    message["status"] != 200
+                    or "content-encoding" in headers
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)
+                ):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start_message = message
+                return
+
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body_parts.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+
+            body = b"".join(body_parts)
+            headers = MutableHeaders(raw=start_message["headers"])
+
+            if len(body) >= self.minimum_size:
+                if encoding == "br":
+                    body = brotli.compress(body, quality=self.brotli_quality)
+                else:
+                    body = gzip.compress(body, compresslevel=self.gzip_level)
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(body))
+
+                _tag_encoded_etag(headers, encoding)
+
+            headers.add_vary_header("Accept-Encoding")
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_wrapper)
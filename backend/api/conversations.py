@@ -1,10 +1,16 @@
 """
 Conversation management endpoints
 """
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
-from models.schemas import ConversationSummary, ConversationDetail
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from typing import List, Optional
+from config import settings
+from models.schemas import ConversationSummary, ConversationDetail, ConversationSearchHit
 from services.conversation_service import ConversationService
+from services.metrics import timed
+from services.search_index import get_search_index
+from services.tts_prerender import get_prerender_queue
+from api.http_cache import cached_json_response
+import asyncio
 import logging
 
 router = APIRouter()
@@ -31,19 +37,48 @@ async def list_conversations(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/search", response_model=List[ConversationSearchHit])
+async def search_conversations(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100)
+):
+    """
+    Find conversations by message content, best match first
+
+    Diacritics and case are ignored ("phu quoc" finds "Phú Quốc"); every
+    word must match and the last one may be a prefix.
+    """
+    if not settings.search_enabled:
+        raise HTTPException(status_code=404, detail="Search is disabled")
+    try:
+        # SQLite queries block: run them off the event loop
+        with timed("conversation_search"):
+            return await asyncio.to_thread(get_search_index().search, q, limit)
+    except Exception as e:
+        logger.error(f"Error searching conversations: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/{conversation_id}", response_model=ConversationDetail)
 async def get_conversation(
+    request: Request,
     conversation_id: str,
+    before: Optional[int] = Query(None, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=500),
     conv_service: ConversationService = Depends(get_conversation_service)
 ):
     """
-    Get full conversation detail by ID
+    Get conversation detail by ID, with all messages or a page of them
+
+    `limit` returns the latest messages before position `before` (default:
+    the end); page backwards with `before=first_position` until it is 0.
     """
     try:
-        conversation = conv_service.get_conversation(conversation_id)
+        conversation = conv_service.get_conversation(conversation_id, before=before, limit=limit)
         if not conversation:
             raise HTTPException(status_code=404, detail="Conversation not found")
-        return conversation
+        # Conversations change on every message: always revalidate, never share
+        return cached_json_response(request, conversation, "private, no-cache")
     except HTTPException:
         raise
     except Exception as e:
@@ -63,6 +98,7 @@ async def delete_conversation(
         success = conv_service.delete_conversation(conversation_id)
         if not success:
             raise HTTPException(status_code=404, detail="Conversation not found")
+        get_prerender_queue().cancel(conversation_id)
         return {"message": "Conversation deleted successfully"}
     except HTTPException:
         raise
@@ -1,18 +1,26 @@
 """
 Destination discovery endpoints
 """
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request
 from typing import List, Optional
 from models.schemas import Destination
 from services.destination_service import DestinationService
+from api.http_cache import cached_json_response
+from config import settings
 import logging
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 
+def _cache_control() -> str:
+    """Destinations are public, slowly changing data"""
+    return f"public, max-age={settings.destinations_cache_max_age}"
+
+
 @router.get("/", response_model=List[Destination])
 async def get_destinations(
+    request: Request,
     region: Optional[str] = Query(None, description="Filter by region: north, central, south"),
     type: Optional[str] = Query(None, description="Filter by type: beach, mountain, culture, city"),
     language: str = Query("vi", description="Language: vi or en")
@@ -27,7 +35,7 @@ async def get_destinations(
             destination_type=type,
             language=language
         )
-        return destinations
+        return cached_json_response(request, destinations, _cache_control())
     except Exception as e:
         logger.error(f"Error getting destinations: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
@@ -35,6 +43,7 @@ async def get_destinations(
 
 @router.get("/{destination_id}", response_model=Destination)
 async def get_destination_detail(
+    request: Request,
     destination_id: str,
     language: str = Query("vi", description="Language: vi or en")
 ):
@@ -48,7 +57,7 @@ async def get_destination_detail(
         if not destination:
             raise HTTPException(status_code=404, detail="Destination not found")
             
-        return destination
+        return cached_json_response(request, destination, _cache_control())
     except HTTPException:
         raise
     except Exception as e:
@@ -0,0 +1,210 @@
+"""
+HTTP caching helpers: strong ETags, Cache-Control, conditional requests and byte ranges
+"""
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, Response
+from typing import Any, Dict, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import os
+import re
+
+# Suffixes appended to an ETag by CompressionMiddleware for encoded representations
+ENCODING_ETAG_SUFFIXES = ("-br", "-gzip")
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def make_etag(data: bytes) -> str:
+    """Build a strong ETag from response content"""
+    return f'"{hashlib.md5(data).hexdigest()}"'
+
+
+def etag_from_hash(content_hash: str) -> str:
+    """Build a strong ETag from an existing content hash (e.g. TTS file names)"""
+    return f'"{content_hash}"'
+
+
+def _normalize_etag(tag: str) -> str:
+    """Strip weak prefix and encoding suffix so validators compare by content"""
+    tag = tag.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    tag = tag.strip('"')
+    for suffix in ENCODING_ETAG_SUFFIXES:
+        if tag.endswith(suffix):
+            tag = tag[:-len(suffix)]
+            break
+    return tag
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    Check the request's If-None-Match header against an ETag
+
+    Uses weak comparison as required for If-None-Match, so compressed
+    representations of the same content still revalidate.
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+
+    if header.strip() == "*":
+        return True
+
+    current = _normalize_etag(etag)
+    return any(_normalize_etag(tag) == current for tag in header.split(",") if tag.strip())
+
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    """Build a 304 response carrying the validators"""
+    return Response(
+        status_code=304,
+        headers={"ETag": etag, "Cache-Control": cache_control}
+    )
+
+
+def cached_json_response(
+    request: Request,
+    content: Any,
+    cache_control: str,
+    status_code: int = 200
+) -> Response:
+    """
+    Serialize content to JSON and serve it with an ETag
+
+    Args:
+        request: Incoming request (for If-None-Match)
+        content: Pydantic models, dicts or lists to serialize
+        cache_control: Cache-Control header value
+        status_code: Status code for a full response
+
+    Returns:
+        304 response when the client copy is current, otherwise the JSON body
+    """
+    body = json.dumps(
+        jsonable_encoder(content),
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":")
+    ).encode("utf-8")
+    etag = make_etag(body)
+
+    if etag_matches(request, etag):
+        return not_modified(etag, cache_control)
+
+    return Response(
+        content=body,
+        status_code=status_code,
+        media_type="application/json",
+        headers={"ETag": etag, "Cache-Control": cache_control}
+    )
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range `Range: bytes=...` header
+
+    Returns:
+        Inclusive (start, end) tuple, None when the header is absent or
+        unsupported (multi-range), or raises ValueError when unsatisfiable
+    """
+    if not header:
+        return None
+
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        return None
+
+    start_str, end_str = match.groups()
+    if not start_str and not end_str:
+        return None
+
+    if not start_str:
+        # Suffix range: last N bytes
+        length = int(end_str)
+        if length == 0:
+            raise ValueError("Unsatisfiable range")
+        return max(size - length, 0), size - 1
+
+    start = int(start_str)
+    end = int(end_str) if end_str else size - 1
+    if start >= size or end < start:
+        raise ValueError("Unsatisfiable range")
+
+    return start, min(end, size - 1)
+
+
+def _read_slice(path: str, start: int, length: int) -> bytes:
+    with open(path, 'rb') as f:
+        f.seek(start)
+        return f.read(length)
+
+
+async def file_response(
+    request: Request,
+    path: str,
+    etag: str,
+    media_type: str,
+    cache_control: str,
+    filename: Optional[str] = None
+) -> Response:
+    """
+    Serve a file with ETag validation and single byte-range support
+
+    Full responses are streamed from disk by FileResponse; a range reads
+    only its slice, in a worker thread.
+
+    Args:
+        request: Incoming request (for If-None-Match / Range / If-Range)
+        path: File on disk
+        etag: Strong ETag for the file content
+        media_type: Content-Type of the file
+        cache_control: Cache-Control header value
+        filename: Optional download filename for Content-Disposition
+
+    Returns:
+        304, 206, 416 or 200 response
+
+    Raises:
+        FileNotFoundError when the file does not exist
+    """
+    if etag_matches(request, etag):
+        return not_modified(etag, cache_control)
+
+    stat_result = await asyncio.to_thread(os.stat, path)
+    size = stat_result.st_size
+
+    headers: Dict[str, str] = {
+        "ETag": etag,
+        "Cache-Control": cache_control,
+        "Accept-Ranges": "bytes"
+    }
+    if filename:
+        headers["Content-Disposition"] = f'inline; filename="{filename}"'
+
+    # Ignore Range when If-Range names a different version of the file
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if if_range and _normalize_etag(if_range) != _normalize_etag(etag):
+        range_header = None
+
+    try:
+        byte_range = parse_range(range_header, size)
+    except ValueError:
+        headers["Content-Range"] = f"bytes */{size}"
+        return Response(status_code=416, headers=headers)
+
+    if byte_range is None:
+        return FileResponse(path, media_type=media_type, headers=headers, stat_result=stat_result)
+
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return Response(
+        content=await asyncio.to_thread(_read_slice, path, start, end - start + 1),
+        status_code=206,
+        media_type=media_type,
+        headers=headers
+    )
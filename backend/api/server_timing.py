@@ -0,0 +1,71 @@
+"""
+Request timing middleware: Server-Timing header and per-route latency histograms
+"""
+import time
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from services.metrics import registry, begin_request_timings
+
+request_duration = registry.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route",
+    labels=("method", "route", "status")
+)
+
+
+class ServerTimingMiddleware:
+    """
+    Collect stage timings recorded with `services.metrics.timed` during a
+    request and report them in a `Server-Timing` header, e.g.
+
+        Server-Timing: history_load;dur=2.1;desc="+0.4", retrieval;dur=180.4;desc="+0.5", ..., total;dur=2431.7
+
+    `desc` is the stage's start offset in ms from the request start, so
+    stages that ran concurrently show overlapping intervals.
+
+    The header is sent with the response start, so stages that finish while
+    a streaming body is still being produced only reach the histograms.
+    """
+
+    def __init__(self, app: ASGIApp, allowed_origins=()):
+        self.app = app
+        self.allowed_origins = set(allowed_origins)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        timings = begin_request_timings()
+        origin = Headers(scope=scope).get("origin")
+        status_code = 500
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                entries = [
+                    f'{stage};dur={seconds * 1000:.1f};desc="+{(stage_started - started) * 1000:.1f}"'
+                    for stage, seconds, stage_started in timings
+                ]
+                entries.append(f"total;dur={(time.perf_counter() - started) * 1000:.1f}")
+                headers.append("Server-Timing", ", ".join(entries))
+                # Let the browser Performance API expose the timings cross-origin
+                if origin and origin in self.allowed_origins:
+                    headers.append("Timing-Allow-Origin", origin)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            request_duration.observe(
+                time.perf_counter() - started,
+                method=scope.get("method", ""),
+                route=getattr(route, "path", "unmatched"),
+                status=str(status_code)
+            )
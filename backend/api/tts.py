@@ -1,42 +1,136 @@
 """
 Text-to-Speech endpoint
 """
-from fastapi import APIRouter, HTTPException, Depends
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import Response, StreamingResponse
+from pathlib import Path
 from models.schemas import TTSRequest
-from services.tts_service import TTSService
+from services.tts_service import TTSService, time_to_first_audio_stats
+from services.tts_prerender import get_prerender_queue
+from api.http_cache import etag_from_hash, file_response
+from config import settings
 import logging
+import re
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+_AUDIO_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+
 
 def get_tts_service():
     """Dependency to get TTS service"""
     return TTSService()
 
 
+def _audio_cache_control() -> str:
+    """Audio files are content-addressed (MD5 of text + language) and never change"""
+    return f"public, max-age={settings.audio_cache_max_age}, immutable"
+
+
+async def _speech_response(request: Request, audio_file: str, audio_id: str) -> Response:
+    """Response for freshly requested speech"""
+    return await file_response(
+        request,
+        audio_file,
+        etag=etag_from_hash(audio_id),
+        media_type="audio/mpeg",
+        # POST responses are not reused; the GET URL below is the cacheable one
+        cache_control="no-store",
+        filename="speech.mp3"
+    )
+
+
 @router.post("/")
 async def text_to_speech(
-    request: TTSRequest,
+    request: Request,
+    tts_request: TTSRequest,
     tts_service: TTSService = Depends(get_tts_service)
 ):
     """
     Convert text to speech and return audio file
     """
     try:
-        audio_file = tts_service.generate_speech(
-            text=request.text,
-            language=request.language
-        )
-        
-        return FileResponse(
-            audio_file,
-            media_type="audio/mpeg",
-            filename="speech.mp3"
+        audio_file = await tts_service.generate_speech_async(
+            text=tts_request.text,
+            language=tts_request.language
         )
-        
+
+        audio_id = Path(audio_file).stem
+        get_prerender_queue().record_request(audio_id)
+        try:
+            response = await _speech_response(request, audio_file, audio_id)
+        except FileNotFoundError:
+            # Removed by retention or eviction since the lookup: synthesize it again
+            audio_file = await tts_service.generate_speech_async(
+                text=tts_request.text,
+                language=tts_request.language
+            )
+            response = await _speech_response(request, audio_file, audio_id)
+        # Point clients at the cacheable GET URL for replays
+        response.headers["Content-Location"] = f"/api/tts/audio/{audio_id}"
+        return response
+
     except Exception as e:
         logger.error(f"Error generating speech: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error generating speech: {str(e)}")
 
+
+@router.post("/stream")
+async def text_to_speech_stream(
+    tts_request: TTSRequest,
+    tts_service: TTSService = Depends(get_tts_service)
+):
+    """
+    Stream speech as MP3 segments, sentence by sentence, as each becomes ready
+    """
+    return StreamingResponse(
+        tts_service.stream_speech(
+            text=tts_request.text,
+            language=tts_request.language
+        ),
+        media_type="audio/mpeg",
+        headers={"Cache-Control": "no-store"}
+    )
+
+
+@router.get("/audio/{audio_id}")
+async def get_audio(
+    request: Request,
+    audio_id: str,
+    tts_service: TTSService = Depends(get_tts_service)
+):
+    """
+    Serve previously generated audio by its content hash (supports Range requests)
+    """
+    if not _AUDIO_ID_RE.match(audio_id):
+        raise HTTPException(status_code=404, detail="Audio not found")
+
+    audio_file = tts_service.cache.lookup(audio_id)
+    if not audio_file:
+        raise HTTPException(status_code=404, detail="Audio not found")
+
+    try:
+        return await file_response(
+            request,
+            str(audio_file),
+            etag=etag_from_hash(audio_id),
+            media_type="audio/mpeg",
+            cache_control=_audio_cache_control(),
+            filename="speech.mp3"
+        )
+    except FileNotFoundError:
+        # Expired or evicted since the lookup
+        raise HTTPException(status_code=404, detail="Audio not found")
+
+
+@router.get("/stats")
+async def get_audio_cache_stats(tts_service: TTSService = Depends(get_tts_service)):
+    """
+    Audio cache statistics (size, hit rate, bytes saved, evictions) and streaming latency
+    """
+    return {
+        **tts_service.cache.stats(),
+        "time_to_first_audio": time_to_first_audio_stats(),
+        "prerender": get_prerender_queue().stats()
+    }
@@ -1,28 +1,110 @@
 """
 Configuration settings for the Vietnam Travel Chatbot backend
 """
+from ipaddress import IPv4Network, IPv6Network, ip_network
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import List, Tuple, Union
 
 
 class Settings(BaseSettings):
     """Application settings loaded from environment variables"""
     
-    # Azure OpenAI - LLM
-    azure_openai_llm_api_key: str
-    azure_openai_endpoint: str
+    # Providers: "live" (Azure OpenAI + Pinecone) or "fake" (offline stand-ins)
+    provider_mode: str = "live"
+    
+    # Azure OpenAI - LLM (required in live mode)
+    azure_openai_llm_api_key: str = ""
+    azure_openai_endpoint: str = ""
     azure_openai_deployment_name: str = "gpt-4o-mini"
     azure_openai_api_version: str = "2024-07-01-preview"
     
     # Azure OpenAI - Embeddings
-    azure_openai_embedding_api_key: str
+    azure_openai_embedding_api_key: str = ""
     azure_openai_embedding_deployment: str = "text-embedding-3-small"
     
     # Pinecone
-    pinecone_api_key: str
+    pinecone_api_key: str = ""
     pinecone_environment: str = "gcp-starter"
     pinecone_index_name: str = "vietnam-travel"
     
+    # Deployment routing: JSON arrays of deployments; empty = the single one above. Keys per entry:
+    # name, endpoint, api_key, api_version, deployment, tpm, rpm (fake mode: latency, error_rate)
+    llm_deployments: str = ""
+    embedding_deployments: str = ""
+    llm_routing_strategy: str = "least_outstanding"  # or ewma
+    deployment_eject_after: int = 3  # consecutive transient failures
+    deployment_eject_seconds: float = 10.0  # doubled on each repeated ejection
+    deployment_eject_max_seconds: float = 300.0
+    
+    # Fake providers: latency as "fixed:ms", "uniform:lo,hi", "normal:mean,std"
+    # or "lognormal:median,sigma"; error rates are per call (0..1)
+    fake_llm_latency: str = "lognormal:800,0.5"
+    fake_embedding_latency: str = "lognormal:40,0.3"
+    fake_vector_store_latency: str = "lognormal:60,0.4"
+    fake_tts_latency: str = "lognormal:400,0.4"
+    fake_llm_error_rate: float = 0.0
+    fake_embedding_error_rate: float = 0.0
+    fake_vector_store_error_rate: float = 0.0
+    fake_tts_error_rate: float = 0.0
+    fake_error_status: int = 429
+    fake_seed: int = 42
+    
+    # Admission control for chat requests (LLM-bound)
+    llm_max_concurrency: int = 8  # chat requests calling providers at once
+    llm_queue_size: int = 32  # waiting requests before fast 429s
+    llm_queue_per_client: int = 4  # waiting requests per client (clients are keyed by peer address)
+    trusted_proxies: str = ""  # comma-separated IPs/CIDRs whose X-Client-Id header is honored
+    llm_queue_timeout: float = 10.0  # seconds before a queued request gets 429
+    chat_batch_max_items: int = 100  # per POST /api/chat/batch
+    chat_batch_concurrency: int = 4  # items of one batch generating at once
+    chat_coalescing_enabled: bool = True  # identical in-flight first questions share one generation
+    
+    # Provider call policy: per-stage deadlines (seconds), retries and hedging
+    retrieval_timeout: float = 5.0
+    llm_answer_timeout: float = 30.0
+    llm_follow_ups_timeout: float = 10.0
+    provider_max_retries: int = 2  # transient errors (429/5xx/timeouts) only
+    provider_attempt_timeout_ratio: float = 0.5  # share of the stage budget one attempt may use while retries remain
+    provider_retry_base_delay: float = 0.2  # seconds, doubled per retry, full jitter
+    provider_retry_max_delay: float = 2.0
+    hedging_enabled: bool = False  # duplicate calls slower than the stage p95
+    hedge_stages: str = "retrieval,llm_answer,llm_follow_ups"
+    hedge_max_ratio: float = 0.05  # hedges per call, at most
+    hedge_min_delay: float = 0.2  # seconds
+    
+    # Intent routing: skip retrieval / follow-ups for small talk (scripts/train_intent_router.py)
+    intent_routing_enabled: bool = True
+    intent_min_confidence: float = 0.8  # less certain model predictions are treated as travel questions
+    
+    # FAQ answer bank (scripts/build_faq_bank.py): canonical questions answered without the LLM
+    faq_enabled: bool = True
+    faq_bank_file: str = "data/faq_bank.json"
+    faq_lexical_threshold: float = 0.8  # word overlap (Jaccard) with a stored question
+    faq_embedding_threshold: float = 0.92  # cosine similarity with a stored question
+    
+    # Degraded mode: while answers breach the latency / error SLO, step by step skip follow-ups,
+    # reduce k, shorten history, cap max_tokens, then serve FAQ bank answers only
+    degradation_enabled: bool = True
+    slo_p95_seconds: float = 8.0
+    slo_error_rate: float = 0.05
+    slo_window_seconds: float = 60.0
+    slo_min_samples: int = 20  # answers observed before a level change
+    slo_evaluation_interval: float = 10.0  # seconds between level changes
+    slo_recovery_ratio: float = 0.6  # step down below this fraction of both targets
+    degraded_k: int = 2
+    degraded_history_messages: int = 2
+    degraded_max_tokens: int = 300
+    
+    # Retrieval (compare settings with scripts/benchmark_retrieval.py)
+    retrieval_k: int = 4
+    chunk_size: int = 1000  # characters; changing it requires re-running setup_pinecone.py
+    chunk_overlap: int = 200
+    
+    # Readiness (/health/ready): dependency re-check interval and optional warm-up queries
+    # run before the worker reports ready, "|"-separated with an optional "vi:"/"en:" prefix
+    readiness_check_interval: int = 30  # seconds
+    readiness_warmup_queries: str = ""
+    
     # Application
     debug: bool = True
     cors_origins: str = "http://localhost:3000,http://localhost:3001"
@@ -32,10 +114,77 @@ class Settings(BaseSettings):
     audio_dir: str = "data/audio"
     mock_data_dir: str = "data/mock"
     
+    # Conversation search (inverted index of message content, kept in SQLite)
+    search_enabled: bool = True
+    search_index_file: str = "data/search_index.db"
+    search_snippet_chars: int = 160
+    search_max_candidates: int = 2000  # most recent matching messages ranked per query
+    
+    # Retention & compaction pass (background, paced; 0 disables a rule)
+    retention_enabled: bool = True
+    retention_interval: int = 3600  # seconds between passes
+    retention_empty_conversation_hours: int = 24  # delete untouched empty "New Conversation" files
+    retention_archive_after_days: int = 90  # move idle conversations into zip bundles
+    retention_audio_days: int = 0  # delete audio not played for this long (the size budget still applies)
+    retention_max_files_per_second: float = 20.0
+    retention_max_files_per_run: int = 5000
+    
+    # Text-to-Speech
+    tts_max_workers: int = 4  # concurrent gTTS syntheses per worker
+    audio_cache_max_bytes: int = 500 * 1024 * 1024
+    audio_cache_policy: str = "lru"  # lru or lfu
+    audio_cache_janitor_interval: int = 300  # seconds
+    tts_stream_prefetch: int = 3  # segments synthesized ahead while streaming
+    tts_stream_min_chunk_chars: int = 40  # shorter sentences merge into the next
+    tts_prerender_enabled: bool = False  # synthesize answers before play is clicked
+    tts_prerender_queue_size: int = 100
+    tts_prerender_backoff: float = 0.5  # seconds to wait while the TTS pool is busy
+    
+    # Token pricing (USD per 1K tokens) and budgets (0 = no alert)
+    llm_prompt_price_per_1k: float = 0.00015
+    llm_completion_price_per_1k: float = 0.0006
+    embedding_price_per_1k: float = 0.00002
+    daily_budget_usd: float = 0.0
+    conversation_budget_usd: float = 0.0
+    admin_api_key: str = ""  # required as X-Admin-Key for /api/admin when set; unset = localhost only
+    
+    # HTTP caching & compression
+    destinations_cache_max_age: int = 300  # seconds
+    audio_cache_max_age: int = 31536000  # seconds; audio is content-addressed
+    compression_min_size: int = 1024  # bytes
+    
     class Config:
         env_file = ".env"
         case_sensitive = False
     
+    @property
+    def use_fake_providers(self) -> bool:
+        """Whether offline fake providers replace Azure OpenAI and Pinecone"""
+        return self.provider_mode.lower() == "fake"
+    
+    @property
+    def hedge_stages_list(self) -> List[str]:
+        """Stages that may be hedged"""
+        return [stage.strip() for stage in self.hedge_stages.split(",") if stage.strip()]
+    
+    @property
+    def readiness_warmup_list(self) -> List[Tuple[str, str]]:
+        """Warm-up queries as (language, query) pairs; language defaults to vi"""
+        queries = []
+        for item in self.readiness_warmup_queries.split("|"):
+            item = item.strip()
+            language = "vi"
+            if item[:3] in ("vi:", "en:"):
+                language, item = item[:2], item[3:].strip()
+            if item:
+                queries.append((language, item))
+        return queries
+    
+    @property
+    def trusted_proxy_networks(self) -> List[Union[IPv4Network, IPv6Network]]:
+        """Parse TRUSTED_PROXIES as networks (a bare IP is a single-address network)"""
+        return [ip_network(item.strip(), strict=False) for item in self.trusted_proxies.split(",") if item.strip()]
+    
     @property
     def cors_origins_list(self) -> List[str]:
         """Parse CORS origins as list"""
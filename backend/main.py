@@ -1,14 +1,25 @@
 """
 Main FastAPI application for Vietnam Travel Chatbot
 """
+from services import startup  # first: starts the cold-start clock
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
+import asyncio
 import logging
 from pathlib import Path
 
 from config import settings
-from api import chat, conversations, tts, destinations
+from api import chat, conversations, tts, destinations, admin
+from api.compression import CompressionMiddleware
+from api.server_timing import ServerTimingMiddleware
+from services.audio_cache import get_audio_cache
+from services.conversation_service import ConversationService
+from services.search_index import get_search_index
+from services.retention_service import retention
+from services.tts_prerender import get_prerender_queue
+from services.metrics import registry
 
 # Configure logging
 logging.basicConfig(
@@ -17,13 +28,42 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start background maintenance tasks and stop them on shutdown"""
+    audio_cache = get_audio_cache()
+    tasks = [
+        asyncio.create_task(audio_cache.run_janitor(settings.audio_cache_janitor_interval))
+    ]
+    if settings.tts_prerender_enabled:
+        tasks.append(asyncio.create_task(get_prerender_queue().run_worker()))
+    if settings.retention_enabled:
+        tasks.append(asyncio.create_task(retention.run_scheduler(settings.retention_interval)))
+    if settings.search_enabled:
+        # Index conversations stored before the search index existed
+        tasks.append(asyncio.create_task(
+            asyncio.to_thread(get_search_index().ensure_built, ConversationService().iter_conversations())
+        ))
+    # Connect providers in the background so the worker serves /health immediately
+    tasks.append(asyncio.create_task(startup.initialize()))
+    startup.record_serving()
+    
+    yield
+    
+    for task in tasks:
+        task.cancel()
+    audio_cache.flush()
+
+
 # Create FastAPI app
 app = FastAPI(
     title="Vietnam Travel Chatbot API",
     description="RAG-based chatbot for Vietnam travel information",
     version="2.0.0",
     docs_url="/docs" if settings.debug else None,
-    redoc_url="/redoc" if settings.debug else None
+    redoc_url="/redoc" if settings.debug else None,
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -33,8 +73,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Content-Range", "Content-Location", "Server-Timing", "Retry-After"],
 )
 
+# Per-stage timings in a Server-Timing header and latency histograms
+app.add_middleware(ServerTimingMiddleware, allowed_origins=settings.cors_origins_list)
+
+# Compress JSON responses above the configured size
+app.add_middleware(CompressionMiddleware, minimum_size=settings.compression_min_size)
+
 # Create necessary directories
 Path(settings.conversations_dir).mkdir(parents=True, exist_ok=True)
 Path(settings.audio_dir).mkdir(parents=True, exist_ok=True)
@@ -45,6 +92,7 @@ app.include_router(chat.router, prefix="/api/chat", tags=["chat"])
 app.include_router(conversations.router, prefix="/api/conversations", tags=["conversations"])
 app.include_router(tts.router, prefix="/api/tts", tags=["tts"])
 app.include_router(destinations.router, prefix="/api/destinations", tags=["destinations"])
+app.include_router(admin.router, prefix="/api/admin", tags=["admin"])
 
 
 @app.get("/")
@@ -59,13 +107,42 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
+    """Health check endpoint (no dependency calls; `ready` reports background initialization)"""
     return {
         "status": "healthy",
+        "ready": startup.readiness.ready,
         "debug": settings.debug
     }
 
 
+@app.get("/health/live")
+async def liveness():
+    """Liveness probe: the process is up and serving requests"""
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+async def readiness():
+    """Readiness probe: 503 until every dependency is verified, with per-dependency latency"""
+    ready = startup.readiness.ready
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else "not_ready",
+            "dependencies": startup.readiness.snapshot()
+        }
+    )
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics endpoint"""
+    return PlainTextResponse(
+        registry.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
     """Global exception handler"""
@@ -27,6 +27,12 @@ class ChatResponse(BaseModel):
     follow_up_questions: List[str] = []
     sources: List[dict] = []
     links: List[dict] = []
+    degraded: List[str] = []  # degradation steps applied (services.degradation)
+
+
+class ChatBatchRequest(BaseModel):
+    """Request for batch chat endpoint"""
+    items: List[ChatRequest] = Field(..., min_length=1)
 
 
 class ConversationSummary(BaseModel):
@@ -47,6 +53,19 @@ class ConversationDetail(BaseModel):
     created_at: datetime
     updated_at: datetime
     language: str
+    message_count: int = 0  # messages in the conversation, returned or not
+    first_position: int = 0  # position of messages[0]; pass as `before` for the previous page
+
+
+class ConversationSearchHit(BaseModel):
+    """Best-matching message of a conversation for a search query"""
+    conversation_id: str
+    title: str
+    position: int  # index of the message in the conversation
+    role: str
+    timestamp: Optional[datetime] = None
+    snippet: str  # matched words in **bold**
+    score: float
 
 
 class TTSRequest(BaseModel):
@@ -0,0 +1,289 @@
+"""
+End-to-end load and latency benchmark for the FastAPI app
+
+Drives the real `main:app` in-process (no network) with offline provider
+stand-ins (PROVIDER_MODE=fake). Each virtual user plays whole conversations:
+several chat turns, then reads the conversation, the conversation list and
+destinations, and synthesizes the last answer. Reports RPS and latency
+percentiles per endpoint plus event-loop lag, and saves them as JSON.
+
+Usage:
+    python scripts/benchmark_load.py                                  # 10 users, 50 conversations of 3 turns
+    python scripts/benchmark_load.py --users 50 --conversations 200 --turns 5
+    python scripts/benchmark_load.py --llm-latency fixed:200 --output results/main.json
+    python scripts/benchmark_load.py --compare results/main.json      # diff against a previous run
+"""
+import sys
+import os
+import json
+import time
+import random
+import asyncio
+import argparse
+import platform
+import subprocess
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+QUESTIONS = {
+    "vi": [
+        "Giới thiệu về Vịnh Hạ Long",
+        "Nên ăn gì ở Hà Nội?",
+        "Lịch trình 3 ngày ở Đà Nẵng",
+        "Thời điểm nào đẹp nhất để đi Sapa?",
+        "Chi phí du lịch Phú Quốc khoảng bao nhiêu?",
+        "Có những món đặc sản nào ở Huế?",
+    ],
+    "en": [
+        "Tell me about Ha Long Bay",
+        "What should I eat in Hanoi?",
+        "Plan a 3-day trip to Da Nang",
+        "When is the best time to visit Sapa?",
+        "How much does a trip to Phu Quoc cost?",
+        "Which dishes is Hue famous for?",
+    ],
+}
+
+LAG_INTERVAL = 0.01  # seconds between event-loop lag probes
+
+
+def percentile(sorted_samples: List[float], q: float) -> float:
+    """Nearest-rank percentile of pre-sorted samples"""
+    if not sorted_samples:
+        return 0.0
+    return sorted_samples[min(len(sorted_samples) - 1, int(q * len(sorted_samples)))]
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Latency summary in milliseconds"""
+    ordered = sorted(samples)
+    return {
+        "p50_ms": percentile(ordered, 0.50) * 1000,
+        "p95_ms": percentile(ordered, 0.95) * 1000,
+        "p99_ms": percentile(ordered, 0.99) * 1000,
+        "max_ms": (ordered[-1] if ordered else 0.0) * 1000,
+        "mean_ms": (sum(ordered) / len(ordered) if ordered else 0.0) * 1000,
+    }
+
+
+class Recorder:
+    """Latencies and error counts per endpoint"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+
+    async def call(self, client, name: str, method: str, url: str, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            ok = response.status_code < 400
+        except Exception:
+            response, ok = None, False
+        self.latencies.setdefault(name, []).append(time.perf_counter() - started)
+        if not ok:
+            self.errors[name] = self.errors.get(name, 0) + 1
+        return response if ok else None
+
+
+async def monitor_event_loop(samples: List[float], stop: asyncio.Event):
+    """Measure how late the loop wakes up a sleeping task"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(LAG_INTERVAL)
+        samples.append(max(0.0, time.perf_counter() - started - LAG_INTERVAL))
+
+
+async def run_conversation(client, recorder: Recorder, rng: random.Random, turns: int):
+    """One conversation: chat turns, then the reads a client does around it"""
+    language = rng.choice(("vi", "en"))
+    conversation_id = None
+    answer = None
+
+    for _ in range(turns):
+        payload = {"message": rng.choice(QUESTIONS[language]), "language": language}
+        if conversation_id:
+            payload["conversation_id"] = conversation_id
+        response = await recorder.call(client, "POST /api/chat", "POST", "/api/chat/", json=payload)
+        if response is None:
+            return
+        body = response.json()
+        conversation_id = body["conversation_id"]
+        answer = body["message"]
+
+    await recorder.call(
+        client, "GET /api/conversations/{id}", "GET", f"/api/conversations/{conversation_id}"
+    )
+    await recorder.call(client, "GET /api/conversations", "GET", "/api/conversations/")
+    await recorder.call(
+        client, "GET /api/destinations", "GET", "/api/destinations/", params={"language": language}
+    )
+    await recorder.call(
+        client, "POST /api/tts", "POST", "/api/tts/", json={"text": answer, "language": language}
+    )
+
+
+async def run_benchmark(args) -> Dict:
+    import httpx
+    from main import app
+    from config import settings
+
+    recorder = Recorder()
+    lag_samples: List[float] = []
+    remaining = list(range(args.conversations))
+
+    async def virtual_user(user_id: int, client):
+        rng = random.Random(args.seed * 1000 + user_id)
+        while remaining:
+            remaining.pop()
+            await run_conversation(client, recorder, rng, args.turns)
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            stop = asyncio.Event()
+            monitor = asyncio.create_task(monitor_event_loop(lag_samples, stop))
+            started = time.perf_counter()
+            await asyncio.gather(*(virtual_user(i, client) for i in range(args.users)))
+            elapsed = time.perf_counter() - started
+            stop.set()
+            await monitor
+
+    endpoints = {}
+    for name, samples in sorted(recorder.latencies.items()):
+        endpoints[name] = {
+            "requests": len(samples),
+            "errors": recorder.errors.get(name, 0),
+            "rps": len(samples) / elapsed,
+            **summarize(samples)
+        }
+    all_samples = [sample for samples in recorder.latencies.values() for sample in samples]
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "provider_mode": settings.provider_mode,
+            "users": args.users,
+            "conversations": args.conversations,
+            "turns": args.turns,
+            "seed": args.seed,
+            "fake_latency": {
+                "llm": settings.fake_llm_latency,
+                "embedding": settings.fake_embedding_latency,
+                "vector_store": settings.fake_vector_store_latency,
+                "tts": settings.fake_tts_latency,
+            },
+        },
+        "duration_seconds": elapsed,
+        "total": {
+            "requests": len(all_samples),
+            "errors": sum(recorder.errors.values()),
+            "rps": len(all_samples) / elapsed,
+            **summarize(all_samples)
+        },
+        "endpoints": endpoints,
+        "event_loop_lag": {"samples": len(lag_samples), **summarize(lag_samples)},
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return "unknown"
+
+
+def print_report(results: Dict, baseline: Dict = None):
+    """Print per-endpoint results, with deltas against a baseline if given"""
+    meta = results["meta"]
+    print(f"\ncommit {meta['commit']}  users={meta['users']} conversations={meta['conversations']} "
+          f"turns={meta['turns']}  duration={results['duration_seconds']:.1f}s")
+
+    def delta(section: str, name: str, key: str) -> str:
+        if not baseline:
+            return ""
+        previous = baseline.get(section, {})
+        previous = previous.get(name, {}) if section == "endpoints" else previous
+        if not previous.get(key):
+            return ""
+        current = results[section][name][key] if section == "endpoints" else results[section][key]
+        return f" ({(current - previous[key]) / previous[key] * 100:+.0f}%)"
+
+    print(f"\n{'endpoint':<30} {'reqs':>6} {'err':>4} {'rps':>14} {'p50 ms':>16} {'p95 ms':>16} {'p99 ms':>16}")
+    for name, stats in results["endpoints"].items():
+        print(
+            f"{name:<30} {stats['requests']:>6} {stats['errors']:>4} "
+            f"{stats['rps']:>7.1f}{delta('endpoints', name, 'rps'):>7} "
+            f"{stats['p50_ms']:>8.1f}{delta('endpoints', name, 'p50_ms'):>8} "
+            f"{stats['p95_ms']:>8.1f}{delta('endpoints', name, 'p95_ms'):>8} "
+            f"{stats['p99_ms']:>8.1f}{delta('endpoints', name, 'p99_ms'):>8}"
+        )
+    total = results["total"]
+    print(f"{'total':<30} {total['requests']:>6} {total['errors']:>4} "
+          f"{total['rps']:>7.1f}{delta('total', '', 'rps'):>7}")
+
+    lag = results["event_loop_lag"]
+    print(
+        f"\nevent-loop lag: p50 {lag['p50_ms']:.1f}ms{delta('event_loop_lag', '', 'p50_ms')}  "
+        f"p99 {lag['p99_ms']:.1f}ms{delta('event_loop_lag', '', 'p99_ms')}  max {lag['max_ms']:.1f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end load benchmark for the chatbot API")
+    parser.add_argument("--users", type=int, default=10, help="concurrent virtual users")
+    parser.add_argument("--conversations", type=int, default=50, help="total conversations to play")
+    parser.add_argument("--turns", type=int, default=3, help="chat turns per conversation")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--llm-latency", help="override FAKE_LLM_LATENCY, e.g. fixed:200")
+    parser.add_argument("--tts-latency", help="override FAKE_TTS_LATENCY")
+    parser.add_argument("--live", action="store_true", help="use the providers configured in .env instead of fakes")
+    parser.add_argument("--keep-data", action="store_true",
+                        help="write conversations/audio/search index to the configured paths instead of a temp dir")
+    parser.add_argument("--output", help="write results JSON to this path")
+    parser.add_argument("--compare", help="baseline results JSON to diff against")
+    args = parser.parse_args()
+
+    # Settings are read at import time: configure the environment first
+    if not args.live:
+        os.environ["PROVIDER_MODE"] = "fake"
+    if args.llm_latency:
+        os.environ["FAKE_LLM_LATENCY"] = args.llm_latency
+    if args.tts_latency:
+        os.environ["FAKE_TTS_LATENCY"] = args.tts_latency
+    if not args.keep_data:
+        data_dir = Path(tempfile.mkdtemp(prefix="benchmark_load_"))
+        os.environ["CONVERSATIONS_DIR"] = str(data_dir / "conversations")
+        os.environ["AUDIO_DIR"] = str(data_dir / "audio")
+        os.environ["SEARCH_INDEX_FILE"] = str(data_dir / "search_index.db")
+
+    import logging
+    logging.disable(logging.INFO)
+
+    results = asyncio.run(run_benchmark(args))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+
+    if args.output:
+        output = Path(args.output)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
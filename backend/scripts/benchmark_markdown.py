@@ -0,0 +1,114 @@
+"""
+Golden-output check and micro-benchmark for the TTS markdown stripper
+
+Usage:
+    python scripts/benchmark_markdown.py            # check golden outputs, then benchmark
+    python scripts/benchmark_markdown.py --check    # golden outputs only (exit 1 on mismatch)
+"""
+import sys
+import json
+import re
+import argparse
+import timeit
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from services.markdown_stripper import strip_markdown
+
+GOLDEN_FILE = Path(__file__).parent.parent / "data" / "mock" / "markdown_golden.json"
+
+
+def legacy_strip_markdown(text: str) -> str:
+    """Previous multi-pass implementation, kept as the benchmark baseline"""
+    text = re.sub(r'```[\s\S]*?```', '', text)
+    text = re.sub(r'`([^`]+)`', r'\1', text)
+    text = re.sub(r'!\[([^\]]*)\]\([^\)]+\)', r'\1', text)
+    text = re.sub(r'\[([^\]]+)\]\([^\)]+\)', r'\1', text)
+    text = re.sub(r'\*\*([^\*]+)\*\*', r'\1', text)
+    text = re.sub(r'__([^_]+)__', r'\1', text)
+    text = re.sub(r'\*([^\*]+)\*', r'\1', text)
+    text = re.sub(r'_([^_]+)_', r'\1', text)
+    text = re.sub(r'~~([^~]+)~~', r'\1', text)
+    text = re.sub(r'^#{1,6}\s+', '', text, flags=re.MULTILINE)
+    text = re.sub(r'^[\-\*_]{3,}\s*$', '', text, flags=re.MULTILINE)
+    text = re.sub(r'^>\s+', '', text, flags=re.MULTILINE)
+    text = re.sub(r'^[\-\*\+]\s+', '', text, flags=re.MULTILINE)
+    text = re.sub(r'^\d+\.\s+', '', text, flags=re.MULTILINE)
+    text = re.sub(r'<[^>]+>', '', text)
+    text = re.sub(r'\n{3,}', '\n\n', text)
+    text = re.sub(r' {2,}', ' ', text)
+    return text.strip()
+
+
+def load_golden():
+    """Load golden cases: [{name, input, expected}]"""
+    with open(GOLDEN_FILE, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def check_golden(cases) -> bool:
+    """Compare strip_markdown output with the golden expectations"""
+    failures = 0
+    for case in cases:
+        actual = strip_markdown(case["input"])
+        if actual != case["expected"]:
+            failures += 1
+            print(f"FAIL {case['name']}")
+            print(f"  expected: {case['expected']!r}")
+            print(f"  actual:   {actual!r}")
+        elif legacy_strip_markdown(case["input"]) != actual:
+            print(f"ok   {case['name']} (differs from legacy output)")
+        else:
+            print(f"ok   {case['name']}")
+
+    print(f"\n{len(cases) - failures}/{len(cases)} golden cases passed")
+    return failures == 0
+
+
+def benchmark(cases, sizes=(2_000, 20_000, 200_000)):
+    """Time both implementations on long itinerary-like inputs of growing size"""
+    corpus = "\n\n".join(case["input"] for case in cases)
+
+    print(f"\n{'chars':>10} {'legacy (ms)':>12} {'single-pass (ms)':>17} {'speedup':>8} {'ns/char':>8}")
+    for size in sizes:
+        text = (corpus * (size // len(corpus) + 1))[:size]
+        number = max(1, 200_000 // size)
+
+        legacy = min(timeit.repeat(lambda: legacy_strip_markdown(text), number=number, repeat=5)) / number
+        current = min(timeit.repeat(lambda: strip_markdown(text), number=number, repeat=5)) / number
+
+        print(
+            f"{size:>10} {legacy * 1000:>12.3f} {current * 1000:>17.3f} "
+            f"{legacy / current:>7.1f}x {current * 1e9 / size:>8.1f}"
+        )
+
+
+def benchmark_pathological(sizes=(4_000, 16_000)):
+    """Unclosed `<` (e.g. "giá < 500k") made the legacy HTML rule quadratic"""
+    print(f"\n{'chars':>10} {'legacy (ms)':>12} {'single-pass (ms)':>17}   (unclosed '<')")
+    for size in sizes:
+        text = ("giá < 500k " * (size // 11 + 1))[:size]
+        legacy = min(timeit.repeat(lambda: legacy_strip_markdown(text), number=1, repeat=3))
+        current = min(timeit.repeat(lambda: strip_markdown(text), number=1, repeat=3))
+        print(f"{size:>10} {legacy * 1000:>12.3f} {current * 1000:>17.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Markdown stripper golden check and benchmark")
+    parser.add_argument("--check", action="store_true", help="Only verify golden outputs")
+    args = parser.parse_args()
+
+    cases = load_golden()
+    ok = check_golden(cases)
+
+    if not args.check:
+        benchmark(cases)
+        benchmark_pathological()
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+Retrieval quality and latency benchmark
+
+Indexes the mock travel content once per chunking configuration into a
+vector store, runs the labelled queries in data/mock/retrieval_queries.json
+at each k, and reports recall@k, hit rate, MRR, context tokens per query and
+search latency percentiles.
+
+The default in-memory store measures chunking and ranking quality only; its
+latencies exclude the network. `--store pinecone` indexes each configuration
+into a scratch namespace of PINECONE_INDEX_NAME (deleted afterwards) to
+measure latency as served. It needs `--embeddings azure` to match the
+index's dimension.
+
+A retrieved chunk is relevant when it comes from the query's source file and
+contains one of its expected phrases, so labels survive re-chunking.
+
+Usage:
+    python scripts/benchmark_retrieval.py                                    # fake embeddings, offline
+    python scripts/benchmark_retrieval.py --chunk-sizes 500,1000,1500 --k 2,4,6
+    python scripts/benchmark_retrieval.py --embeddings azure --min-recall 0.9 --output results/retrieval.json
+    python scripts/benchmark_retrieval.py --embeddings azure --store pinecone --k 4
+"""
+import sys
+import json
+import time
+import argparse
+import itertools
+from pathlib import Path
+from typing import Dict, List
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from langchain_core.vectorstores import InMemoryVectorStore
+
+from config import settings
+from scripts.setup_pinecone import load_mock_data, split_documents
+from services.usage_service import count_tokens, load_tokenizer
+
+QUERIES_FILE = Path(__file__).parent.parent / "data" / "mock" / "retrieval_queries.json"
+
+
+def parse_ints(value: str) -> List[int]:
+    return [int(part) for part in value.split(",") if part.strip()]
+
+
+def percentile(sorted_samples: List[float], q: float) -> float:
+    """Nearest-rank percentile of pre-sorted samples"""
+    if not sorted_samples:
+        return 0.0
+    return sorted_samples[min(len(sorted_samples) - 1, int(q * len(sorted_samples)))]
+
+
+def create_embeddings(kind: str):
+    """Embeddings for indexing and queries: offline hash-based or Azure OpenAI"""
+    if kind == "azure":
+        from langchain_openai import AzureOpenAIEmbeddings
+        return AzureOpenAIEmbeddings(
+            azure_endpoint=settings.azure_openai_endpoint,
+            api_key=settings.azure_openai_embedding_api_key,
+            api_version=settings.azure_openai_api_version,
+            deployment=settings.azure_openai_embedding_deployment,
+            model="text-embedding-3-small"
+        )
+
+    from services.fake_providers import FakeEmbeddings, LatencyModel
+    return FakeEmbeddings(LatencyModel("fixed:0"))
+
+
+def create_store(kind: str, embeddings, chunks, namespace: str):
+    """
+    Vector store holding `chunks`
+
+    Returns:
+        Tuple of (store, cleanup callable)
+    """
+    if kind == "pinecone":
+        from pinecone import Pinecone
+        from langchain_pinecone import PineconeVectorStore
+
+        index = Pinecone(api_key=settings.pinecone_api_key).Index(settings.pinecone_index_name)
+        store = PineconeVectorStore(index=index, embedding=embeddings, text_key="text", namespace=namespace)
+        store.add_documents(chunks)
+        # Upserts become searchable asynchronously
+        for _ in range(60):
+            namespaces = index.describe_index_stats().get("namespaces", {})
+            if namespaces.get(namespace, {}).get("vector_count", 0) >= len(chunks):
+                break
+            time.sleep(1)
+        return store, lambda: index.delete(delete_all=True, namespace=namespace)
+
+    store = InMemoryVectorStore(embedding=embeddings)
+    store.add_documents(chunks)
+    return store, lambda: None
+
+
+def is_relevant(chunk, query: Dict) -> bool:
+    return (
+        chunk.metadata.get("source") == query["source"]
+        and any(phrase in chunk.page_content for phrase in query["expected"])
+    )
+
+
+def evaluate(store, chunks, queries: List[Dict], k: int, repeat: int) -> Dict:
+    """Run every query at depth k and aggregate quality and latency"""
+    recalls, hits, reciprocal_ranks, context_tokens, latencies = [], [], [], [], []
+    misses = []
+
+    for query in queries:
+        total_relevant = sum(1 for chunk in chunks if is_relevant(chunk, query))
+
+        for _ in range(repeat):
+            started = time.perf_counter()
+            results = store.similarity_search(query["query"], k=k)
+            latencies.append(time.perf_counter() - started)
+
+        relevant_ranks = [rank for rank, chunk in enumerate(results, 1) if is_relevant(chunk, query)]
+        recalls.append(len(relevant_ranks) / total_relevant if total_relevant else 0.0)
+        hits.append(1.0 if relevant_ranks else 0.0)
+        reciprocal_ranks.append(1.0 / relevant_ranks[0] if relevant_ranks else 0.0)
+        context_tokens.append(sum(count_tokens(chunk.page_content) for chunk in results))
+        if not relevant_ranks:
+            misses.append(query["id"])
+
+    latencies.sort()
+    return {
+        "recall": sum(recalls) / len(recalls),
+        "hit_rate": sum(hits) / len(hits),
+        "mrr": sum(reciprocal_ranks) / len(reciprocal_ranks),
+        "context_tokens": sum(context_tokens) / len(context_tokens),
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "misses": misses
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrieval quality and latency benchmark")
+    parser.add_argument("--chunk-sizes", type=parse_ints, default=[500, 1000, 1500])
+    parser.add_argument("--overlaps", type=parse_ints, default=[settings.chunk_overlap])
+    parser.add_argument("--k", type=parse_ints, default=[2, 4, 6], help="retrieval depths")
+    parser.add_argument("--embeddings", choices=("fake", "azure"), default="fake")
+    parser.add_argument("--store", choices=("memory", "pinecone"), default="memory",
+                        help="in-memory (quality only) or a scratch Pinecone namespace (served latency)")
+    parser.add_argument("--language", choices=("vi", "en"), help="only run queries in this language")
+    parser.add_argument("--repeat", type=int, default=5, help="timed searches per query")
+    parser.add_argument("--min-recall", type=float, default=0.8,
+                        help="recommend the fastest configuration with at least this recall")
+    parser.add_argument("--queries", default=str(QUERIES_FILE))
+    parser.add_argument("--output", help="write results JSON to this path")
+    args = parser.parse_args()
+    if args.store == "pinecone" and args.embeddings != "azure":
+        parser.error("--store pinecone needs --embeddings azure (the index's dimension)")
+
+    import logging
+    logging.disable(logging.INFO)
+
+    with open(args.queries, 'r', encoding='utf-8') as f:
+        queries = json.load(f)
+    if args.language:
+        queries = [query for query in queries if query["language"] == args.language]
+
+    load_tokenizer()
+    embeddings = create_embeddings(args.embeddings)
+    documents = load_mock_data()
+    results = []
+
+    print(f"{len(queries)} queries, embeddings={args.embeddings}, store={args.store}\n")
+    print(f"{'chunk':>6} {'overlap':>8} {'chunks':>7} {'k':>3} {'recall':>7} {'hit':>6} {'MRR':>6} "
+          f"{'ctx tok':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+
+    for chunk_size, overlap in itertools.product(args.chunk_sizes, args.overlaps):
+        if overlap >= chunk_size:
+            continue
+        chunks = split_documents(documents, chunk_size=chunk_size, chunk_overlap=overlap)
+        store, cleanup = create_store(args.store, embeddings, chunks, f"benchmark-{chunk_size}-{overlap}")
+
+        try:
+            for k in args.k:
+                stats = evaluate(store, chunks, queries, k, args.repeat)
+                results.append({"chunk_size": chunk_size, "chunk_overlap": overlap, "chunks": len(chunks), "k": k, **stats})
+                print(
+                    f"{chunk_size:>6} {overlap:>8} {len(chunks):>7} {k:>3} {stats['recall']:>7.2f} "
+                    f"{stats['hit_rate']:>6.2f} {stats['mrr']:>6.2f} {stats['context_tokens']:>8.0f} "
+                    f"{stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f}"
+                )
+        finally:
+            cleanup()
+
+    # Good enough, then cheapest prompt, then fastest
+    eligible = [result for result in results if result["recall"] >= args.min_recall]
+    recommended = min(eligible, key=lambda r: (r["context_tokens"], r["p95_ms"])) if eligible else None
+    if recommended:
+        print(
+            f"\nRecommended (recall >= {args.min_recall}): CHUNK_SIZE={recommended['chunk_size']} "
+            f"CHUNK_OVERLAP={recommended['chunk_overlap']} RETRIEVAL_K={recommended['k']}"
+        )
+        if recommended["misses"]:
+            print(f"  missed queries: {', '.join(recommended['misses'])}")
+    else:
+        print(f"\nNo configuration reaches recall {args.min_recall}")
+
+    if args.output:
+        output = Path(args.output)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump({
+                "embeddings": args.embeddings,
+                "store": args.store,
+                "queries": len(queries),
+                "min_recall": args.min_recall,
+                "results": results,
+                "recommended": recommended
+            }, f, indent=2, ensure_ascii=False)
+        print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Build the FAQ answer bank
+
+Expands the curated list in data/mock/faq_questions.json (general questions
+plus per-destination templates, in Vietnamese and English), answers every
+question through the normal RAG pipeline (retrieval, answer, links,
+follow-ups), embeds questions and aliases, and writes FAQ_BANK_FILE stamped
+with the current knowledge-base version. Run it after changing the travel
+content, destinations, links or the FAQ list (and after setup_pinecone.py);
+until then the server keeps the stale bank switched off.
+
+Usage:
+    python scripts/build_faq_bank.py                    # only if the KB changed
+    python scripts/build_faq_bank.py --force --concurrency 8
+"""
+import os
+import sys
+import json
+import asyncio
+import argparse
+from datetime import datetime
+from pathlib import Path
+
+# Answers must come from the pipeline, not from the bank being replaced
+os.environ["FAQ_ENABLED"] = "false"
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from config import settings
+from services.faq_service import embedding_model, expand_questions, kb_version
+from services.rag_service import RAGService
+
+# Texts per embedding call
+EMBEDDING_BATCH_SIZE = 256
+
+
+def load_bank(path: Path) -> dict:
+    if not path.exists():
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+async def answer_all(rag_service: RAGService, questions: list, concurrency: int) -> list:
+    semaphore = asyncio.Semaphore(concurrency)
+    done = 0
+
+    async def answer(question: dict):
+        nonlocal done
+        async with semaphore:
+            response = await rag_service.generate_response(question["question"], [], language=question["language"])
+        done += 1
+        status = "failed" if response.get("error") else "ok"
+        print(f"[{done}/{len(questions)}] {status:6} {question['language']} {question['question']}")
+        if response.get("error"):
+            return None
+        return {
+            **question,
+            "answer": response["answer"],
+            "sources": response["sources"],
+            "links": response["links"],
+            "follow_up_questions": response["follow_up_questions"]
+        }
+
+    return await asyncio.gather(*(answer(question) for question in questions))
+
+
+async def embed_all(rag_service: RAGService, entries: list):
+    """Attach embeddings of each entry's question and aliases"""
+    texts = [[entry["question"]] + entry["aliases"] for entry in entries]
+    flat = [text for group in texts for text in group]
+    vectors = []
+    for start in range(0, len(flat), EMBEDDING_BATCH_SIZE):
+        vectors.extend(await rag_service.embeddings.aembed_documents(flat[start:start + EMBEDDING_BATCH_SIZE]))
+
+    position = 0
+    for entry, group in zip(entries, texts):
+        entry["embeddings"] = [
+            [round(value, 6) for value in vector]
+            for vector in vectors[position:position + len(group)]
+        ]
+        position += len(group)
+
+
+async def build(output: Path, force: bool, concurrency: int) -> int:
+    version = kb_version()
+    existing = load_bank(output)
+    if not force and existing.get("kb_version") == version and existing.get("embedding_model") == embedding_model():
+        print(f"FAQ bank is up to date (KB version {version}); use --force to rebuild")
+        return 0
+
+    questions = expand_questions()
+    print(f"Answering {len(questions)} questions (KB version {version})\n")
+
+    rag_service = RAGService()
+    results = await answer_all(rag_service, questions, concurrency)
+    entries = [entry for entry in results if entry is not None]
+    failed = len(results) - len(entries)
+    await embed_all(rag_service, entries)
+
+    bank = {
+        "kb_version": version,
+        "embedding_model": embedding_model(),
+        "generated_at": datetime.utcnow().isoformat(),
+        "entries": entries
+    }
+    # Replace atomically: running servers reload the file when it changes
+    output.parent.mkdir(parents=True, exist_ok=True)
+    temporary = output.with_suffix(".tmp")
+    with open(temporary, 'w', encoding='utf-8') as f:
+        json.dump(bank, f, ensure_ascii=False)
+    os.replace(temporary, output)
+
+    print(f"\nWrote {len(entries)} answers to {output}" + (f", {failed} failed" if failed else ""))
+    return 1 if failed else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the FAQ answer bank")
+    parser.add_argument("--output", type=Path, default=Path(settings.faq_bank_file))
+    parser.add_argument("--force", action="store_true", help="Rebuild even if the KB version is unchanged")
+    parser.add_argument("--concurrency", type=int, default=4, help="Questions answered at once")
+    args = parser.parse_args()
+
+    sys.exit(asyncio.run(build(args.output, args.force, args.concurrency)))
+
+
+if __name__ == "__main__":
+    main()
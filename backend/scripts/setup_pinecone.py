@@ -79,11 +79,11 @@ def load_mock_data():
     return documents
 
 
-def split_documents(documents):
-    """Split documents into chunks"""
+def split_documents(documents, chunk_size=None, chunk_overlap=None):
+    """Split documents into chunks (sizes default to CHUNK_SIZE / CHUNK_OVERLAP)"""
     text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=200,
+        chunk_size=chunk_size or settings.chunk_size,
+        chunk_overlap=settings.chunk_overlap if chunk_overlap is None else chunk_overlap,
         separators=["\n\n", "\n", ". ", " ", ""]
     )
     
@@ -0,0 +1,132 @@
+"""
+Train and evaluate the intent router
+
+The router is trained at startup from data/mock/intent_examples.json. This
+script measures it on those examples (k-fold cross-validation: accuracy per
+intent, how often a question would wrongly skip retrieval, classification
+latency) and grows the training set from logs: --export writes the user
+messages of stored conversations with the router's predicted intent, to be
+reviewed and merged into the examples file (--merge).
+
+Usage:
+    python scripts/train_intent_router.py                                    # cross-validate
+    python scripts/train_intent_router.py --export results/intent_candidates.json
+    python scripts/train_intent_router.py --merge results/intent_candidates.json
+"""
+import sys
+import json
+import time
+import random
+import argparse
+from pathlib import Path
+from typing import Dict, List
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from services.intent_router import EXAMPLES_FILE, IntentRouter, fold, get_intent_router
+from services.conversation_service import ConversationService
+
+
+def load_examples() -> List[Dict[str, str]]:
+    with open(EXAMPLES_FILE, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def cross_validate(examples: List[Dict[str, str]], folds: int, seed: int):
+    """Train on k-1 folds, classify the held-out one"""
+    shuffled = examples[:]
+    random.Random(seed).shuffle(shuffled)
+
+    confusion: Dict[str, Dict[str, int]] = {}
+    latencies = []
+    for fold_index in range(folds):
+        held_out = shuffled[fold_index::folds]
+        training = [example for index, example in enumerate(shuffled) if index % folds != fold_index]
+        router = IntentRouter(training)
+        for example in held_out:
+            started = time.perf_counter()
+            predicted = router.classify(example["text"])["intent"]
+            latencies.append((time.perf_counter() - started) * 1000)
+            row = confusion.setdefault(example["intent"], {})
+            row[predicted] = row.get(predicted, 0) + 1
+
+    total = sum(sum(row.values()) for row in confusion.values())
+    correct = sum(row.get(intent, 0) for intent, row in confusion.items())
+    print(f"{folds}-fold accuracy: {correct / total:.1%} on {total} examples\n")
+
+    intents = sorted(confusion)
+    print(f"{'actual/predicted':<20}" + "".join(f"{intent:>12}" for intent in intents))
+    for intent in intents:
+        print(f"{intent:<20}" + "".join(f"{confusion[intent].get(other, 0):>12}" for other in intents))
+
+    # The costly mistake: a real question routed as small talk loses its context
+    wrongly_skipped = sum(
+        row.get("smalltalk", 0) for intent, row in confusion.items() if intent != "smalltalk"
+    )
+    print(f"\nQuestions wrongly treated as small talk: {wrongly_skipped}")
+
+    latencies.sort()
+    print(f"Classification latency: p50 {latencies[len(latencies) // 2]:.3f}ms, "
+          f"max {latencies[-1]:.3f}ms")
+
+
+def export_candidates(output: Path, limit: int):
+    """Write logged user messages with predicted intents for review"""
+    service = ConversationService()
+    router = get_intent_router()
+    known = {fold(example["text"]) for example in load_examples()}
+
+    candidates = []
+    for summary in service.list_conversations(limit=limit):
+        for message in service.get_conversation_messages(summary.conversation_id):
+            text = message["content"].strip()
+            if message["role"] != "user" or fold(text) in known:
+                continue
+            known.add(fold(text))
+            decision = router.classify(text)
+            candidates.append({"text": text, "intent": decision["intent"], "confidence": decision["confidence"]})
+
+    # Least certain first: those are worth a human look
+    candidates.sort(key=lambda candidate: candidate["confidence"])
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(candidates, f, ensure_ascii=False, indent=2)
+    print(f"Wrote {len(candidates)} candidates to {output}; fix the intents, then --merge")
+
+
+def merge_candidates(path: Path):
+    """Append reviewed candidates to the examples file"""
+    with open(path, 'r', encoding='utf-8') as f:
+        candidates = json.load(f)
+    examples = load_examples()
+    known = {fold(example["text"]) for example in examples}
+    added = [
+        {"text": candidate["text"], "intent": candidate["intent"]}
+        for candidate in candidates
+        if fold(candidate["text"]) not in known
+    ]
+    with open(EXAMPLES_FILE, 'w', encoding='utf-8') as f:
+        json.dump(examples + added, f, ensure_ascii=False, indent=2)
+    print(f"Added {len(added)} examples to {EXAMPLES_FILE} ({len(examples) + len(added)} total)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train and evaluate the intent router")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--export", type=Path, help="Write logged user messages with predicted intents here")
+    parser.add_argument("--conversations", type=int, default=1000, help="Conversations to read for --export")
+    parser.add_argument("--merge", type=Path, help="Append reviewed candidates to the examples file")
+    args = parser.parse_args()
+
+    if args.export:
+        export_candidates(args.export, args.conversations)
+    elif args.merge:
+        merge_candidates(args.merge)
+    else:
+        cross_validate(load_examples(), args.folds, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Admission control for LLM-bound requests: bounded concurrency, a fair wait queue and fast rejection
+"""
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict
+from config import settings
+from services.metrics import registry
+import logging
+
+logger = logging.getLogger(__name__)
+
+queue_wait = registry.histogram(
+    "admission_queue_wait_seconds",
+    "Time requests waited for an LLM slot",
+    labels=("controller",)
+)
+rejections_total = registry.counter(
+    "admission_rejections_total",
+    "Requests rejected by admission control, by reason",
+    labels=("controller", "reason")
+)
+
+
+class OverloadedError(Exception):
+    """Request rejected (or upstream rate limited); retry after `retry_after` seconds"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Service overloaded ({reason}), retry after {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Limits how many LLM-bound requests run at once
+
+    Requests beyond `max_concurrent` wait in per-client FIFO queues, which
+    are served round-robin so one client cannot starve the others. When the
+    total queue, or a client's share of it, is full, or a request has waited
+    longer than `queue_timeout`, it is rejected with OverloadedError. That
+    keeps in-flight work at a level the provider can sustain instead of
+    letting every request time out.
+
+        async with llm_admission.admit(client_id):
+            ...
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrent: int,
+        max_queue: int,
+        max_queue_per_client: int,
+        queue_timeout: float
+    ):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_queue_per_client = max_queue_per_client
+        self.queue_timeout = queue_timeout
+
+        self._active = 0
+        self._queued = 0
+        # Client -> waiting futures; dict order is the round-robin order
+        self._queues: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+        # Smoothed time a request holds its slot, for Retry-After estimates
+        self._service_time = 2.0
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely to free up for a new request"""
+        waves = (self._queued + 1) / max(1, self.max_concurrent)
+        return max(1, math.ceil(waves * self._service_time))
+
+    def _reject(self, reason: str):
+        rejections_total.inc(controller=self.name, reason=reason)
+        retry_after = self.retry_after()
+        logger.warning(f"Admission {self.name} rejected request ({reason}), retry after {retry_after}s")
+        raise OverloadedError(reason, retry_after)
+
+    async def _acquire(self, client_id: str):
+        if self._active < self.max_concurrent and not self._queued:
+            self._active += 1
+            queue_wait.observe(0.0, controller=self.name)
+            return
+
+        if self._queued >= self.max_queue:
+            self._reject("queue_full")
+        client_queue = self._queues.get(client_id)
+        if client_queue and len(client_queue) >= self.max_queue_per_client:
+            self._reject("client_queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(client_id, deque()).append(waiter)
+        self._queued += 1
+        started = time.perf_counter()
+
+        try:
+            await asyncio.wait_for(waiter, timeout=self.queue_timeout)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # Granted a slot just as we gave up: hand it on
+                self._release()
+            else:
+                self._discard(client_id, waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                self._reject("queue_timeout")
+            raise
+        finally:
+            queue_wait.observe(time.perf_counter() - started, controller=self.name)
+
+    def _discard(self, client_id: str, waiter: asyncio.Future):
+        """Remove an abandoned waiter from its client's queue"""
+        client_queue = self._queues.get(client_id)
+        if client_queue and waiter in client_queue:
+            client_queue.remove(waiter)
+            self._queued -= 1
+            if not client_queue:
+                del self._queues[client_id]
+
+    def _release(self):
+        """Free a slot and grant free slots round-robin across waiting clients"""
+        self._active -= 1
+        while self._active < self.max_concurrent and self._queues:
+            client_id, client_queue = next(iter(self._queues.items()))
+            waiter = client_queue.popleft()
+            self._queued -= 1
+            if client_queue:
+                self._queues.move_to_end(client_id)
+            else:
+                del self._queues[client_id]
+            if not waiter.done():
+                self._active += 1
+                waiter.set_result(None)
+
+    @asynccontextmanager
+    async def admit(self, client_id: str):
+        """Hold a slot for the duration of the block (may raise OverloadedError)"""
+        await self._acquire(client_id)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self._service_time = 0.8 * self._service_time + 0.2 * elapsed
+            self._release()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "active": self._active,
+            "queued": self._queued,
+            "waiting_clients": len(self._queues),
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "service_time_seconds": self._service_time
+        }
+
+
+# Admission for chat requests (each makes embedding + answer + follow-up calls)
+llm_admission = AdmissionController(
+    "llm",
+    max_concurrent=settings.llm_max_concurrency,
+    max_queue=settings.llm_queue_size,
+    max_queue_per_client=settings.llm_queue_per_client,
+    queue_timeout=settings.llm_queue_timeout
+)
+
+registry.gauge(
+    "admission_requests",
+    "Requests holding (active) or waiting for (queued) an LLM slot",
+    labels=("controller", "state"),
+    callback=lambda: {
+        ("llm", "active"): float(llm_admission.stats()["active"]),
+        ("llm", "queued"): float(llm_admission.stats()["queued"])
+    }
+)
@@ -0,0 +1,359 @@
+"""
+Size-bounded cache for generated TTS audio with a persistent metadata index
+"""
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from config import settings
+from services.metrics import registry
+import logging
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILENAME = "index.json"
+TEMP_SUFFIX = ".tmp"
+# Entries stored or played this recently are not evicted (a response may still be reading them)
+EVICTION_GRACE_SECONDS = 300
+
+
+class AudioCache:
+    """
+    Manages MP3 files under the audio directory
+
+    Files are content-addressed by hash and sharded into subdirectories by the
+    first two hex characters (`ab/abcdef....mp3`). A JSON index keeps size,
+    language, last access and hit count per entry; it is held in memory and
+    flushed by the janitor. When the cache grows past `max_bytes`, entries are
+    evicted by least-recent (lru) or least-frequent (lfu) use down to the low
+    watermark. Entries used within EVICTION_GRACE_SECONDS are spared, so the
+    cache may stay over budget until the janitor's next pass.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        max_bytes: int,
+        policy: str = "lru",
+        low_watermark: float = 0.9
+    ):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.index_file = self.root / INDEX_FILENAME
+        self.max_bytes = max_bytes
+        self.policy = policy if policy in ("lru", "lfu") else "lru"
+        self.low_watermark = low_watermark
+
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._total_bytes = 0
+        self._dirty = False
+
+        # Statistics (since process start)
+        self._hits = 0
+        self._misses = 0
+        self._bytes_saved = 0
+        self._evictions = 0
+        self._bytes_evicted = 0
+
+        self._load_index()
+
+    # ------------------------------------------------------------------
+    # Paths & index persistence
+    # ------------------------------------------------------------------
+
+    def path_for(self, audio_hash: str) -> Path:
+        """Get the sharded file path for an audio hash"""
+        return self.root / audio_hash[:2] / f"{audio_hash}.mp3"
+
+    def _load_index(self):
+        """Load the index and reconcile it with files on disk"""
+        entries: Dict[str, Dict[str, Any]] = {}
+        if self.index_file.exists():
+            try:
+                with open(self.index_file, 'r', encoding='utf-8') as f:
+                    entries = json.load(f).get("entries", {})
+            except Exception as e:
+                logger.error(f"Error loading audio cache index, rebuilding: {str(e)}")
+                entries = {}
+
+        # Migrate legacy flat files into shards
+        for legacy_file in self.root.glob("*.mp3"):
+            target = self.path_for(legacy_file.stem)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(legacy_file, target)
+
+        # Drop entries whose files vanished, adopt files the index does not know
+        now = time.time()
+        reconciled: Dict[str, Dict[str, Any]] = {}
+        for audio_file in self.root.glob("*/*.mp3"):
+            audio_hash = audio_file.stem
+            entry = entries.get(audio_hash) or {
+                "language": None,
+                "created_at": now,
+                "last_access": now,
+                "hits": 0
+            }
+            entry["size"] = audio_file.stat().st_size
+            reconciled[audio_hash] = entry
+
+        self._entries = reconciled
+        self._total_bytes = sum(entry["size"] for entry in reconciled.values())
+        self._dirty = True
+        logger.info(f"Audio cache loaded: {len(reconciled)} files, {self._total_bytes} bytes")
+
+    def flush(self):
+        """Persist the index atomically if it changed"""
+        with self._lock:
+            if not self._dirty:
+                return
+            snapshot = {"entries": dict(self._entries)}
+            self._dirty = False
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=TEMP_SUFFIX)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, self.index_file)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+
+    # ------------------------------------------------------------------
+    # Lookup & store
+    # ------------------------------------------------------------------
+
+    def lookup(self, audio_hash: str) -> Optional[Path]:
+        """
+        Return the cached file for a hash, recording a hit or miss
+
+        Files written by another worker process are adopted into the index.
+        """
+        path = self.path_for(audio_hash)
+        with self._lock:
+            entry = self._entries.get(audio_hash)
+            if entry is None and not path.exists():
+                self._misses += 1
+                return None
+
+            if entry is None:
+                entry = {
+                    "language": None,
+                    "created_at": time.time(),
+                    "hits": 0,
+                    "size": path.stat().st_size
+                }
+                self._entries[audio_hash] = entry
+                self._total_bytes += entry["size"]
+            elif not path.exists():
+                # Removed behind our back
+                self._total_bytes -= entry["size"]
+                del self._entries[audio_hash]
+                self._misses += 1
+                self._dirty = True
+                return None
+
+            entry["last_access"] = time.time()
+            entry["hits"] = entry.get("hits", 0) + 1
+            self._hits += 1
+            self._bytes_saved += entry["size"]
+            self._dirty = True
+            return path
+
+    def store(self, audio_hash: str, language: str):
+        """Register a freshly written file and enforce the size budget"""
+        path = self.path_for(audio_hash)
+        size = path.stat().st_size
+        now = time.time()
+
+        with self._lock:
+            previous = self._entries.get(audio_hash)
+            if previous:
+                self._total_bytes -= previous["size"]
+            self._entries[audio_hash] = {
+                "language": language,
+                "size": size,
+                "created_at": now,
+                "last_access": now,
+                "hits": 0
+            }
+            self._total_bytes += size
+            self._dirty = True
+            over_budget = self._total_bytes > self.max_bytes
+
+        if over_budget:
+            self.evict(keep=audio_hash)
+
+    def remove(self, audio_hash: str) -> int:
+        """Delete one entry, returning the bytes reclaimed"""
+        with self._lock:
+            entry = self._entries.pop(audio_hash, None)
+            if entry:
+                self._total_bytes -= entry["size"]
+                self._dirty = True
+
+        self.path_for(audio_hash).unlink(missing_ok=True)
+        return entry["size"] if entry else 0
+
+    # ------------------------------------------------------------------
+    # Eviction & maintenance
+    # ------------------------------------------------------------------
+
+    def _eviction_order(self) -> List[str]:
+        """Hashes sorted from first-to-evict to last"""
+        if self.policy == "lfu":
+            key = lambda item: (item[1].get("hits", 0), item[1].get("last_access", 0))
+        else:
+            key = lambda item: item[1].get("last_access", 0)
+        return [audio_hash for audio_hash, _ in sorted(self._entries.items(), key=key)]
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        """
+        Evict entries until the cache fits under the low watermark
+
+        Args:
+            keep: Hash never to evict (the entry just stored)
+
+        Returns:
+            Number of files evicted
+        """
+        target = int(self.max_bytes * self.low_watermark)
+        grace_cutoff = time.time() - EVICTION_GRACE_SECONDS
+        victims = []
+
+        with self._lock:
+            if self._total_bytes <= self.max_bytes:
+                return 0
+
+            projected = self._total_bytes
+            for audio_hash in self._eviction_order():
+                if projected <= target:
+                    break
+                entry = self._entries[audio_hash]
+                if audio_hash == keep or entry.get("last_access", entry.get("created_at", 0)) > grace_cutoff:
+                    continue
+                projected -= entry["size"]
+                victims.append(audio_hash)
+
+        if not victims:
+            return 0
+        reclaimed = sum(self.remove(audio_hash) for audio_hash in victims)
+        with self._lock:
+            self._evictions += len(victims)
+            self._bytes_evicted += reclaimed
+
+        logger.info(f"Audio cache evicted {len(victims)} files ({reclaimed} bytes, policy={self.policy})")
+        return len(victims)
+
+    def sweep_temp_files(self, max_age_seconds: int = 3600) -> int:
+        """Remove temp files left behind by crashed syntheses"""
+        cutoff = time.time() - max_age_seconds
+        removed = 0
+        for tmp_file in self.root.rglob(f"*{TEMP_SUFFIX}"):
+            try:
+                if tmp_file.stat().st_mtime < cutoff:
+                    tmp_file.unlink()
+                    removed += 1
+            except FileNotFoundError:
+                continue
+        return removed
+
+    def idle_hashes(self, max_idle_seconds: float) -> List[str]:
+        """Entries not played (or created) within `max_idle_seconds`"""
+        cutoff = time.time() - max_idle_seconds
+        with self._lock:
+            return [
+                audio_hash for audio_hash, entry in self._entries.items()
+                if entry.get("last_access", entry.get("created_at", 0)) < cutoff
+            ]
+
+    def prune_empty_shards(self, min_age_seconds: int = 3600) -> int:
+        """Remove shard directories left empty (and unchanged for `min_age_seconds`) by evictions"""
+        cutoff = time.time() - min_age_seconds
+        removed = 0
+        for shard in self.root.iterdir():
+            if shard.is_dir() and shard.stat().st_mtime < cutoff and not any(shard.iterdir()):
+                try:
+                    shard.rmdir()
+                    removed += 1
+                except OSError:
+                    # A file was just written into it
+                    continue
+        return removed
+
+    def run_maintenance(self):
+        """One janitor pass: enforce budget, sweep temp files, flush index"""
+        self.evict()
+        removed = self.sweep_temp_files()
+        if removed:
+            logger.info(f"Audio cache removed {removed} stale temp files")
+        self.flush()
+
+    async def run_janitor(self, interval_seconds: int):
+        """Run maintenance periodically off the event loop until cancelled"""
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                await asyncio.to_thread(self.run_maintenance)
+            except Exception as e:
+                logger.error(f"Audio cache janitor error: {str(e)}", exc_info=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache statistics"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "total_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "policy": self.policy,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "bytes_saved": self._bytes_saved,
+                "evictions": self._evictions,
+                "bytes_evicted": self._bytes_evicted
+            }
+
+
+_audio_cache: Optional[AudioCache] = None
+_audio_cache_lock = threading.Lock()
+
+
+def get_audio_cache() -> AudioCache:
+    """Get the process-wide audio cache (created on first use)"""
+    global _audio_cache
+    if _audio_cache is None:
+        with _audio_cache_lock:
+            if _audio_cache is None:
+                _audio_cache = AudioCache(
+                    root=settings.audio_dir,
+                    max_bytes=settings.audio_cache_max_bytes,
+                    policy=settings.audio_cache_policy
+                )
+    return _audio_cache
+
+
+def _cache_stat(key: str):
+    """Gauge callback reading one statistic from the audio cache, if created"""
+    def collect():
+        if _audio_cache is None:
+            return {}
+        return {(): float(_audio_cache.stats()[key])}
+    return collect
+
+
+for _key, _description in (
+    ("entries", "Number of cached audio files"),
+    ("total_bytes", "Bytes used by cached audio files"),
+    ("hits", "Audio cache hits since start"),
+    ("misses", "Audio cache misses since start"),
+    ("hit_rate", "Audio cache hit rate since start"),
+    ("bytes_saved", "Bytes served from cache instead of synthesized since start"),
+    ("evictions", "Audio files evicted since start"),
+):
+    registry.gauge(f"tts_audio_cache_{_key}", _description, callback=_cache_stat(_key))
@@ -0,0 +1,76 @@
+"""
+Single-flight coalescing: identical in-flight requests share one generation
+"""
+import asyncio
+import re
+import unicodedata
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+from services.metrics import registry
+import logging
+
+logger = logging.getLogger(__name__)
+
+_SEPARATORS_RE = re.compile(r"[\W_]+", re.UNICODE)
+
+coalesced_total = registry.counter(
+    "chat_coalesced_total",
+    "Coalescible chat requests by role (leader ran the generation, follower shared it)",
+    labels=("role",)
+)
+
+
+def normalize_query(query: str) -> str:
+    """
+    Case, punctuation and whitespace folded; diacritics kept
+
+    ("ba" and "bà" are different questions in Vietnamese)
+    """
+    text = unicodedata.normalize("NFC", query).lower()
+    return _SEPARATORS_RE.sub(" ", text).strip()
+
+
+class SingleFlight:
+    """
+    Runs one call per key at a time; callers arriving meanwhile await its result
+
+    The call runs in its own task, so a caller that goes away (client
+    disconnect) cancels only its own wait, never the generation the others
+    are waiting for. Errors propagate to every caller.
+
+        response, shared = await chat_flights.do(key, generate)
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._flights: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Returns:
+            Tuple of (result, shared) where shared is True for callers that joined another's call
+        """
+        flight = self._flights.get(key)
+        if flight is not None:
+            coalesced_total.inc(role="follower")
+            return await asyncio.shield(flight), True
+
+        coalesced_total.inc(role="leader")
+        flight = asyncio.ensure_future(factory())
+        self._flights[key] = flight
+        flight.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(flight), False
+
+    def _finish(self, key: Hashable, flight: asyncio.Task):
+        self._flights.pop(key, None)
+        # Mark the error retrieved even if every caller went away
+        if not flight.cancelled():
+            flight.exception()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+
+# History-free chat generations, keyed by (normalized query, language)
+chat_flights = SingleFlight("chat")
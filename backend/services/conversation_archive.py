@@ -0,0 +1,210 @@
+"""
+Archive of idle conversations: compressed monthly zip bundles with a manifest
+"""
+import json
+import os
+import tempfile
+import threading
+import zipfile
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIRNAME = "archive"
+MANIFEST_FILENAME = "manifest.json"
+
+
+class ConversationArchive:
+    """
+    Conversation files moved out of the conversations directory
+
+    A conversation's files are appended to the bundle of the current month
+    (`archive/2026-10.zip`, deflated) and recorded in a manifest
+    (conversation id -> bundle, members and a summary for listing). Restoring writes the files back
+    and drops the manifest entry; members no longer referenced (restored or
+    deleted conversations) stay in their bundle until `compact()` rewrites it.
+    The manifest is re-read when another process changes it.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.manifest_file = self.root / MANIFEST_FILENAME
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, str]] = {}
+        self._mtime: Optional[int] = None
+
+    def _load(self) -> Dict[str, Dict[str, str]]:
+        """Manifest entries, re-read if the file changed"""
+        try:
+            mtime = self.manifest_file.stat().st_mtime_ns
+        except FileNotFoundError:
+            self._entries, self._mtime = {}, None
+            return self._entries
+        if mtime != self._mtime:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                self._entries = json.load(f).get("conversations", {})
+            self._mtime = mtime
+        return self._entries
+
+    def _save(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({"conversations": self._entries}, f)
+            os.replace(tmp_path, self.manifest_file)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+        self._mtime = self.manifest_file.stat().st_mtime_ns
+
+    def contains(self, conversation_id: str) -> bool:
+        with self._lock:
+            return conversation_id in self._load()
+
+    def archive(self, conversation_id: str, files: List[Path], summary: Optional[Dict[str, Any]] = None) -> int:
+        """
+        Move a conversation's files into the current bundle
+
+        The first file is the one whose modification marks activity; if it
+        changes while archiving, the conversation stays where it is.
+
+        Args:
+            conversation_id: Conversation ID
+            files: Files to move, the activity-marking one first
+            summary: Metadata kept in the manifest so the conversation can still be listed
+
+        Returns:
+            Bytes reclaimed (file sizes minus their compressed sizes)
+        """
+        now = datetime.utcnow()
+        bundle = f"{now:%Y-%m}.zip"
+        # Unique per archiving, so a conversation archived twice in a month keeps one live copy
+        prefix = f"{conversation_id}-{now:%Y%m%dT%H%M%S%f}/"
+        files = [path for path in files if path.exists()]
+        if not files:
+            return 0
+
+        with self._lock:
+            stat = files[0].stat()
+            size, compressed, members = 0, 0, {}
+            self.root.mkdir(parents=True, exist_ok=True)
+            with zipfile.ZipFile(self.root / bundle, 'a', compression=zipfile.ZIP_DEFLATED) as zf:
+                for path in files:
+                    zf.write(path, prefix + path.name)
+                    members[path.name] = prefix + path.name
+                    size += path.stat().st_size
+                    compressed += zf.getinfo(prefix + path.name).compress_size
+            if files[0].stat().st_mtime_ns != stat.st_mtime_ns:
+                # Written meanwhile: it stays live (the members are dropped by the next compaction)
+                return 0
+            self._load()[conversation_id] = {
+                "bundle": bundle,
+                "members": members,
+                "archived_at": now.isoformat(),
+                "summary": summary
+            }
+            self._save()
+            for path in files:
+                path.unlink()
+        return size - compressed
+
+    def restore(self, conversation_id: str, directory: Path) -> bool:
+        """Write an archived conversation's files back into `directory`; False if not archived"""
+        with self._lock:
+            entry = self._load().get(conversation_id)
+            if entry is None:
+                return False
+            with zipfile.ZipFile(self.root / entry["bundle"]) as zf:
+                # The first member (metadata) last, so the conversation appears complete
+                for name, member in reversed(list(entry["members"].items())):
+                    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+                    with os.fdopen(fd, 'wb') as f:
+                        f.write(zf.read(member))
+                    os.replace(tmp_path, Path(directory) / name)
+            del self._entries[conversation_id]
+            self._save()
+        logger.info(f"Restored archived conversation {conversation_id}")
+        return True
+
+    def summaries(self) -> Dict[str, Dict[str, Any]]:
+        """Summaries of archived conversations, by conversation id"""
+        with self._lock:
+            return {
+                conversation_id: entry["summary"]
+                for conversation_id, entry in self._load().items() if entry.get("summary")
+            }
+
+    def forget(self, conversation_id: str) -> bool:
+        """Drop an archived conversation (its data is purged by the next compaction)"""
+        with self._lock:
+            if self._load().pop(conversation_id, None) is None:
+                return False
+            self._save()
+        return True
+
+    def compact(self, min_garbage_ratio: float = 0.2) -> Tuple[int, int]:
+        """
+        Rewrite bundles whose unreferenced members make up at least `min_garbage_ratio`
+        of their size (bundles with no live member are deleted)
+
+        Returns:
+            Tuple of (bundles rewritten or deleted, bytes reclaimed)
+        """
+        rewritten, reclaimed = 0, 0
+        for bundle_path in sorted(self.root.glob("*.zip")):
+            with self._lock:
+                live = {
+                    member for entry in self._load().values() if entry["bundle"] == bundle_path.name
+                    for member in entry["members"].values()
+                }
+                with zipfile.ZipFile(bundle_path) as zf:
+                    members = zf.infolist()
+                    garbage = sum(info.compress_size for info in members if info.filename not in live)
+                    total = sum(info.compress_size for info in members) or 1
+                    if garbage == 0 or (live and garbage / total < min_garbage_ratio):
+                        continue
+
+                    size_before = bundle_path.stat().st_size
+                    if live:
+                        tmp_path = bundle_path.with_suffix(".tmp")
+                        with zipfile.ZipFile(tmp_path, 'w', compression=zipfile.ZIP_DEFLATED) as out:
+                            for info in members:
+                                if info.filename in live:
+                                    out.writestr(info, zf.read(info))
+                if live:
+                    os.replace(tmp_path, bundle_path)
+                    reclaimed += size_before - bundle_path.stat().st_size
+                else:
+                    bundle_path.unlink()
+                    reclaimed += size_before
+            rewritten += 1
+        return rewritten, reclaimed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            conversations = len(self._load())
+        bundles = list(self.root.glob("*.zip"))
+        return {
+            "conversations": conversations,
+            "bundles": len(bundles),
+            "bytes": sum(bundle.stat().st_size for bundle in bundles)
+        }
+
+
+_archive: Optional[ConversationArchive] = None
+_archive_lock = threading.Lock()
+
+
+def get_conversation_archive() -> ConversationArchive:
+    """Process-wide archive under CONVERSATIONS_DIR/archive"""
+    global _archive
+    if _archive is None:
+        with _archive_lock:
+            if _archive is None:
+                _archive = ConversationArchive(Path(settings.conversations_dir) / ARCHIVE_DIRNAME)
+    return _archive
@@ -2,59 +2,182 @@
 Service for managing conversation history (filesystem-based)
 """
 import json
+import os
+import tempfile
+import threading
 import uuid
 from pathlib import Path
 from datetime import datetime
-from typing import List, Optional, Dict
+from typing import Any, Iterator, List, Optional, Dict, Tuple
 from config import settings
 from models.schemas import ChatMessage, ConversationSummary, ConversationDetail
+from services.conversation_archive import get_conversation_archive
+from services.message_log import MessageLog
+from services.metrics import timed
+from services.search_index import get_search_index, index_errors_total
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Writes to one conversation (messages, title, deletion, archiving, restoring and
+# migrating) are serialized; reentrant because writers load metadata under the lock
+_LOCK_STRIPES = 64
+_conversation_locks = [threading.RLock() for _ in range(_LOCK_STRIPES)]
+
+
+def _conversation_lock(conversation_id: str) -> threading.RLock:
+    return _conversation_locks[hash(conversation_id) % _LOCK_STRIPES]
+
 
 class ConversationService:
-    """Manages conversation storage and retrieval using JSON files"""
+    """
+    Manages conversation storage and retrieval using files
+
+    Each conversation is a small JSON metadata file (`<id>.json`: title,
+    timestamps, message count, last message) plus a MessageLog of its
+    messages, so appending a message and reading the latest page cost the
+    same however long the conversation is. Files written before the split
+    (messages inside `<id>.json`) are migrated when first opened.
+    """
     
     def __init__(self):
         self.conversations_dir = Path(settings.conversations_dir)
         self.conversations_dir.mkdir(parents=True, exist_ok=True)
     
+    def _update_index(self, operation: str, *args):
+        """Apply a change to the search index; failures are logged, never raised"""
+        if not settings.search_enabled:
+            return
+        try:
+            getattr(get_search_index(), operation)(*args)
+        except Exception as e:
+            index_errors_total.inc(operation=operation)
+            logger.warning(f"Search index {operation} failed: {str(e)}")
+    
+    def _restore_if_archived(self, conversation_id: str) -> bool:
+        """Bring an archived conversation back before it is read or written"""
+        try:
+            return get_conversation_archive().restore(conversation_id, self.conversations_dir)
+        except Exception as e:
+            logger.error(f"Error restoring archived conversation {conversation_id}: {str(e)}")
+            return False
+    
     def _get_conversation_path(self, conversation_id: str) -> Path:
-        """Get file path for a conversation"""
+        """Get metadata file path for a conversation"""
         return self.conversations_dir / f"{conversation_id}.json"
     
-    def create_conversation(self, language: str = "vi") -> str:
-        """Create a new conversation and return its ID"""
-        conversation_id = str(uuid.uuid4())
+    def _get_message_log(self, conversation_id: str) -> MessageLog:
+        return MessageLog(self.conversations_dir, conversation_id)
+    
+    def conversation_files(self, conversation_id: str) -> List[Path]:
+        """Every file a conversation is stored in"""
+        return [self._get_conversation_path(conversation_id)] + self._get_message_log(conversation_id).paths
+    
+    def _write_metadata(self, data: Dict[str, Any]):
+        """Replace a metadata file atomically"""
+        file_path = self._get_conversation_path(data["conversation_id"])
+        fd, tmp_path = tempfile.mkstemp(dir=self.conversations_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, file_path)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+    
+    def _new_metadata(self, conversation_id: str, language: str) -> Dict[str, Any]:
         now = datetime.utcnow()
-        
-        conversation_data = {
+        return {
             "conversation_id": conversation_id,
             "title": "New Conversation",
-            "messages": [],
+            "message_count": 0,
+            "last_message": "",
             "created_at": now.isoformat(),
             "updated_at": now.isoformat(),
             "language": language
         }
+    
+    def archive_conversation(self, conversation_id: str) -> Optional[int]:
+        """
+        Move an idle conversation into the archive (still listed, restored when opened)
         
+        Holds the conversation's write lock, so a message added meanwhile
+        waits and then restores it. Writers in other worker processes are
+        caught by the archive's modification check instead.
+        
+        Returns:
+            Bytes reclaimed, or None if it was not archived (missing, or written meanwhile)
+        """
+        with _conversation_lock(conversation_id):
+            if not self._get_conversation_path(conversation_id).exists():
+                return None
+            data = self._load_metadata(conversation_id)
+            reclaimed = get_conversation_archive().archive(
+                conversation_id, self.conversation_files(conversation_id), summary=data
+            )
+            if self._get_conversation_path(conversation_id).exists():
+                return None
+            return reclaimed
+    
+    def _load_metadata(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        """Metadata of a conversation (restored from the archive, migrated if needed); None if missing"""
         file_path = self._get_conversation_path(conversation_id)
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(conversation_data, f, ensure_ascii=False, indent=2)
+        
+        # Restoring and migrating rewrite files, so they must not race writers
+        with _conversation_lock(conversation_id):
+            if not file_path.exists() and not self._restore_if_archived(conversation_id):
+                return None
+            
+            with open(file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            
+            if "messages" in data:
+                # Single-file layout: move the messages into the log
+                messages = data.pop("messages")
+                self._get_message_log(conversation_id).write_all(messages)
+                data["message_count"] = len(messages)
+                data["last_message"] = messages[-1]["content"][:100] if messages else ""
+                self._write_metadata(data)
+                logger.info(f"Migrated conversation {conversation_id} ({len(messages)} messages)")
+        
+        return data
+    
+    def create_conversation(self, language: str = "vi") -> str:
+        """Create a new conversation and return its ID"""
+        conversation_id = str(uuid.uuid4())
+        self._write_metadata(self._new_metadata(conversation_id, language))
         
         logger.info(f"Created new conversation: {conversation_id}")
         return conversation_id
     
-    def get_conversation(self, conversation_id: str) -> Optional[ConversationDetail]:
-        """Get full conversation detail"""
-        file_path = self._get_conversation_path(conversation_id)
+    @timed("conversation_load")
+    def get_conversation(
+        self,
+        conversation_id: str,
+        before: Optional[int] = None,
+        limit: Optional[int] = None
+    ) -> Optional[ConversationDetail]:
+        """
+        Get conversation detail with all messages, or a page of them
         
-        if not file_path.exists():
-            return None
+        Args:
+            conversation_id: Conversation ID
+            before: Return messages before this position (default: up to the latest)
+            limit: Return at most this many messages, the latest of the range
         
+        Returns:
+            Conversation detail; `first_position` is the position of the first
+            message returned (pass it as `before` for the previous page)
+        """
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            data = self._load_metadata(conversation_id)
+            if data is None:
+                return None
+            
+            log = self._get_message_log(conversation_id)
+            count = log.count()
+            end = count if before is None else min(before, count)
+            start = 0 if limit is None else max(0, end - limit)
             
             # Convert messages to ChatMessage objects
             messages = [
@@ -63,7 +186,7 @@ class ConversationService:
                     content=msg["content"],
                     timestamp=datetime.fromisoformat(msg["timestamp"]) if "timestamp" in msg else None
                 )
-                for msg in data.get("messages", [])
+                for msg in log.read(start, end)
             ]
             
             return ConversationDetail(
@@ -72,15 +195,17 @@ class ConversationService:
                 messages=messages,
                 created_at=datetime.fromisoformat(data["created_at"]),
                 updated_at=datetime.fromisoformat(data["updated_at"]),
-                language=data.get("language", "vi")
+                language=data.get("language", "vi"),
+                message_count=count,
+                first_position=start
             )
         except Exception as e:
             logger.error(f"Error loading conversation {conversation_id}: {str(e)}")
             return None
     
-    def get_conversation_messages(self, conversation_id: str) -> List[Dict[str, str]]:
-        """Get conversation messages as list of dicts for RAG context"""
-        conversation = self.get_conversation(conversation_id)
+    def get_conversation_messages(self, conversation_id: str, limit: Optional[int] = None) -> List[Dict[str, str]]:
+        """Get conversation messages (the latest `limit` if given) as list of dicts for RAG context"""
+        conversation = self.get_conversation(conversation_id, limit=limit)
         
         if not conversation:
             return []
@@ -90,37 +215,65 @@ class ConversationService:
             for msg in conversation.messages
         ]
     
+    def iter_conversations(self) -> Iterator[Tuple[str, str, List[Dict[str, Any]]]]:
+        """Every stored conversation as (conversation_id, title, messages), for reindexing"""
+        for file_path in self.conversations_dir.glob("*.json"):
+            try:
+                data = self._load_metadata(file_path.stem)
+                if data is None:
+                    continue
+                log = self._get_message_log(file_path.stem)
+                yield data["conversation_id"], data.get("title", "Untitled"), log.read(0, log.count())
+            except Exception as e:
+                logger.error(f"Error loading conversation from {file_path}: {str(e)}")
+                continue
+    
+    def _summary(self, data: Dict[str, Any]) -> ConversationSummary:
+        if "messages" in data:
+            # Not migrated yet
+            messages = data["messages"]
+            data["message_count"] = len(messages)
+            data["last_message"] = messages[-1]["content"] if messages else ""
+        
+        return ConversationSummary(
+            conversation_id=data["conversation_id"],
+            title=data.get("title", "Untitled"),
+            last_message=data.get("last_message", "")[:100],
+            created_at=datetime.fromisoformat(data["created_at"]),
+            updated_at=datetime.fromisoformat(data["updated_at"]),
+            message_count=data.get("message_count", 0)
+        )
+    
+    @timed("conversation_list")
     def list_conversations(self, limit: int = 50) -> List[ConversationSummary]:
-        """List all conversations (sorted by updated_at, most recent first)"""
+        """List all conversations, archived ones included (sorted by updated_at, most recent first)"""
         conversations = []
         
         for file_path in self.conversations_dir.glob("*.json"):
             try:
                 with open(file_path, 'r', encoding='utf-8') as f:
                     data = json.load(f)
-                
-                messages = data.get("messages", [])
-                last_message = messages[-1]["content"] if messages else ""
-                
-                conversations.append(
-                    ConversationSummary(
-                        conversation_id=data["conversation_id"],
-                        title=data.get("title", "Untitled"),
-                        last_message=last_message[:100],
-                        created_at=datetime.fromisoformat(data["created_at"]),
-                        updated_at=datetime.fromisoformat(data["updated_at"]),
-                        message_count=len(messages)
-                    )
-                )
+                conversations.append(self._summary(data))
             except Exception as e:
                 logger.error(f"Error loading conversation from {file_path}: {str(e)}")
                 continue
         
+        live = {conversation.conversation_id for conversation in conversations}
+        try:
+            archived = get_conversation_archive().summaries()
+        except Exception as e:
+            logger.error(f"Error reading archived conversations: {str(e)}")
+            archived = {}
+        for conversation_id, data in archived.items():
+            if conversation_id not in live:
+                conversations.append(self._summary(data))
+        
         # Sort by updated_at (most recent first)
         conversations.sort(key=lambda x: x.updated_at, reverse=True)
         
         return conversations[:limit]
     
+    @timed("conversation_save")
     def add_message(
         self,
         conversation_id: str,
@@ -129,66 +282,58 @@ class ConversationService:
         language: str = "vi"
     ):
         """Add a message to a conversation"""
-        file_path = self._get_conversation_path(conversation_id)
-        
-        # Create conversation if it doesn't exist
-        if not file_path.exists():
-            now = datetime.utcnow()
-            conversation_data = {
-                "conversation_id": conversation_id,
-                "title": "New Conversation",
-                "messages": [],
-                "created_at": now.isoformat(),
-                "updated_at": now.isoformat(),
-                "language": language
+        with _conversation_lock(conversation_id):
+            data = self._load_metadata(conversation_id)
+            
+            # Create conversation if it doesn't exist
+            if data is None:
+                data = self._new_metadata(conversation_id, language)
+                logger.info(f"Created new conversation: {conversation_id}")
+            
+            # Append new message
+            message = {
+                "role": role,
+                "content": content,
+                "timestamp": datetime.utcnow().isoformat()
             }
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(conversation_data, f, ensure_ascii=False, indent=2)
-            logger.info(f"Created new conversation: {conversation_id}")
-        
-        # Load existing conversation
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        # Add new message
-        message = {
-            "role": role,
-            "content": content,
-            "timestamp": datetime.utcnow().isoformat()
-        }
-        data["messages"].append(message)
-        data["updated_at"] = datetime.utcnow().isoformat()
-        
-        # Save updated conversation
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        
-        logger.info(f"Added message to conversation {conversation_id}")
+            position = self._get_message_log(conversation_id).append(message)
+            
+            data["message_count"] = position + 1
+            data["last_message"] = content[:100]
+            data["updated_at"] = datetime.utcnow().isoformat()
+            self._write_metadata(data)
+            
+            self._update_index("add_message", conversation_id, position, role, content, message["timestamp"])
+            logger.info(f"Added message to conversation {conversation_id}")
     
+    @timed("conversation_save")
     def update_conversation_title(self, conversation_id: str, title: str):
         """Update conversation title"""
-        file_path = self._get_conversation_path(conversation_id)
-        
-        if not file_path.exists():
-            return
-        
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        data["title"] = title
-        data["updated_at"] = datetime.utcnow().isoformat()
+        with _conversation_lock(conversation_id):
+            data = self._load_metadata(conversation_id)
+            
+            if data is None:
+                return
+            
+            data["title"] = title
+            data["updated_at"] = datetime.utcnow().isoformat()
+            self._write_metadata(data)
         
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        self._update_index("set_title", conversation_id, title)
     
+    @timed("conversation_delete")
     def delete_conversation(self, conversation_id: str) -> bool:
         """Delete a conversation"""
         file_path = self._get_conversation_path(conversation_id)
         
-        if not file_path.exists():
-            return False
-        
-        file_path.unlink()
+        with _conversation_lock(conversation_id):
+            if not file_path.exists():
+                # Archived: its data is purged from the bundle by the next compaction
+                if not get_conversation_archive().forget(conversation_id):
+                    return False
+            else:
+                file_path.unlink()
+                self._get_message_log(conversation_id).delete()
+        self._update_index("remove_conversation", conversation_id)
         logger.info(f"Deleted conversation {conversation_id}")
         return True
-
@@ -0,0 +1,37 @@
+"""
+Read-mostly JSON data files (destinations, external links), parsed once and reloaded when they change
+"""
+import json
+import threading
+from pathlib import Path
+from typing import Any, Dict, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+_cache: Dict[Path, Tuple[float, Any]] = {}
+_lock = threading.Lock()
+
+
+def load_json(path: Path) -> Any:
+    """
+    Parsed contents of a JSON file, cached until its modification time changes
+
+    Raises:
+        FileNotFoundError if the file does not exist, ValueError if it is not valid JSON
+    """
+    path = Path(path)
+    mtime = path.stat().st_mtime
+    cached = _cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    with _lock:
+        cached = _cache.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        _cache[path] = (mtime, data)
+        logger.info(f"Loaded {path.name}")
+        return data
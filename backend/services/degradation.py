@@ -0,0 +1,135 @@
+"""
+SLO-driven degraded mode: trade answer richness for latency while providers are slow or failing
+"""
+import math
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Tuple
+
+from config import settings
+from services.metrics import registry
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Degradation steps in the order they are applied; level N enables the first N
+STEPS = ("skip_follow_ups", "reduce_k", "short_history", "cap_max_tokens", "cache_only")
+
+level_changes_total = registry.counter(
+    "degradation_level_changes_total",
+    "Degradation level changes by direction (up, down)",
+    labels=("direction",)
+)
+degraded_responses_total = registry.counter(
+    "degraded_responses_total",
+    "Responses generated with a degradation step applied",
+    labels=("step",)
+)
+
+
+class DegradationController:
+    """
+    Watches rolling p95 latency and error rate of generated answers
+
+    When either breaches its SLO (SLO_P95_SECONDS, SLO_ERROR_RATE) the level
+    goes up one step; when both are comfortably inside it (below
+    SLO_RECOVERY_RATIO of the targets) it comes down one step. Decisions are
+    taken at most every SLO_EVALUATION_INTERVAL seconds on at least
+    SLO_MIN_SAMPLES answers observed since the last change, so each step's
+    effect is measured before the next. With too little traffic to judge
+    (always the case in cache-only mode, which makes no LLM calls), the
+    level steps down once a full SLO_WINDOW_SECONDS has passed.
+    """
+
+    def __init__(self):
+        self._level = 0
+        self._samples: Deque[Tuple[float, float, bool]] = deque()
+        self._changed_at = time.monotonic()
+        self._evaluated_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def level(self) -> int:
+        return self._level
+
+    def active_steps(self) -> List[str]:
+        """Degradation steps in effect for a new request"""
+        if not settings.degradation_enabled:
+            return []
+        self._evaluate()
+        return list(STEPS[:self._level])
+
+    def observe(self, seconds: float, error: bool = False, level: int = 0):
+        """
+        Record one answer's latency and outcome
+
+        Args:
+            level: Level the request started under (len of its active steps);
+                answers started under another level are not evidence for this one
+        """
+        if level != self._level:
+            return
+        with self._lock:
+            self._samples.append((time.monotonic(), seconds, error))
+        self._evaluate()
+
+    def _set_level(self, level: int, reason: str):
+        direction = "up" if level > self._level else "down"
+        logger.warning(
+            f"Degradation level {self._level} -> {level} ({reason}); "
+            f"active steps: {', '.join(STEPS[:level]) or 'none'}"
+        )
+        level_changes_total.inc(direction=direction)
+        self._level = level
+        self._changed_at = time.monotonic()
+        # Judge the new level on its own answers
+        self._samples.clear()
+
+    def _evaluate(self):
+        now = time.monotonic()
+        if now - self._evaluated_at < settings.slo_evaluation_interval:
+            return
+        with self._lock:
+            if now - self._evaluated_at < settings.slo_evaluation_interval:
+                return
+            self._evaluated_at = now
+
+            while self._samples and self._samples[0][0] < now - settings.slo_window_seconds:
+                self._samples.popleft()
+
+            if len(self._samples) < settings.slo_min_samples:
+                if self._level > 0 and now - self._changed_at > settings.slo_window_seconds:
+                    self._set_level(self._level - 1, "no recent evidence of SLO breach")
+                return
+
+            latencies = sorted(seconds for _, seconds, _ in self._samples)
+            p95 = latencies[min(len(latencies) - 1, math.ceil(0.95 * len(latencies)) - 1)]
+            error_rate = sum(1 for _, _, error in self._samples if error) / len(self._samples)
+
+            if p95 > settings.slo_p95_seconds or error_rate > settings.slo_error_rate:
+                if self._level < len(STEPS):
+                    self._set_level(self._level + 1, f"p95 {p95:.2f}s, error rate {error_rate:.1%}")
+            elif (
+                self._level > 0
+                and p95 < settings.slo_p95_seconds * settings.slo_recovery_ratio
+                and error_rate < settings.slo_error_rate * settings.slo_recovery_ratio
+            ):
+                self._set_level(self._level - 1, f"p95 {p95:.2f}s, error rate {error_rate:.1%}")
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "level": self._level,
+            "active_steps": list(STEPS[:self._level]),
+            "samples": len(self._samples),
+            "seconds_since_change": round(time.monotonic() - self._changed_at, 1)
+        }
+
+
+degradation = DegradationController()
+
+registry.gauge(
+    "degradation_level",
+    "Current degradation level (0 = full answers)",
+    callback=lambda: {(): float(degradation.level)}
+)
@@ -1,11 +1,11 @@
 """
 Service for destination discovery
 """
-import json
 from pathlib import Path
 from typing import List, Optional
 from config import settings
 from models.schemas import Destination
+from services.data_index import load_json
 import logging
 
 logger = logging.getLogger(__name__)
@@ -45,8 +45,7 @@ class DestinationService:
             if not self.destinations_file.exists():
                 return []
             
-            with open(self.destinations_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            data = load_json(self.destinations_file)
             
             destinations = []
             for item in data:
@@ -75,8 +74,7 @@ class DestinationService:
             if not self.destinations_file.exists():
                 return None
             
-            with open(self.destinations_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            data = load_json(self.destinations_file)
             
             for item in data:
                 if item.get("id") == destination_id:
@@ -0,0 +1,426 @@
+"""
+Deterministic offline stand-ins for Azure OpenAI and Pinecone (PROVIDER_MODE=fake)
+
+Used for load tests and local development without API keys. Each fake has a
+configurable latency distribution and error rate, so the real request path
+can be performance-tested.
+"""
+import asyncio
+import hashlib
+import math
+import random
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, SystemMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.vectorstores import InMemoryVectorStore
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_DIMENSION = 256
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+_VIETNAMESE_RE = re.compile(r'[ăâđêôơưạảấầẩẫậắằẳẵặẹẻẽếềểễệỉịọỏốồổỗộớờởỡợụủứừửữựỳỵỷỹ]')
+
+
+class FakeProviderError(Exception):
+    """Injected provider failure; `status_code` mimics the HTTP status (e.g. 429, 503)"""
+
+    def __init__(self, provider: str, status_code: int):
+        super().__init__(f"Injected {provider} error (HTTP {status_code})")
+        self.status_code = status_code
+
+
+class LatencyModel:
+    """
+    Latency distribution parsed from a spec string (milliseconds):
+
+        fixed:200               always 200ms
+        uniform:100,300         uniform between 100 and 300ms
+        normal:200,50           mean 200, std 50 (clipped at 0)
+        lognormal:200,0.5       median 200, sigma 0.5 (long right tail)
+    """
+
+    def __init__(self, spec: str, error_rate: float = 0.0, error_status: int = 503, seed: int = 0):
+        self.spec = spec
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+        kind, _, params = spec.partition(":")
+        self.kind = kind.strip().lower()
+        self.params = [float(value) for value in params.split(",") if value.strip()]
+        if self.kind not in ("fixed", "uniform", "normal", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+
+    def sample(self) -> float:
+        """Draw one latency in seconds"""
+        with self._lock:
+            if self.kind == "fixed":
+                ms = self.params[0]
+            elif self.kind == "uniform":
+                ms = self._random.uniform(self.params[0], self.params[1])
+            elif self.kind == "normal":
+                ms = self._random.gauss(self.params[0], self.params[1])
+            else:
+                ms = self.params[0] * math.exp(self._random.gauss(0, self.params[1]))
+        return max(ms, 0.0) / 1000
+
+    def should_fail(self) -> bool:
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+    def wait(self, provider: str):
+        """Block for one latency sample, then maybe raise an injected error"""
+        time.sleep(self.sample())
+        if self.should_fail():
+            raise FakeProviderError(provider, self.error_status)
+
+    async def await_(self, provider: str):
+        """Async variant of wait()"""
+        await asyncio.sleep(self.sample())
+        if self.should_fail():
+            raise FakeProviderError(provider, self.error_status)
+
+
+def _stable_hash(text: str) -> int:
+    return int.from_bytes(hashlib.md5(text.encode("utf-8")).digest()[:8], "big")
+
+
+def _approx_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+# ----------------------------------------------------------------------
+# Chat model
+# ----------------------------------------------------------------------
+
+_ANSWERS = {
+    "vi": [
+        "Đây là gợi ý của tôi cho câu hỏi \"{query}\".\n\n**Điểm nổi bật:**\n- {context}\n- Nên đi vào mùa thu để thời tiết dễ chịu.\n- Đừng quên thử ẩm thực địa phương.\n\nBạn có muốn tôi gợi ý lịch trình chi tiết không?",
+        "Về \"{query}\": {context}\n\n1. Buổi sáng tham quan các điểm chính.\n2. Buổi trưa thưởng thức đặc sản.\n3. Buổi tối dạo phố và chợ đêm.\n\nChúc bạn có chuyến đi vui vẻ!",
+    ],
+    "en": [
+        "Here is my suggestion for \"{query}\".\n\n**Highlights:**\n- {context}\n- Autumn usually has the most pleasant weather.\n- Don't miss the local food.\n\nWould you like a detailed itinerary?",
+        "About \"{query}\": {context}\n\n1. Visit the main sights in the morning.\n2. Try local specialties for lunch.\n3. Explore the night market in the evening.\n\nHave a great trip!",
+    ],
+}
+
+_FOLLOW_UPS = {
+    "vi": [
+        "Thời điểm nào đẹp nhất để đi?",
+        "Có món ăn đặc sản nào nên thử?",
+        "Nên ở khu vực nào?",
+        "Chi phí cho chuyến đi khoảng bao nhiêu?",
+        "Di chuyển bằng phương tiện gì thuận tiện nhất?",
+    ],
+    "en": [
+        "What is the best time to visit?",
+        "Which local dishes should I try?",
+        "Where should I stay?",
+        "How much does the trip cost?",
+        "What is the easiest way to get around?",
+    ],
+}
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model returning templated answers chosen deterministically from the query
+
+    Follow-up prompts get three questions. Latency is drawn once per call
+    (time to first token); streaming then emits words with a short delay.
+    """
+
+    latency: Any = None
+    stream_delay: float = 0.01
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _language(self, messages: List[BaseMessage]) -> str:
+        # Judge by the first line only: retrieved context may be in either language
+        system = next((m.content for m in messages if isinstance(m, SystemMessage)), "")
+        first_line = (system or str(messages[-1].content)).strip().split("\n", 1)[0]
+        return "vi" if _VIETNAMESE_RE.search(first_line.lower()) else "en"
+
+    def _answer(self, messages: List[BaseMessage]) -> str:
+        query = messages[-1].content if messages else ""
+        language = self._language(messages)
+
+        if "follow-up" in query or "câu hỏi tiếp theo" in query:
+            pool = _FOLLOW_UPS[language]
+            start = _stable_hash(query) % len(pool)
+            return "\n".join(pool[(start + i) % len(pool)] for i in range(3))
+
+        system = next((m.content for m in messages if isinstance(m, SystemMessage)), "")
+        marker = "Thông tin tham khảo:" if language == "vi" else "Reference information:"
+        context = system.split(marker, 1)[1].strip() if marker in system else ""
+        context = next(
+            (line.strip() for line in context.split("\n") if line.strip() and line.strip()[0].isalnum()),
+            query
+        )[:200]
+
+        templates = _ANSWERS[language]
+        template = templates[_stable_hash(query) % len(templates)]
+        return template.format(query=query[:100], context=context)
+
+    def _message(self, messages: List[BaseMessage], content: str) -> AIMessage:
+        prompt_tokens = sum(_approx_tokens(str(m.content)) for m in messages)
+        completion_tokens = _approx_tokens(content)
+        return AIMessage(
+            content=content,
+            usage_metadata={
+                "input_tokens": prompt_tokens,
+                "output_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        )
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> ChatResult:
+        self.latency.wait("llm")
+        return ChatResult(generations=[ChatGeneration(message=self._message(messages, self._answer(messages)))])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> ChatResult:
+        await self.latency.await_("llm")
+        return ChatResult(generations=[ChatGeneration(message=self._message(messages, self._answer(messages)))])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> Iterator[ChatGenerationChunk]:
+        self.latency.wait("llm")
+        for word in re.split(r'(\s+)', self._answer(messages)):
+            if word:
+                time.sleep(self.stream_delay if not word.isspace() else 0)
+                yield ChatGenerationChunk(message=AIMessageChunk(content=word))
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        await self.latency.await_("llm")
+        for word in re.split(r'(\s+)', self._answer(messages)):
+            if word:
+                if not word.isspace():
+                    await asyncio.sleep(self.stream_delay)
+                yield ChatGenerationChunk(message=AIMessageChunk(content=word))
+
+
+# ----------------------------------------------------------------------
+# Embeddings
+# ----------------------------------------------------------------------
+
+class FakeEmbeddings(Embeddings):
+    """
+    Hash-based bag-of-words embeddings
+
+    Each word is hashed to a signed dimension, so texts sharing words get
+    similar vectors and lexical retrieval behaves plausibly.
+    """
+
+    def __init__(self, latency: LatencyModel, dimension: int = EMBEDDING_DIMENSION):
+        self.latency = latency
+        self.dimension = dimension
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimension
+        for word in _WORD_RE.findall(text.lower()):
+            h = _stable_hash(word)
+            vector[h % self.dimension] += 1.0 if (h >> 32) & 1 else -1.0
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.latency.wait("embedding")
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self.latency.wait("embedding")
+        return self._embed(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        await self.latency.await_("embedding")
+        return [self._embed(text) for text in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        await self.latency.await_("embedding")
+        return self._embed(text)
+
+
+# ----------------------------------------------------------------------
+# Vector store
+# ----------------------------------------------------------------------
+
+class FakeVectorStore(InMemoryVectorStore):
+    """In-memory vector store with injected query latency and errors"""
+
+    def __init__(self, embedding: Embeddings, latency: LatencyModel):
+        super().__init__(embedding=embedding)
+        self.latency = latency
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        self.latency.wait("vector_store")
+        return super().similarity_search_by_vector(embedding, k=k, **kwargs)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        embedding = self.embedding.embed_query(query)
+        return self.similarity_search_by_vector(embedding, k=k, **kwargs)
+
+    async def asimilarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        embedding = await self.embedding.aembed_query(query)
+        return await self.asimilarity_search_by_vector(embedding, k=k, **kwargs)
+
+    async def asimilarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        await self.latency.await_("vector_store")
+        return super().similarity_search_by_vector(embedding, k=k, **kwargs)
+
+
+# ----------------------------------------------------------------------
+# Text-to-speech
+# ----------------------------------------------------------------------
+
+# MPEG-1 Layer III frame header (128 kbps, 44.1 kHz) padded to one frame
+_MP3_FRAME = b"\xff\xfb\x90\x64" + b"\x00" * 413
+
+
+class FakeTTS:
+    """
+    Drop-in for gTTS: `FakeTTS(text=..., lang=..., slow=...).write_to_fp(f)`
+
+    Writes silent MP3 frames, roughly one per 10 characters, after the
+    configured synthesis latency.
+    """
+
+    latency: Optional[LatencyModel] = None
+
+    def __init__(self, text: str, lang: str = "vi", slow: bool = False):
+        self.text = text
+        self.lang = lang
+
+    def write_to_fp(self, fp):
+        if FakeTTS.latency is None:
+            FakeTTS.latency = LatencyModel(
+                settings.fake_tts_latency,
+                error_rate=settings.fake_tts_error_rate,
+                error_status=settings.fake_error_status,
+                seed=settings.fake_seed + 3
+            )
+        FakeTTS.latency.wait("tts")
+        fp.write(_MP3_FRAME * max(1, len(self.text) // 10))
+
+
+def create_fake_llm(
+    latency: Optional[str] = None,
+    error_rate: Optional[float] = None,
+    seed_offset: int = 0
+) -> FakeChatModel:
+    """Fake chat model; latency/error_rate default to the FAKE_LLM_* settings"""
+    return FakeChatModel(
+        latency=LatencyModel(
+            latency or settings.fake_llm_latency,
+            error_rate=settings.fake_llm_error_rate if error_rate is None else error_rate,
+            error_status=settings.fake_error_status,
+            seed=settings.fake_seed + seed_offset
+        )
+    )
+
+
+def create_fake_embeddings(
+    latency: Optional[str] = None,
+    error_rate: Optional[float] = None,
+    seed_offset: int = 0
+) -> FakeEmbeddings:
+    """Fake embeddings; latency/error_rate default to the FAKE_EMBEDDING_* settings"""
+    return FakeEmbeddings(
+        LatencyModel(
+            latency or settings.fake_embedding_latency,
+            error_rate=settings.fake_embedding_error_rate if error_rate is None else error_rate,
+            error_status=settings.fake_error_status,
+            seed=settings.fake_seed + 1 + seed_offset
+        )
+    )
+
+
+def _load_mock_chunks() -> List[Document]:
+    """Mock travel content, chunked like scripts/setup_pinecone.py"""
+    documents = []
+    for language in ("vi", "en"):
+        content_file = Path(settings.mock_data_dir) / f"travel_content_{language}.txt"
+        if content_file.exists():
+            documents.append(Document(
+                page_content=content_file.read_text(encoding="utf-8"),
+                metadata={"source": content_file.name, "language": language}
+            ))
+
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=settings.chunk_size,
+        chunk_overlap=settings.chunk_overlap,
+        separators=["\n\n", "\n", ". ", " ", ""]
+    )
+    return text_splitter.split_documents(documents)
+
+
+_vector_store: Optional[FakeVectorStore] = None
+_vector_store_lock = threading.Lock()
+
+
+def get_fake_vector_store() -> FakeVectorStore:
+    """
+    Process-wide in-memory store, indexed once from the mock travel content
+    """
+    global _vector_store
+    if _vector_store is None:
+        with _vector_store_lock:
+            if _vector_store is None:
+                # Index with zero latency; only queries are slowed down
+                embeddings = FakeEmbeddings(LatencyModel("fixed:0"))
+                store = FakeVectorStore(
+                    embedding=embeddings,
+                    latency=LatencyModel(
+                        settings.fake_vector_store_latency,
+                        error_rate=settings.fake_vector_store_error_rate,
+                        error_status=settings.fake_error_status,
+                        seed=settings.fake_seed + 2
+                    )
+                )
+                chunks = _load_mock_chunks()
+                store.add_documents(chunks)
+                # Queries go through the embedding router like live traffic
+                from services.llm_router import RoutedEmbeddings, get_embedding_router
+                store.embedding = RoutedEmbeddings(get_embedding_router())
+                _vector_store = store
+                logger.info(f"Fake vector store indexed {len(chunks)} chunks")
+    return _vector_store
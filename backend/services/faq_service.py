@@ -0,0 +1,258 @@
+"""
+FAQ answer bank: precomputed answers to canonical questions, served without the LLM
+"""
+import hashlib
+import re
+import threading
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import settings
+from services.data_index import load_json
+from services.intent_router import fold
+from services.metrics import registry
+import logging
+
+logger = logging.getLogger(__name__)
+
+QUESTIONS_FILE = Path(settings.mock_data_dir) / "faq_questions.json"
+
+# Files the stored answers are derived from: any change makes the bank stale
+KB_FILES = (
+    "travel_content_vi.txt",
+    "travel_content_en.txt",
+    "destinations.json",
+    "external_links.json",
+    "faq_questions.json"
+)
+
+# Filler words dropped before lexical matching (diacritic-folded)
+STOPWORDS = {
+    "cho", "toi", "minh", "ban", "oi", "voi", "a", "nhe", "vay", "the", "please",
+    "can", "you", "me", "tell", "i", "to", "for", "in", "of", "is", "are", "la", "o"
+}
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+matches_total = registry.counter(
+    "faq_matches_total",
+    "FAQ bank lookups by result (lexical, embedding, miss, stale, skipped_history)",
+    labels=("result",)
+)
+
+
+def normalize(text: str) -> str:
+    """Folded words without filler, for lexical matching"""
+    return " ".join(word for word in _WORD_RE.findall(fold(text)) if word not in STOPWORDS)
+
+
+def kb_version() -> str:
+    """Hash of the knowledge-base files and the retrieval settings the answers were generated with"""
+    digest = hashlib.sha256(
+        f"{settings.chunk_size}:{settings.chunk_overlap}:{settings.retrieval_k}".encode()
+    )
+    for name in KB_FILES:
+        path = Path(settings.mock_data_dir) / name
+        digest.update(name.encode())
+        digest.update(path.read_bytes() if path.exists() else b"")
+    return digest.hexdigest()[:16]
+
+
+def embedding_model() -> str:
+    """Identifies the embedding space stored question embeddings live in"""
+    return "fake" if settings.use_fake_providers else settings.azure_openai_embedding_deployment
+
+
+def expand_questions() -> List[Dict[str, Any]]:
+    """
+    The curated FAQ list in both languages: general questions plus
+    per-destination templates applied to every entry of destinations.json
+    """
+    curated = load_json(QUESTIONS_FILE)
+    destinations = load_json(Path(settings.mock_data_dir) / "destinations.json")
+
+    questions = []
+    for language in ("vi", "en"):
+        for item in curated.get("questions", []):
+            questions.append({
+                "id": item["id"],
+                "language": language,
+                "question": item[language],
+                "aliases": item.get(f"aliases_{language}", [])
+            })
+        for template in curated.get("destination_templates", []):
+            for destination in destinations:
+                names = {"name": destination["name"], "name_en": destination["name_en"]}
+                questions.append({
+                    "id": f"{template['id']}:{destination['id']}",
+                    "language": language,
+                    "question": template[language].format(**names),
+                    "aliases": [alias.format(**names) for alias in template.get(f"aliases_{language}", [])]
+                })
+    return questions
+
+
+class FAQBank:
+    """
+    Stored answers matched against incoming queries
+
+    A query matches when its normalized form equals a question or alias, or
+    shares at least FAQ_LEXICAL_THRESHOLD of its words with one (Jaccard),
+    or - when an embedding function is given - its embedding is within
+    FAQ_EMBEDDING_THRESHOLD cosine similarity of one. The bank file is
+    reloaded when it changes; while its KB version differs from the current
+    knowledge base, nothing is served.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._bank: Optional[Dict[str, Any]] = None
+        self._entries: List[Dict[str, Any]] = []
+        # Per language: (normalized text -> entry), [(word set, entry)], (unit vectors, entries)
+        self._exact: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._word_sets: Dict[str, List[Tuple[frozenset, Dict[str, Any]]]] = {}
+        self._vectors: Dict[str, Tuple[np.ndarray, List[Dict[str, Any]]]] = {}
+        self._kb_stamp: Optional[Tuple[float, ...]] = None
+        self._kb_version: Optional[str] = None
+
+    def _current_kb_version(self) -> str:
+        """kb_version(), recomputed only when a KB file's modification time changes"""
+        stamp = tuple(
+            path.stat().st_mtime if path.exists() else 0.0
+            for path in (Path(settings.mock_data_dir) / name for name in KB_FILES)
+        )
+        if stamp != self._kb_stamp:
+            self._kb_version, self._kb_stamp = kb_version(), stamp
+        return self._kb_version
+
+    def _load(self) -> Optional[Dict[str, Any]]:
+        """The bank, (re)indexed when the file changed; None if missing"""
+        try:
+            bank = load_json(self.path)
+        except (OSError, ValueError):
+            return None
+        if bank is self._bank:
+            return bank
+
+        with self._lock:
+            if bank is not self._bank:
+                self._index(bank)
+                self._bank = bank
+                logger.info(f"FAQ bank loaded: {len(self._entries)} answers, KB version {bank.get('kb_version')}")
+        return bank
+
+    def _index(self, bank: Dict[str, Any]):
+        self._entries = bank.get("entries", [])
+        self._exact, self._word_sets, self._vectors = {}, {}, {}
+        vectors: Dict[str, List[Tuple[List[float], Dict[str, Any]]]] = {}
+
+        for entry in self._entries:
+            language = entry["language"]
+            for text in [entry["question"]] + entry.get("aliases", []):
+                normalized = normalize(text)
+                self._exact.setdefault(language, {})[normalized] = entry
+                self._word_sets.setdefault(language, []).append((frozenset(normalized.split()), entry))
+            for embedding in entry.get("embeddings", []):
+                vectors.setdefault(language, []).append((embedding, entry))
+
+        for language, pairs in vectors.items():
+            matrix = np.array([embedding for embedding, _ in pairs], dtype=np.float32)
+            matrix /= np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-12
+            self._vectors[language] = (matrix, [entry for _, entry in pairs])
+
+    def _match_lexical(self, query: str, language: str) -> Optional[Dict[str, Any]]:
+        normalized = normalize(query)
+        if not normalized:
+            return None
+        entry = self._exact.get(language, {}).get(normalized)
+        if entry is not None:
+            return entry
+
+        words = frozenset(normalized.split())
+        best, best_score = None, 0.0
+        for candidate_words, candidate in self._word_sets.get(language, []):
+            score = len(words & candidate_words) / len(words | candidate_words)
+            if score > best_score:
+                best, best_score = candidate, score
+        return best if best_score >= settings.faq_lexical_threshold else None
+
+    def _match_embedding(self, embedding: List[float], language: str) -> Optional[Dict[str, Any]]:
+        if language not in self._vectors:
+            return None
+        matrix, entries = self._vectors[language]
+        vector = np.asarray(embedding, dtype=np.float32)
+        scores = matrix @ (vector / (np.linalg.norm(vector) + 1e-12))
+        best = int(np.argmax(scores))
+        return entries[best] if scores[best] >= settings.faq_embedding_threshold else None
+
+    async def match(
+        self,
+        query: str,
+        language: str,
+        embed: Optional[Callable[[], Awaitable[List[float]]]] = None
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[List[float]]]:
+        """
+        Find a stored answer for a query
+
+        Args:
+            query: User's question
+            language: Language (vi or en)
+            embed: Computes the query embedding; tried only after a lexical miss
+
+        Returns:
+            Tuple of (matching entry or None, query embedding if one was computed,
+            so a miss can reuse it for retrieval)
+        """
+        bank = self._load()
+        if not bank or not self._entries:
+            return None, None
+        if bank.get("kb_version") != self._current_kb_version():
+            matches_total.inc(result="stale")
+            return None, None
+
+        entry = self._match_lexical(query, language)
+        if entry is not None:
+            matches_total.inc(result="lexical")
+            return entry, None
+
+        embedding = None
+        if embed is not None and language in self._vectors and bank.get("embedding_model") == embedding_model():
+            try:
+                embedding = await embed()
+            except Exception as e:
+                # Retrieval embeds the query again (with its own retries)
+                logger.warning(f"FAQ embedding match skipped: {str(e)}")
+            if embedding is not None:
+                entry = self._match_embedding(embedding, language)
+                if entry is not None:
+                    matches_total.inc(result="embedding")
+                    return entry, embedding
+
+        matches_total.inc(result="miss")
+        return None, embedding
+
+    def stats(self) -> Dict[str, Any]:
+        bank = self._load() or {}
+        current = self._current_kb_version()
+        return {
+            "entries": len(self._entries) if bank else 0,
+            "kb_version": bank.get("kb_version"),
+            "current_kb_version": current,
+            "stale": bool(bank) and bank.get("kb_version") != current,
+            "embedding_model": bank.get("embedding_model"),
+            "generated_at": bank.get("generated_at")
+        }
+
+
+_faq_bank: Optional[FAQBank] = None
+
+
+def get_faq_bank() -> FAQBank:
+    """Process-wide FAQ bank (FAQ_BANK_FILE)"""
+    global _faq_bank
+    if _faq_bank is None:
+        _faq_bank = FAQBank(Path(settings.faq_bank_file))
+    return _faq_bank
@@ -0,0 +1,208 @@
+"""
+Local intent routing: decide per query whether retrieval, link lookup and follow-ups are worth running
+"""
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from config import settings
+from services.data_index import load_json
+from services.metrics import registry
+import logging
+
+logger = logging.getLogger(__name__)
+
+EXAMPLES_FILE = Path(settings.mock_data_dir) / "intent_examples.json"
+
+# Messages made only of these (diacritic-folded) words are small talk; words
+# that also occur in travel questions ("ban" map, "hay" or, "qua" visit) are left out
+SMALLTALK_WORDS = {
+    "xin", "chao", "alo", "hello", "hi", "hey", "there", "good", "morning", "afternoon", "evening", "night",
+    "cam", "cac", "thanks", "thank", "you", "much", "many", "ok", "oke", "okay", "vang",
+    "duoc", "roi", "tuyet", "voi", "great", "cool", "nice", "awesome", "perfect", "tam",
+    "biet", "bye", "goodbye", "hen", "gap", "see", "bot", "nhe", "nha", "nhieu", "haha", "hihi"
+}
+
+# Words that make a message a question, whatever the model says
+QUESTION_WORDS = {
+    "what", "where", "when", "which", "who", "how", "why", "can", "could", "should", "any",
+    "gi", "dau", "nao", "sao", "bao", "khong", "chua", "nen"
+}
+
+# Words asking for links (maps, sites, videos, blogs) or recommendations to look at:
+# English stems match as word prefixes ("recommended", "maps", "websites"),
+# Vietnamese syllables as whole words ("tim" must not match "time")
+LINK_STEMS = ("link", "web", "site", "url", "map", "video", "blog", "youtube", "recommend")
+LINK_WORDS = {"xem", "tim"}
+LINK_PHRASES = ("ban do", "trang web", "duong dan", "google maps", "gioi thieu")
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+decisions_total = registry.counter(
+    "intent_decisions_total",
+    "Queries routed, by intent",
+    labels=("intent",)
+)
+stage_decisions_total = registry.counter(
+    "rag_stage_decisions_total",
+    "RAG stages run or skipped by the intent router (skip rate = skip / total)",
+    labels=("stage", "decision")
+)
+
+
+def fold(text: str) -> str:
+    """Lowercase and strip Vietnamese diacritics ("Đà Nẵng" -> "da nang")"""
+    text = text.lower().replace("đ", "d")
+    decomposed = unicodedata.normalize("NFD", text)
+    return "".join(char for char in decomposed if unicodedata.category(char) != "Mn")
+
+
+def wants_links(query: str) -> bool:
+    """Whether a query explicitly asks for maps, sites, videos or blogs"""
+    folded = fold(query)
+    return any(
+        word in LINK_WORDS or word.startswith(LINK_STEMS)
+        for word in _WORD_RE.findall(folded)
+    ) or any(phrase in folded for phrase in LINK_PHRASES)
+
+
+def is_question(query: str) -> bool:
+    """Whether a message asks something (a question mark or a question word)"""
+    return "?" in query or bool(QUESTION_WORDS.intersection(_WORD_RE.findall(fold(query))))
+
+
+def features(text: str) -> List[str]:
+    """Folded word unigrams and bigrams"""
+    words = _WORD_RE.findall(fold(text))
+    return words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+
+
+class IntentRouter:
+    """
+    Rules plus a multinomial naive Bayes model over word n-grams
+
+    Rules catch the unambiguous cases (explicit link requests, questions,
+    pure greetings/thanks); the model, trained from labelled user messages in
+    data/mock/intent_examples.json, decides the rest. Predictions below
+    INTENT_MIN_CONFIDENCE fall back to a plain travel question, so an unsure
+    router costs latency, never answer quality.
+    """
+
+    def __init__(self, examples: List[Dict[str, str]]):
+        self._word_counts: Dict[str, Counter] = defaultdict(Counter)
+        self._totals: Counter = Counter()
+        self._priors: Dict[str, float] = {}
+        self._vocabulary = set()
+        self.train(examples)
+
+    def train(self, examples: List[Dict[str, str]]):
+        """Fit the model on [{"text", "intent"}] examples"""
+        documents = Counter()
+        for example in examples:
+            intent = example["intent"]
+            documents[intent] += 1
+            for feature in features(example["text"]):
+                self._word_counts[intent][feature] += 1
+                self._totals[intent] += 1
+                self._vocabulary.add(feature)
+        total = sum(documents.values())
+        self._priors = {intent: math.log(count / total) for intent, count in documents.items()}
+
+    def predict(self, text: str) -> Dict[str, float]:
+        """Intent probabilities from the model alone"""
+        if not self._priors:
+            return {"travel": 1.0}
+        tokens = [feature for feature in features(text) if feature in self._vocabulary]
+        vocabulary_size = len(self._vocabulary)
+        scores = {}
+        for intent, prior in self._priors.items():
+            counts, total = self._word_counts[intent], self._totals[intent] + vocabulary_size
+            scores[intent] = prior + sum(math.log((counts[token] + 1) / total) for token in tokens)
+        top = max(scores.values())
+        weights = {intent: math.exp(score - top) for intent, score in scores.items()}
+        norm = sum(weights.values())
+        return {intent: weight / norm for intent, weight in weights.items()}
+
+    def classify(self, query: str) -> Dict[str, Any]:
+        """
+        Route a query
+
+        Returns:
+            Dict with intent, confidence, and the retrieve / links / follow_ups decisions
+        """
+        words = _WORD_RE.findall(fold(query))
+
+        if wants_links(query):
+            intent, confidence = "links", 1.0
+        elif is_question(query):
+            # Greetings around a question ("good morning, is there a night market?") still need answering
+            intent, confidence = "travel", 1.0
+        elif all(word in SMALLTALK_WORDS for word in words):
+            # Also covers messages with no words at all (emoji, punctuation)
+            intent, confidence = "smalltalk", 1.0
+        else:
+            probabilities = self.predict(query)
+            intent = max(probabilities, key=probabilities.get)
+            confidence = probabilities[intent]
+            if intent != "travel" and confidence < settings.intent_min_confidence:
+                intent = "travel"
+
+        smalltalk = intent == "smalltalk"
+        return {
+            "intent": intent,
+            "confidence": round(confidence, 3),
+            "retrieve": not smalltalk,
+            "links": intent == "links",
+            "follow_ups": not smalltalk
+        }
+
+
+# Decision keys and the RAG stage each one gates
+STAGES = {"retrieve": "retrieval", "links": "link_lookup", "follow_ups": "llm_follow_ups"}
+
+
+_router: Optional[IntentRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_intent_router() -> IntentRouter:
+    """Process-wide router, trained on first use"""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                try:
+                    examples = load_json(EXAMPLES_FILE)
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Intent examples not loaded, routing with rules only: {str(e)}")
+                    examples = []
+                _router = IntentRouter(examples)
+    return _router
+
+
+def route(query: str) -> Dict[str, Any]:
+    """
+    Classify a query and record the decision in metrics
+
+    With INTENT_ROUTING_ENABLED off, retrieval and follow-ups always run and
+    links are looked up only for explicit link requests.
+    """
+    if settings.intent_routing_enabled:
+        decision = get_intent_router().classify(query)
+    else:
+        links = wants_links(query)
+        decision = {
+            "intent": "links" if links else "travel",
+            "confidence": 0.0,
+            "retrieve": True,
+            "links": links,
+            "follow_ups": True
+        }
+    decisions_total.inc(intent=decision["intent"])
+    for key, stage in STAGES.items():
+        stage_decisions_total.inc(stage=stage, decision="run" if decision[key] else "skip")
+    return decision
@@ -0,0 +1,522 @@
+"""
+Routing across several Azure OpenAI deployments with latency-aware load balancing
+"""
+import json
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple, TypeVar
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from config import settings
+from services.admission import OverloadedError
+from services.metrics import registry
+from services.resilience import is_transient
+import logging
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Sliding window for TPM/RPM quotas
+QUOTA_WINDOW_SECONDS = 60.0
+
+# EWMA weight of the newest latency sample
+EWMA_ALPHA = 0.3
+
+# Ceiling for failure-penalized EWMA latency (seconds)
+EWMA_MAX_SECONDS = 60.0
+
+requests_total = registry.counter(
+    "llm_deployment_requests_total",
+    "Requests per deployment by outcome (ok, error, throttled)",
+    labels=("kind", "deployment", "outcome")
+)
+ejections_total = registry.counter(
+    "llm_deployment_ejections_total",
+    "Times a deployment was ejected after consecutive failures",
+    labels=("kind", "deployment")
+)
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class Deployment:
+    """One chat or embedding deployment with its load, latency, quota and health state"""
+
+    def __init__(self, name: str, client: Any, tpm: int = 0, rpm: int = 0):
+        self.name = name
+        self.client = client
+        self.tpm = tpm
+        self.rpm = rpm
+
+        self.outstanding = 0
+        self.ewma: Optional[float] = None
+        self.consecutive_failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+        self.probing = False
+        self.throttled_until = 0.0
+        # [timestamp, tokens] of recent requests for quota accounting
+        self._window: Deque[List] = deque()
+
+    @property
+    def ejected(self) -> bool:
+        return self.ejections > 0
+
+    def _trim(self, now: float):
+        while self._window and self._window[0][0] <= now - QUOTA_WINDOW_SECONDS:
+            self._window.popleft()
+
+    def quota_free_at(self, now: float, tokens: int) -> float:
+        """Earliest time the deployment's quota admits a request of `tokens`"""
+        self._trim(now)
+        free_at = max(now, self.throttled_until)
+        if self.rpm and len(self._window) >= self.rpm:
+            free_at = max(free_at, self._window[len(self._window) - self.rpm][0] + QUOTA_WINDOW_SECONDS)
+        if self.tpm:
+            used = sum(count for _, count in self._window)
+            for timestamp, count in self._window:
+                if used + tokens <= self.tpm:
+                    break
+                used -= count
+                free_at = max(free_at, timestamp + QUOTA_WINDOW_SECONDS)
+        return free_at
+
+    def charge(self, now: float, tokens: int) -> List:
+        """Record a request against the quota; returns its entry for later correction"""
+        entry = [now, tokens]
+        self._window.append(entry)
+        return entry
+
+    def stats(self, now: float) -> Dict[str, Any]:
+        self._trim(now)
+        return {
+            "name": self.name,
+            "outstanding": self.outstanding,
+            "ewma_ms": self.ewma * 1000 if self.ewma is not None else None,
+            "healthy": not self.ejected,
+            "ejected_for_seconds": max(0.0, self.ejected_until - now) if self.ejected else 0.0,
+            "throttled_for_seconds": max(0.0, self.throttled_until - now),
+            "consecutive_failures": self.consecutive_failures,
+            "requests_last_minute": len(self._window),
+            "tokens_last_minute": sum(count for _, count in self._window),
+            "tpm": self.tpm,
+            "rpm": self.rpm
+        }
+
+
+class DeploymentRouter:
+    """
+    Picks a deployment per call and tracks its outcome
+
+    Strategies:
+        least_outstanding   fewest in-flight requests, ties broken by EWMA latency
+        ewma                lowest EWMA latency x (in-flight + 1)
+
+    Deployments over their TPM/RPM quota, or told to back off by a 429, are
+    skipped until their window frees up. After `eject_after` consecutive
+    transient failures a deployment is ejected for an exponentially growing
+    period, then one live request probes it: success restores it, failure
+    ejects it again. When nothing is available the call fails fast with
+    OverloadedError.
+    """
+
+    def __init__(
+        self,
+        kind: str,
+        deployments: List[Deployment],
+        strategy: str = "least_outstanding",
+        eject_after: int = 3,
+        eject_seconds: float = 10.0,
+        eject_max_seconds: float = 300.0
+    ):
+        self.kind = kind
+        self.deployments = deployments
+        self.strategy = strategy
+        self.eject_after = eject_after
+        self.eject_seconds = eject_seconds
+        self.eject_max_seconds = eject_max_seconds
+        self._lock = threading.Lock()
+
+    def _score(self, deployment: Deployment) -> Tuple[float, float]:
+        ewma = deployment.ewma or 0.0
+        if self.strategy == "ewma":
+            return (ewma * (deployment.outstanding + 1), deployment.outstanding)
+        return (deployment.outstanding, ewma)
+
+    def _acquire(self, tokens: int) -> Tuple[Deployment, List, bool]:
+        now = time.monotonic()
+        with self._lock:
+            candidates = []
+            probe = None
+            retry_at = math.inf
+            for deployment in self.deployments:
+                if deployment.ejected:
+                    if deployment.ejected_until > now or deployment.probing:
+                        retry_at = min(retry_at, deployment.ejected_until)
+                        continue
+                    free_at = deployment.quota_free_at(now, tokens)
+                    if free_at <= now and probe is None:
+                        probe = deployment
+                    retry_at = min(retry_at, free_at)
+                    continue
+                free_at = deployment.quota_free_at(now, tokens)
+                if free_at <= now:
+                    candidates.append(deployment)
+                retry_at = min(retry_at, free_at)
+
+            if probe is not None:
+                chosen = probe
+                chosen.probing = True
+                logger.info(f"Probing ejected {self.kind} deployment {chosen.name}")
+            elif candidates:
+                chosen = min(candidates, key=self._score)
+            else:
+                retry_after = max(1, math.ceil(retry_at - now)) if retry_at != math.inf else 1
+                raise OverloadedError("no_deployment_available", retry_after)
+
+            chosen.outstanding += 1
+            return chosen, chosen.charge(now, tokens), probe is not None
+
+    def _release(
+        self,
+        deployment: Deployment,
+        charge: List,
+        was_probe: bool,
+        elapsed: float,
+        error: Optional[BaseException],
+        tokens: Optional[int]
+    ):
+        with self._lock:
+            deployment.outstanding -= 1
+            if was_probe:
+                deployment.probing = False
+
+            if error is None:
+                deployment.ewma = elapsed if deployment.ewma is None else (
+                    EWMA_ALPHA * elapsed + (1 - EWMA_ALPHA) * deployment.ewma
+                )
+                deployment.consecutive_failures = 0
+                if tokens is not None:
+                    # Replace the estimate with the actual count
+                    charge[1] = tokens
+                if was_probe:
+                    # Forget the failure penalties
+                    deployment.ejections = 0
+                    deployment.ewma = elapsed
+                    logger.info(f"{self.kind} deployment {deployment.name} recovered")
+                requests_total.inc(kind=self.kind, deployment=deployment.name, outcome="ok")
+                return
+
+            if not isinstance(error, Exception):
+                # Cancelled (e.g. a losing hedge): says nothing about health
+                return
+
+            if getattr(error, "status_code", None) == 429:
+                retry_after = _retry_after_seconds(error)
+                deployment.throttled_until = time.monotonic() + retry_after
+                requests_total.inc(kind=self.kind, deployment=deployment.name, outcome="throttled")
+                logger.warning(f"{self.kind} deployment {deployment.name} throttled for {retry_after:.1f}s")
+                return
+
+            requests_total.inc(kind=self.kind, deployment=deployment.name, outcome="error")
+            if not is_transient(error):
+                return
+            deployment.consecutive_failures += 1
+            # Count the failure as a slow sample so the EWMA strategy steers away
+            penalty = 2 * max(deployment.ewma or 0.0, elapsed)
+            deployment.ewma = min(EWMA_MAX_SECONDS, EWMA_ALPHA * penalty + (1 - EWMA_ALPHA) * (deployment.ewma or penalty))
+            if was_probe or deployment.consecutive_failures >= self.eject_after:
+                self._eject(deployment)
+
+    def _eject(self, deployment: Deployment):
+        period = min(self.eject_max_seconds, self.eject_seconds * (2 ** deployment.ejections))
+        deployment.ejections += 1
+        deployment.ejected_until = time.monotonic() + period
+        deployment.consecutive_failures = 0
+        ejections_total.inc(kind=self.kind, deployment=deployment.name)
+        logger.warning(f"Ejected {self.kind} deployment {deployment.name} for {period:.0f}s")
+
+    async def call(
+        self,
+        fn: Callable[[Any], Awaitable[T]],
+        estimated_tokens: int = 0,
+        tokens_used: Optional[Callable[[T], Optional[int]]] = None
+    ) -> T:
+        """Run `fn(client)` on the chosen deployment"""
+        deployment, charge, probe = self._acquire(estimated_tokens)
+        started = time.perf_counter()
+        error = None
+        result = None
+        try:
+            result = await fn(deployment.client)
+            return result
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            tokens = tokens_used(result) if (error is None and tokens_used) else None
+            self._release(deployment, charge, probe, time.perf_counter() - started, error, tokens)
+
+    def call_sync(
+        self,
+        fn: Callable[[Any], T],
+        estimated_tokens: int = 0,
+        tokens_used: Optional[Callable[[T], Optional[int]]] = None
+    ) -> T:
+        """Blocking variant of call()"""
+        deployment, charge, probe = self._acquire(estimated_tokens)
+        started = time.perf_counter()
+        error = None
+        result = None
+        try:
+            result = fn(deployment.client)
+            return result
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            tokens = tokens_used(result) if (error is None and tokens_used) else None
+            self._release(deployment, charge, probe, time.perf_counter() - started, error, tokens)
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "strategy": self.strategy,
+                "deployments": [deployment.stats(now) for deployment in self.deployments]
+            }
+
+
+def _retry_after_seconds(error: Exception) -> float:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return max(1.0, float(headers.get("retry-after", 1)))
+    except (TypeError, ValueError):
+        return 1.0
+
+
+def _message_tokens(message: Any) -> Optional[int]:
+    usage = getattr(message, "usage_metadata", None)
+    return int(usage.get("total_tokens", 0)) if usage else None
+
+
+class RoutedChatModel(BaseChatModel):
+    """Chat model that sends each call to a deployment chosen by a DeploymentRouter"""
+
+    router: Any = None
+    max_tokens: int = 1000
+
+    @property
+    def _llm_type(self) -> str:
+        return "routed-chat"
+
+    def _estimate(self, messages: List[BaseMessage], max_tokens: Optional[int] = None) -> int:
+        completion = max_tokens if max_tokens is not None else self.max_tokens
+        return sum(_estimate_tokens(str(message.content)) for message in messages) + completion
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> ChatResult:
+        message = self.router.call_sync(
+            lambda client: client.invoke(messages, stop=stop, **kwargs),
+            estimated_tokens=self._estimate(messages, kwargs.get("max_tokens")),
+            tokens_used=_message_tokens
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> ChatResult:
+        message = await self.router.call(
+            lambda client: client.ainvoke(messages, stop=stop, **kwargs),
+            estimated_tokens=self._estimate(messages, kwargs.get("max_tokens")),
+            tokens_used=_message_tokens
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+class RoutedEmbeddings(Embeddings):
+    """Embeddings that send each call to a deployment chosen by a DeploymentRouter"""
+
+    def __init__(self, router: DeploymentRouter):
+        self.router = router
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.router.call_sync(
+            lambda client: client.embed_documents(texts),
+            estimated_tokens=sum(_estimate_tokens(text) for text in texts)
+        )
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.router.call_sync(
+            lambda client: client.embed_query(text),
+            estimated_tokens=_estimate_tokens(text)
+        )
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.router.call(
+            lambda client: client.aembed_documents(texts),
+            estimated_tokens=sum(_estimate_tokens(text) for text in texts)
+        )
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.router.call(
+            lambda client: client.aembed_query(text),
+            estimated_tokens=_estimate_tokens(text)
+        )
+
+
+# ----------------------------------------------------------------------
+# Construction from settings
+# ----------------------------------------------------------------------
+
+def _deployment_entries(raw: str, default: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Parse a JSON list of deployments, falling back to the single configured one"""
+    if not raw.strip():
+        return [default]
+    entries = json.loads(raw)
+    if not isinstance(entries, list) or not entries:
+        raise ValueError("Deployment list must be a non-empty JSON array")
+    return [{**default, **entry} for entry in entries]
+
+
+def _create_chat_client(entry: Dict[str, Any], index: int):
+    if settings.use_fake_providers:
+        from services.fake_providers import create_fake_llm
+        return create_fake_llm(entry.get("latency"), entry.get("error_rate"), seed_offset=10 * index)
+
+    from langchain_openai import AzureChatOpenAI
+    return AzureChatOpenAI(
+        azure_endpoint=entry["endpoint"],
+        api_key=entry["api_key"],
+        api_version=entry["api_version"],
+        deployment_name=entry["deployment"],
+        temperature=0.7,
+        max_tokens=1000,
+        # Deadlines and retries are applied per stage by call_with_policy
+        timeout=settings.llm_answer_timeout,
+        max_retries=0
+    )
+
+
+def _create_embedding_client(entry: Dict[str, Any], index: int):
+    if settings.use_fake_providers:
+        from services.fake_providers import create_fake_embeddings
+        return create_fake_embeddings(entry.get("latency"), entry.get("error_rate"), seed_offset=10 * index)
+
+    from langchain_openai import AzureOpenAIEmbeddings
+    return AzureOpenAIEmbeddings(
+        azure_endpoint=entry["endpoint"],
+        api_key=entry["api_key"],
+        api_version=entry["api_version"],
+        deployment=entry["deployment"],
+        model="text-embedding-3-small",
+        timeout=settings.retrieval_timeout,
+        max_retries=0
+    )
+
+
+def _build_router(kind: str, raw: str, default: Dict[str, Any], factory) -> DeploymentRouter:
+    deployments = [
+        Deployment(
+            name=entry.get("name") or f"{entry['deployment']}-{index}",
+            client=factory(entry, index),
+            tpm=int(entry.get("tpm", 0)),
+            rpm=int(entry.get("rpm", 0))
+        )
+        for index, entry in enumerate(_deployment_entries(raw, default))
+    ]
+    logger.info(f"{kind} router: {[deployment.name for deployment in deployments]} ({settings.llm_routing_strategy})")
+    return DeploymentRouter(
+        kind,
+        deployments,
+        strategy=settings.llm_routing_strategy,
+        eject_after=settings.deployment_eject_after,
+        eject_seconds=settings.deployment_eject_seconds,
+        eject_max_seconds=settings.deployment_eject_max_seconds
+    )
+
+
+_chat_router: Optional[DeploymentRouter] = None
+_embedding_router: Optional[DeploymentRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_chat_router() -> DeploymentRouter:
+    """Process-wide router over the chat deployments (LLM_DEPLOYMENTS)"""
+    global _chat_router
+    if _chat_router is None:
+        with _router_lock:
+            if _chat_router is None:
+                _chat_router = _build_router("chat", settings.llm_deployments, {
+                    "name": "default",
+                    "endpoint": settings.azure_openai_endpoint,
+                    "api_key": settings.azure_openai_llm_api_key,
+                    "api_version": settings.azure_openai_api_version,
+                    "deployment": settings.azure_openai_deployment_name
+                }, _create_chat_client)
+    return _chat_router
+
+
+def get_embedding_router() -> DeploymentRouter:
+    """Process-wide router over the embedding deployments (EMBEDDING_DEPLOYMENTS)"""
+    global _embedding_router
+    if _embedding_router is None:
+        with _router_lock:
+            if _embedding_router is None:
+                _embedding_router = _build_router("embedding", settings.embedding_deployments, {
+                    "name": "default",
+                    "endpoint": settings.azure_openai_endpoint,
+                    "api_key": settings.azure_openai_embedding_api_key,
+                    "api_version": settings.azure_openai_api_version,
+                    "deployment": settings.azure_openai_embedding_deployment
+                }, _create_embedding_client)
+    return _embedding_router
+
+
+def _router_gauge(field: str):
+    """Gauge callback reading one per-deployment field from the routers, if created"""
+    def collect():
+        values = {}
+        for router in (_chat_router, _embedding_router):
+            if router is None:
+                continue
+            for deployment in router.stats()["deployments"]:
+                value = deployment[field]
+                if value is not None:
+                    values[(router.kind, deployment["name"])] = float(value)
+        return values
+    return collect
+
+
+for _field, _description in (
+    ("outstanding", "In-flight requests per deployment"),
+    ("ewma_ms", "EWMA latency per deployment in milliseconds"),
+    ("healthy", "1 if the deployment is in rotation, 0 while ejected"),
+    ("tokens_last_minute", "Tokens charged to the deployment in the last minute"),
+):
+    registry.gauge(
+        f"llm_deployment_{_field}",
+        _description,
+        labels=("kind", "deployment"),
+        callback=_router_gauge(_field)
+    )
@@ -0,0 +1,76 @@
+"""
+Single-pass markdown stripper used to prepare answers for text-to-speech
+"""
+import re
+
+# Every alternative starts with a literal character, so the regex engine can
+# skip straight to candidate positions (`, h, !, [, *, _, ~, <, newline)
+# instead of trying each alternative at every character. Lookbehinds that
+# guard word boundaries therefore come after the first literal.
+# Order matters: the first alternative that matches at a position wins.
+_INLINE_PATTERNS = [
+    r'```(?P<code_block>[\s\S]*?)```',
+    r'`(?P<code>[^`]+)`',
+    r'h(?<!\wh)(?P<url>ttps?://[^\s<>()\[\]]+)',
+    r'!\[(?P<image>[^\]]*)\]\([^)]+\)',
+    r'\[(?P<link>[^\]]+)\]\([^)]+\)',
+    r'\*\*\*(?P<bold_italic>[^*]+)\*\*\*',
+    r'\*\*(?P<bold>[^*]+)\*\*',
+    r'_(?<!\w_)_(?P<bold_u>[^_]+)__(?!\w)',
+    r'\*(?<!\*\*)(?=\S)(?P<italic>[^*\n]+?)(?<=\S)\*(?!\*)',
+    r'_(?<!\w_)(?=\S)(?P<italic_u>[^_\n]+?)(?<=\S)_(?!\w)',
+    r'~~(?P<strike>[^~]+)~~',
+    r'<(?P<html>[^<>]+)>',
+]
+
+# Line-start constructs, anchored on the preceding newline (which is kept)
+_LINE_START_PATTERNS = [
+    r'\n(?P<rule>[-*_]{3,}[ \t]*)(?=\n|\Z)',
+    r'\n(?P<prefix>[ \t]*(?:>[ \t]+)*(?:#{1,6}|[-*+]|\d+\.)[ \t]+|(?:>[ \t]+)+)',
+]
+
+_LINE_TOKEN_RE = re.compile('|'.join(_LINE_START_PATTERNS + _INLINE_PATTERNS))
+_INLINE_TOKEN_RE = re.compile('|'.join(_INLINE_PATTERNS))
+_WHITESPACE_RE = re.compile(r'\n\n\n+|  +')
+
+# Groups whose content is itself markdown and is stripped recursively
+_NESTED_GROUPS = frozenset(("image", "link", "bold_italic", "bold", "bold_u", "italic", "italic_u", "strike"))
+
+
+def _replace_token(match: re.Match) -> str:
+    """Readable replacement for one markdown token"""
+    kind = match.lastgroup
+    if kind in _NESTED_GROUPS:
+        return _INLINE_TOKEN_RE.sub(_replace_token, match.group(kind))
+    if kind == "code":
+        return match.group(kind)
+    if kind == "url":
+        return match.group()
+    if kind == "rule" or kind == "prefix":
+        return '\n'
+    # Code blocks and HTML tags are dropped
+    return ''
+
+
+def _normalize_whitespace(match: re.Match) -> str:
+    return '\n\n' if match.group().startswith('\n') else ' '
+
+
+def strip_markdown(text: str) -> str:
+    """
+    Remove markdown formatting from text for better TTS output
+
+    Code blocks, horizontal rules and HTML tags are dropped; headers, quotes
+    and list markers are removed from line starts; links, images and
+    emphasis keep their text. Inline code and bare URLs are kept verbatim,
+    and underscores inside words (snake_case) are not treated as emphasis.
+
+    Args:
+        text: Text with markdown formatting
+
+    Returns:
+        Plain text without markdown
+    """
+    # Leading newline lets line-start patterns match the first line too
+    text = _LINE_TOKEN_RE.sub(_replace_token, '\n' + text)
+    return _WHITESPACE_RE.sub(_normalize_whitespace, text).strip()
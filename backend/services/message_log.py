@@ -0,0 +1,110 @@
+"""
+Append-only message storage with an offset index, for reading any slice without parsing the rest
+"""
+import json
+import os
+import struct
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Dict, List
+
+# One little-endian uint64 byte offset per message
+_OFFSET = struct.Struct("<Q")
+
+LOG_SUFFIX = ".messages.jsonl"
+INDEX_SUFFIX = ".messages.idx"
+
+
+class MessageLog:
+    """
+    Messages of one conversation: `<id>.messages.jsonl` holds one JSON
+    message per line, `<id>.messages.idx` the byte offset of each line
+
+    Appending writes one line and one offset. Reading positions
+    [start, end) seeks to the two offsets and parses only those lines, so
+    its cost depends on the slice, not on the conversation's length. The
+    index is the source of truth: a line written without its offset (crash
+    between the two writes) is never read.
+    """
+
+    # Appends within the process are serialized so offsets match lines
+    _append_lock = threading.Lock()
+
+    def __init__(self, directory: Path, conversation_id: str):
+        self.log_path = Path(directory) / f"{conversation_id}{LOG_SUFFIX}"
+        self.index_path = Path(directory) / f"{conversation_id}{INDEX_SUFFIX}"
+
+    @property
+    def paths(self) -> List[Path]:
+        return [self.log_path, self.index_path]
+
+    def count(self) -> int:
+        """Number of messages"""
+        try:
+            return self.index_path.stat().st_size // _OFFSET.size
+        except FileNotFoundError:
+            return 0
+
+    def append(self, message: Dict[str, Any]) -> int:
+        """Append a message, returning its position"""
+        line = (json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._append_lock:
+            with open(self.log_path, 'ab') as log:
+                offset = log.seek(0, os.SEEK_END)
+                log.write(line)
+            position = self.count()
+            # Write at the last whole entry, dropping a torn one
+            fd = os.open(self.index_path, os.O_WRONLY | os.O_CREAT, 0o644)
+            try:
+                os.lseek(fd, position * _OFFSET.size, os.SEEK_SET)
+                os.write(fd, _OFFSET.pack(offset))
+                os.ftruncate(fd, (position + 1) * _OFFSET.size)
+            finally:
+                os.close(fd)
+        return position
+
+    def read(self, start: int, end: int) -> List[Dict[str, Any]]:
+        """Messages at positions [start, end), clamped to the stored range"""
+        count = self.count()
+        start, end = max(0, start), min(end, count)
+        if start >= end:
+            return []
+
+        with open(self.index_path, 'rb') as index:
+            index.seek(start * _OFFSET.size)
+            # The offset after the slice, when there is one, bounds the read
+            raw = index.read((min(end + 1, count) - start) * _OFFSET.size)
+        offsets = [offset for (offset,) in _OFFSET.iter_unpack(raw)]
+
+        with open(self.log_path, 'rb') as log:
+            log.seek(offsets[0])
+            data = log.read(offsets[-1] - offsets[0]) if end < count else log.read()
+        # Each message runs from its own offset to the next newline, so a line
+        # without an offset (torn or orphaned write) is never parsed
+        base = offsets[0]
+        messages = []
+        for offset in offsets[:end - start]:
+            line_start = offset - base
+            messages.append(json.loads(data[line_start:data.index(b"\n", line_start)]))
+        return messages
+
+    def write_all(self, messages: List[Dict[str, Any]]):
+        """Replace the log with `messages` (used to migrate single-file conversations)"""
+        lines, offsets, offset = [], [], 0
+        for message in messages:
+            line = (json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8")
+            offsets.append(_OFFSET.pack(offset))
+            lines.append(line)
+            offset += len(line)
+
+        with self._append_lock:
+            for path, content in ((self.log_path, b"".join(lines)), (self.index_path, b"".join(offsets))):
+                fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(content)
+                os.replace(tmp_path, path)
+
+    def delete(self):
+        for path in self.paths:
+            path.unlink(missing_ok=True)
@@ -0,0 +1,329 @@
+"""
+In-process metrics: counters, gauges and latency histograms with Prometheus text export
+"""
+import bisect
+import threading
+import time
+from collections import deque
+from contextlib import ContextDecorator
+from contextvars import ContextVar
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds (5ms .. 60s)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Quantiles exported from each histogram's recent-sample window
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Stage timings of the current request as (stage, seconds, perf_counter at start), read by ServerTimingMiddleware
+_request_timings: ContextVar[Optional[List[Tuple[str, float, float]]]] = ContextVar("request_timings", default=None)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """Base class: a named metric family with fixed label names"""
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, description: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.type_name}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, description: str, labels: Iterable[str] = ()):
+        super().__init__(name, description, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self._header() + [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down, or be read from a callback at scrape time"""
+
+    type_name = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labels: Iterable[str] = (),
+        callback: Optional[Callable[[], Dict[LabelValues, float]]] = None
+    ):
+        super().__init__(name, description, labels)
+        self._values: Dict[LabelValues, float] = {}
+        self._callback = callback
+
+    def set(self, value: float, **labels: str):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: str):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        if self._callback is not None:
+            try:
+                items = list(self._callback().items())
+            except Exception as e:
+                logger.error(f"Error collecting gauge {self.name}: {str(e)}")
+                items = []
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        return self._header() + [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+
+class _HistogramSeries:
+    """Bucket counts plus a window of recent samples for one label set"""
+
+    def __init__(self, buckets: Tuple[float, ...], window: int):
+        self.bucket_counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.recent: Deque[float] = deque(maxlen=window)
+
+
+class Histogram(_Metric):
+    """
+    Latency distribution
+
+    Exports cumulative buckets, sum and count, plus a companion
+    `<name>_recent` gauge with p50/p95/p99 over the last `window` samples.
+    """
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labels: Iterable[str] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+        window: int = 1024
+    ):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(sorted(buckets))
+        self.window = window
+        self._series: Dict[LabelValues, _HistogramSeries] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _HistogramSeries(self.buckets, self.window)
+            series.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+            series.total += value
+            series.count += 1
+            series.recent.append(value)
+
+    def snapshot(self, **labels: str) -> Dict[str, float]:
+        """Count, sum and recent quantiles for one label set"""
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                return {"count": 0}
+            samples = sorted(series.recent)
+            result = {"count": series.count, "sum": series.total}
+        for q in QUANTILES:
+            result[f"p{int(q * 100)}"] = _quantile(samples, q)
+        return result
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [
+                (key, list(series.bucket_counts), series.total, series.count, sorted(series.recent))
+                for key, series in self._series.items()
+            ]
+
+        lines = self._header()
+        quantile_lines = [
+            f"# HELP {self.name}_recent {self.description} (quantiles over the last {self.window} samples)",
+            f"# TYPE {self.name}_recent gauge"
+        ]
+        for key, bucket_counts, total, count, samples in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), bucket_counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {count}")
+            for q in QUANTILES:
+                quantile = f'quantile="{q}"'
+                quantile_lines.append(
+                    f"{self.name}_recent{_format_labels(self.label_names, key, quantile)} "
+                    f"{_format_value(_quantile(samples, q))}"
+                )
+        return lines + quantile_lines
+
+
+def _quantile(sorted_samples: List[float], q: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    return sorted_samples[min(len(sorted_samples) - 1, int(q * len(sorted_samples)))]
+
+
+class MetricsRegistry:
+    """Holds metric families and renders them in Prometheus text format"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, description: str, labels: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(name, description, labels))
+
+    def gauge(
+        self,
+        name: str,
+        description: str,
+        labels: Iterable[str] = (),
+        callback: Optional[Callable[[], Dict[LabelValues, float]]] = None
+    ) -> Gauge:
+        return self._register(Gauge(name, description, labels, callback))
+
+    def histogram(
+        self,
+        name: str,
+        description: str,
+        labels: Iterable[str] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, description, labels, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Global registry
+registry = MetricsRegistry()
+
+stage_duration = registry.histogram(
+    "stage_duration_seconds",
+    "Duration of request-path stages (retrieval, LLM calls, file I/O, TTS)",
+    labels=("stage",)
+)
+
+
+class timed(ContextDecorator):
+    """
+    Time a block or (synchronous) function as a named stage
+
+    Records into the `stage_duration_seconds` histogram and, when called
+    within an HTTP request, into that request's Server-Timing header.
+
+        with timed("retrieval"):
+            ...
+
+        @timed("conversation_load")
+        def get_conversation(...):
+            ...
+    """
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self._start = 0.0
+
+    def _recreate_cm(self):
+        # Fresh instance per decorated call, so concurrent calls do not share state
+        return timed(self.stage)
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record_stage(self.stage, time.perf_counter() - self._start, self._start)
+        return False
+
+
+def record_stage(stage: str, seconds: float, started: Optional[float] = None):
+    """Record a stage duration measured elsewhere (`started`: perf_counter at its start, default now - seconds)"""
+    stage_duration.observe(seconds, stage=stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((stage, seconds, time.perf_counter() - seconds if started is None else started))
+
+
+def begin_request_timings() -> List[Tuple[str, float, float]]:
+    """Start collecting stage timings for the current request context"""
+    timings: List[Tuple[str, float, float]] = []
+    _request_timings.set(timings)
+    return timings
@@ -1,22 +1,110 @@
 """
 RAG Service with Langchain, Pinecone, and Function Calling
 """
-from typing import List, Dict, Any, Optional
-import json
+from typing import List, Dict, Any, Optional, Tuple, Union, Awaitable
+import asyncio
+import inspect
+import threading
+import time
 from pathlib import Path
 
-from langchain_openai import AzureChatOpenAI, AzureOpenAIEmbeddings
-from langchain_pinecone import PineconeVectorStore
-from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain.schema import HumanMessage, AIMessage, SystemMessage
-from langchain.tools import tool
-from pinecone import Pinecone
+from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 
 from config import settings
+from services.metrics import timed
+from services.data_index import load_json
+from services.usage_service import usage_tracker, usage_from_message, count_tokens
+from services.admission import OverloadedError
+from services.resilience import call_with_policy
+from services.intent_router import get_intent_router, route
+from services.faq_service import get_faq_bank, matches_total as faq_matches_total
+from services.degradation import degradation, degraded_responses_total
+from services.llm_router import RoutedChatModel, RoutedEmbeddings, get_chat_router, get_embedding_router
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Seconds before retrying a vector store connection that failed
+VECTOR_STORE_RETRY_SECONDS = 30
+
+_vector_store = None
+_vector_store_attempted_at = float("-inf")
+_vector_store_lock = threading.Lock()
+
+
+def _connect_vector_store():
+    """Connect to the Pinecone index (or the in-memory fake); None if unavailable"""
+    if settings.use_fake_providers:
+        from services.fake_providers import get_fake_vector_store
+        return get_fake_vector_store()
+    
+    try:
+        from pinecone import Pinecone
+        from langchain_pinecone import PineconeVectorStore
+        
+        pc = Pinecone(api_key=settings.pinecone_api_key)
+        
+        # Check if index exists
+        index_name = settings.pinecone_index_name
+        existing_indexes = [index.name for index in pc.list_indexes()]
+        
+        if index_name not in existing_indexes:
+            logger.warning(f"Pinecone index '{index_name}' not found. Please create and populate it.")
+            return None
+        
+        # Initialize vector store with index object
+        vector_store = PineconeVectorStore(
+            index=pc.Index(index_name),
+            embedding=RoutedEmbeddings(get_embedding_router()),
+            text_key="text"  # Metadata field for text content
+        )
+        logger.info(f"Pinecone vector store connected to index: {index_name}")
+        return vector_store
+        
+    except Exception as e:
+        logger.error(f"Error setting up vector store: {str(e)}")
+        return None
+
+
+def verify_vector_store() -> bool:
+    """Check that the vector store is connected and its index answers"""
+    vector_store = get_vector_store()
+    if vector_store is None:
+        return False
+    index = getattr(vector_store, "_index", None)
+    if index is not None:
+        index.describe_index_stats()
+    return True
+
+
+def get_vector_store():
+    """
+    Get the process-wide vector store, connecting on first use
+    
+    A failed connection is retried at most every VECTOR_STORE_RETRY_SECONDS,
+    so requests do not each pay for a Pinecone round trip.
+    """
+    global _vector_store, _vector_store_attempted_at
+    if _vector_store is None:
+        with _vector_store_lock:
+            now = time.monotonic()
+            if _vector_store is None and now - _vector_store_attempted_at >= VECTOR_STORE_RETRY_SECONDS:
+                _vector_store_attempted_at = now
+                _vector_store = _connect_vector_store()
+    return _vector_store
+
+
+def _rate_limit_retry_after(error: Exception) -> Optional[int]:
+    """Retry-After seconds if the error is a provider 429, else None"""
+    if getattr(error, "status_code", None) != 429:
+        return None
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return max(1, int(float(headers.get("retry-after", 1))))
+    except (TypeError, ValueError):
+        return 1
+
 
 class RAGService:
     """RAG service for generating responses with context retrieval"""
@@ -28,63 +116,24 @@ class RAGService:
         self._setup_tools()
     
     def _setup_llm(self):
-        """Initialize Azure OpenAI LLM"""
+        """Initialize the LLM, routed across the configured chat deployments"""
         try:
-            self.llm = AzureChatOpenAI(
-                azure_endpoint=settings.azure_openai_endpoint,
-                api_key=settings.azure_openai_llm_api_key,
-                api_version=settings.azure_openai_api_version,
-                deployment_name=settings.azure_openai_deployment_name,
-                temperature=0.7,
-                max_tokens=1000
-            )
-            logger.info(f"LLM initialized successfully with deployment: {settings.azure_openai_deployment_name}")
+            self.llm = RoutedChatModel(router=get_chat_router())
         except Exception as e:
             logger.error(f"Error initializing LLM: {str(e)}")
             raise
     
     def _setup_embeddings(self):
-        """Initialize Azure OpenAI Embeddings"""
+        """Initialize embeddings, routed across the configured embedding deployments"""
         try:
-            self.embeddings = AzureOpenAIEmbeddings(
-                azure_endpoint=settings.azure_openai_endpoint,
-                api_key=settings.azure_openai_embedding_api_key,
-                api_version=settings.azure_openai_api_version,
-                deployment=settings.azure_openai_embedding_deployment,
-                model="text-embedding-3-small"  # Explicitly specify model name
-            )
-            logger.info(f"Embeddings initialized successfully with deployment: {settings.azure_openai_embedding_deployment} (text-embedding-3-small)")
+            self.embeddings = RoutedEmbeddings(get_embedding_router())
         except Exception as e:
             logger.error(f"Error initializing embeddings: {str(e)}")
             raise
     
     def _setup_vector_store(self):
-        """Initialize Pinecone vector store"""
-        try:
-            pc = Pinecone(api_key=settings.pinecone_api_key)
-            
-            # Check if index exists
-            index_name = settings.pinecone_index_name
-            existing_indexes = [index.name for index in pc.list_indexes()]
-            
-            if index_name not in existing_indexes:
-                logger.warning(f"Pinecone index '{index_name}' not found. Please create and populate it.")
-                self.vector_store = None
-            else:
-                # Get index object
-                index = pc.Index(index_name)
-                
-                # Initialize vector store with index object
-                self.vector_store = PineconeVectorStore(
-                    index=index,
-                    embedding=self.embeddings,
-                    text_key="text"  # Metadata field for text content
-                )
-                logger.info(f"Pinecone vector store connected to index: {index_name}")
-                
-        except Exception as e:
-            logger.error(f"Error setting up vector store: {str(e)}")
-            self.vector_store = None
+        """Use the process-wide vector store (None while unavailable)"""
+        self.vector_store = get_vector_store()
     
     def _setup_tools(self):
         """Setup function calling tools"""
@@ -92,8 +141,7 @@ class RAGService:
         links_file = Path(settings.mock_data_dir) / "external_links.json"
         
         if links_file.exists():
-            with open(links_file, 'r', encoding='utf-8') as f:
-                self.mock_links = json.load(f)
+            self.mock_links = load_json(links_file)
         else:
             logger.warning("External links mock data not found")
             self.mock_links = {}
@@ -156,9 +204,19 @@ Respond in English, being friendly and enthusiastic.
 Use information from the provided context to give accurate answers.
 If unsure, acknowledge it and suggest ways to learn more."""
     
-    def _retrieve_context(self, query: str, k: int = 4) -> tuple[List[str], List[dict]]:
+    async def _retrieve_context(
+        self,
+        query: str,
+        k: Optional[int] = None,
+        embedding: Optional[List[float]] = None
+    ) -> tuple[List[str], List[dict]]:
         """
-        Retrieve relevant documents from vector store
+        Retrieve relevant documents from vector store (k defaults to RETRIEVAL_K)
+        
+        Args:
+            query: User's question
+            k: Number of documents
+            embedding: Precomputed query embedding (skips the embedding call)
         
         Returns:
             Tuple of (context_strings, source_documents)
@@ -167,9 +225,15 @@ If unsure, acknowledge it and suggest ways to learn more."""
             logger.warning("Vector store not available, returning empty context")
             return [], []
         
+        k = k or settings.retrieval_k
+        if embedding is not None:
+            search = lambda: self.vector_store.asimilarity_search_by_vector(embedding, k=k)
+        else:
+            search = lambda: self.vector_store.asimilarity_search(query, k=k)
+        
         try:
             # Perform similarity search
-            docs = self.vector_store.similarity_search(query, k=k)
+            docs = await call_with_policy("retrieval", search, timeout=settings.retrieval_timeout)
             
             contexts = [doc.page_content for doc in docs]
             sources = [
@@ -184,10 +248,76 @@ If unsure, acknowledge it and suggest ways to learn more."""
             return contexts, sources
             
         except Exception as e:
+            if _rate_limit_retry_after(e) is not None:
+                raise
             logger.error(f"Error retrieving context: {str(e)}")
             return [], []
     
-    def _generate_follow_up_questions(self, query: str, answer: str, language: str) -> List[str]:
+    async def retrieve_batch(
+        self,
+        queries: List[str],
+        languages: List[str],
+        conversation_ids: List[Optional[str]]
+    ) -> List[Optional[Tuple[List[str], List[dict]]]]:
+        """
+        Retrieve context for many queries: one embedding call, then concurrent searches
+        
+        Args:
+            queries: User questions
+            languages: Language of each question (for usage accounting)
+            conversation_ids: Conversation of each question (for usage accounting)
+        
+        Returns:
+            (contexts, sources) per query, or None where retrieval failed and
+            generate_response should retry it on its own
+        """
+        results: List[Optional[Tuple[List[str], List[dict]]]] = [([], []) for _ in queries]
+        if not self.vector_store:
+            return results
+        
+        # Small talk needs no context (the same decision generate_response makes)
+        indexes = [
+            index for index, query in enumerate(queries)
+            if not settings.intent_routing_enabled or get_intent_router().classify(query)["retrieve"]
+        ]
+        if not indexes:
+            return results
+        
+        try:
+            with timed("embedding"):
+                embeddings = await call_with_policy(
+                    "embedding",
+                    lambda: self.embeddings.aembed_documents([queries[index] for index in indexes]),
+                    timeout=settings.retrieval_timeout
+                )
+            for index in indexes:
+                usage_tracker.record(
+                    "embedding",
+                    count_tokens(queries[index]),
+                    conversation_id=conversation_ids[index],
+                    language=languages[index]
+                )
+        except Exception as e:
+            logger.error(f"Error embedding batch of {len(indexes)} queries: {str(e)}")
+            return [None for _ in queries]
+        
+        with timed("retrieval"):
+            retrieved = await asyncio.gather(
+                *(self._retrieve_context(queries[index], embedding=embedding)
+                  for index, embedding in zip(indexes, embeddings)),
+                return_exceptions=True
+            )
+        for index, result in zip(indexes, retrieved):
+            results[index] = None if isinstance(result, BaseException) else result
+        return results
+    
+    async def _generate_follow_up_questions(
+        self,
+        query: str,
+        answer: str,
+        language: str,
+        conversation_id: Optional[str] = None
+    ) -> List[str]:
         """Generate follow-up questions based on conversation"""
         try:
             if language == "vi":
@@ -205,7 +335,17 @@ Answer: {answer}
 
 Return only 3 questions, one per line, without numbering."""
             
-            response = self.llm.invoke([HumanMessage(content=prompt)])
+            response = await call_with_policy(
+                "llm_follow_ups",
+                lambda: self.llm.ainvoke([HumanMessage(content=prompt)]),
+                timeout=settings.llm_follow_ups_timeout
+            )
+            usage_tracker.record(
+                "llm_follow_ups",
+                conversation_id=conversation_id,
+                language=language,
+                **usage_from_message(response)
+            )
             questions = [q.strip() for q in response.content.strip().split('\n') if q.strip()]
             
             return questions[:3]
@@ -214,32 +354,157 @@ Return only 3 questions, one per line, without numbering."""
             logger.error(f"Error generating follow-up questions: {str(e)}")
             return []
     
+    async def _prepare_context(
+        self,
+        query: str,
+        language: str,
+        decision: Dict[str, Any],
+        conversation_id: Optional[str],
+        retrieved: Optional[Tuple[List[str], List[dict]]],
+        history: Any = None,
+        k: Optional[int] = None,
+        cache_only: bool = False
+    ) -> Tuple[Optional[Dict[str, Any]], List[str], List[dict]]:
+        """
+        FAQ bank lookup, then retrieval on a miss (independent of links)
+        
+        Stored answers ignore what was said before, so they are only served
+        for the first question of a conversation.
+        
+        Args:
+            history: Conversation history, or the future still loading it
+                (awaited only when the bank has an answer)
+            k: Documents to retrieve (default RETRIEVAL_K)
+            cache_only: Stop after the FAQ bank (degraded mode)
+        
+        Returns:
+            Tuple of (FAQ entry or None, context_strings, source_documents)
+        """
+        if not decision["retrieve"]:
+            return None, [], []
+        
+        # Canonical questions are answered from the precomputed FAQ bank
+        query_embedding = None
+        if settings.faq_enabled and not (isinstance(history, list) and history):
+            embed = None
+            if self.vector_store and retrieved is None:
+                embed = lambda: call_with_policy(
+                    "embedding",
+                    lambda: self.embeddings.aembed_query(query),
+                    timeout=settings.retrieval_timeout
+                )
+            with timed("faq_match"):
+                entry, query_embedding = await get_faq_bank().match(query, language, embed)
+            if entry is not None and inspect.isawaitable(history) and await history:
+                faq_matches_total.inc(result="skipped_history")
+                entry = None
+            if entry is not None:
+                if query_embedding is not None:
+                    usage_tracker.record(
+                        "embedding",
+                        count_tokens(query),
+                        conversation_id=conversation_id,
+                        language=language
+                    )
+                return entry, [], []
+        
+        if cache_only:
+            return None, [], []
+        if retrieved is not None:
+            return None, retrieved[0], retrieved[1]
+        
+        with timed("retrieval"):
+            contexts, sources = await self._retrieve_context(query, k=k, embedding=query_embedding)
+        if self.vector_store:
+            # Embedding responses carry no usage: count the query tokens
+            usage_tracker.record(
+                "embedding",
+                count_tokens(query),
+                conversation_id=conversation_id,
+                language=language
+            )
+        return None, contexts, sources
+    
+    async def _lookup_links(self, query: str, language: str, decision: Dict[str, Any]) -> List[Dict[str, str]]:
+        if not decision["links"]:
+            return []
+        with timed("link_lookup"):
+            return self.get_external_links(query, language)
+    
+    def _abandon(self, pending: List[asyncio.Future]):
+        """Stop context and link work of a failed request; the history load belongs to the caller"""
+        for future in pending[:2]:
+            if not future.done():
+                future.cancel()
+    
     async def generate_response(
         self,
         query: str,
-        history: List[Dict[str, str]],
-        language: str = "vi"
+        history: Union[List[Dict[str, str]], Awaitable[List[Dict[str, str]]]],
+        language: str = "vi",
+        conversation_id: Optional[str] = None,
+        retrieved: Optional[Tuple[List[str], List[dict]]] = None
     ) -> Dict[str, Any]:
         """
         Generate response using RAG
         
+        History loading, FAQ lookup / retrieval and link lookup do not depend
+        on each other and run concurrently; the LLM starts when all are done.
+        While the latency / error SLO is breached, degradation steps apply
+        (see services.degradation) and are listed under "degraded".
+        
         Args:
             query: User's question
-            history: Conversation history
+            history: Conversation history, or an awaitable still loading it
             language: Language (vi or en)
+            conversation_id: Conversation the request belongs to (for usage accounting)
+            retrieved: (contexts, sources) already fetched by retrieve_batch
         
         Returns:
-            Dict with answer, sources, links, follow_up_questions
+            Dict with answer, sources, links, follow_up_questions, degraded
+        
+        Raises:
+            OverloadedError when rate limited upstream, or in cache-only mode without a cached answer
         """
+        pending: List[asyncio.Future] = []
+        steps = degradation.active_steps()
+        started = time.perf_counter()
         try:
-            # 1. Retrieve relevant context
-            contexts, sources = self._retrieve_context(query)
+            # Decide which stages are worth running (small talk skips retrieval and follow-ups)
+            decision = route(query)
+            k = settings.degraded_k if "reduce_k" in steps else None
             
-            # 2. Check if we should retrieve external links (simple keyword matching)
-            links = []
-            link_keywords = ['link', 'website', 'maps', 'blog', 'video', 'xem', 'tìm', 'giới thiệu', 'recommend']
-            if any(keyword in query.lower() for keyword in link_keywords):
-                links = self.get_external_links(query, language)
+            # 1-2. Context (FAQ bank, then retrieval), external links and history, concurrently
+            if inspect.isawaitable(history):
+                history = asyncio.ensure_future(history)
+            pending = [
+                asyncio.ensure_future(self._prepare_context(
+                    query, language, decision, conversation_id, retrieved,
+                    history=history, k=k, cache_only="cache_only" in steps
+                )),
+                asyncio.ensure_future(self._lookup_links(query, language, decision))
+            ]
+            if inspect.isawaitable(history):
+                pending.append(history)
+            with timed("rag_prepare"):
+                results = await asyncio.gather(*pending)
+            (entry, contexts, sources), links = results[0], results[1]
+            if len(results) > 2:
+                history = results[2]
+            
+            if entry is not None:
+                logger.info(f"Answered from FAQ bank ({entry['id']}): {query[:100]}")
+                return {
+                    "answer": entry["answer"],
+                    "sources": entry.get("sources", []),
+                    "links": entry.get("links", []),
+                    "follow_up_questions": entry.get("follow_up_questions", []),
+                    "degraded": []
+                }
+            if "cache_only" in steps:
+                degraded_responses_total.inc(step="cache_only")
+                raise OverloadedError("degraded_cache_only", max(1, int(settings.slo_evaluation_interval)))
+            applied = [step for step in steps if step != "cache_only"]
             
             # 3. Build prompt with context
             system_prompt = self._build_system_prompt(language)
@@ -257,7 +522,8 @@ Return only 3 questions, one per line, without numbering."""
             messages = [SystemMessage(content=system_prompt + context_prompt)]
             
             # Add conversation history (last 5 messages to keep context manageable)
-            for msg in history[-5:]:
+            history_messages = settings.degraded_history_messages if "short_history" in steps else 5
+            for msg in history[-history_messages:]:
                 if msg["role"] == "user":
                     messages.append(HumanMessage(content=msg["content"]))
                 elif msg["role"] == "assistant":
@@ -268,11 +534,28 @@ Return only 3 questions, one per line, without numbering."""
             
             # 5. Generate response
             logger.info(f"Generating response for query: {query[:100]}...")
-            response = self.llm.invoke(messages)
+            llm_kwargs = {"max_tokens": settings.degraded_max_tokens} if "cap_max_tokens" in steps else {}
+            with timed("llm_answer"):
+                response = await call_with_policy(
+                    "llm_answer",
+                    lambda: self.llm.ainvoke(messages, **llm_kwargs),
+                    timeout=settings.llm_answer_timeout
+                )
             answer = response.content
+            usage_tracker.record(
+                "llm_answer",
+                conversation_id=conversation_id,
+                language=language,
+                **usage_from_message(response)
+            )
             
             # 6. Generate follow-up questions
-            follow_up_questions = self._generate_follow_up_questions(query, answer, language)
+            follow_up_questions = []
+            if decision["follow_ups"] and "skip_follow_ups" not in steps:
+                with timed("llm_follow_ups"):
+                    follow_up_questions = await self._generate_follow_up_questions(
+                        query, answer, language, conversation_id
+                    )
             
             # 7. Format links if any
             if links:
@@ -286,14 +569,33 @@ Return only 3 questions, one per line, without numbering."""
                 
                 answer += links_text
             
+            degradation.observe(time.perf_counter() - started, level=len(steps))
+            for step in applied:
+                degraded_responses_total.inc(step=step)
+            
             return {
                 "answer": answer,
                 "sources": sources,
                 "links": links,
-                "follow_up_questions": follow_up_questions
+                "follow_up_questions": follow_up_questions,
+                "degraded": applied
             }
             
+        except OverloadedError as e:
+            # The deliberate cache-only rejection is not a failed answer; upstream overload is
+            if e.reason != "degraded_cache_only":
+                self._abandon(pending)
+                degradation.observe(time.perf_counter() - started, error=True, level=len(steps))
+            raise
         except Exception as e:
+            self._abandon(pending)
+            degradation.observe(time.perf_counter() - started, error=True, level=len(steps))
+            
+            # Upstream rate limiting: let the client back off instead of showing an error answer
+            retry_after = _rate_limit_retry_after(e)
+            if retry_after is not None:
+                raise OverloadedError("provider_rate_limited", retry_after) from e
+            
             logger.error(f"Error generating response: {str(e)}", exc_info=True)
             
             # Return friendly error message
@@ -306,6 +608,8 @@ Return only 3 questions, one per line, without numbering."""
                 "answer": error_message,
                 "sources": [],
                 "links": [],
-                "follow_up_questions": []
+                "follow_up_questions": [],
+                "degraded": [],
+                "error": True
             }
 
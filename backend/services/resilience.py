@@ -0,0 +1,217 @@
+"""
+Call policy for provider requests: per-stage deadlines, jittered retries and hedging
+"""
+import asyncio
+import random
+import sys
+import threading
+import time
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from config import settings
+from services.metrics import registry
+import logging
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# HTTP statuses worth retrying: timeouts, conflicts, rate limits, server errors
+TRANSIENT_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+# Attempts observed before the p95 is trusted as a hedge delay
+MIN_SAMPLES_FOR_HEDGING = 20
+
+attempt_duration = registry.histogram(
+    "provider_attempt_duration_seconds",
+    "Duration of individual provider attempts (hedge delay source)",
+    labels=("stage",)
+)
+retries_total = registry.counter(
+    "provider_retries_total",
+    "Provider calls retried after a transient error",
+    labels=("stage",)
+)
+hedges_total = registry.counter(
+    "provider_hedges_total",
+    "Hedged provider calls by outcome (sent, won, lost, denied)",
+    labels=("stage", "outcome")
+)
+deadline_exceeded_total = registry.counter(
+    "provider_deadline_exceeded_total",
+    "Stages that ran out of their time budget",
+    labels=("stage",)
+)
+
+
+def is_transient(error: Exception) -> bool:
+    """Whether an error is worth retrying"""
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    # openai is imported lazily with the clients; if it is not loaded, this is not its error
+    openai = sys.modules.get("openai")
+    if openai is not None and isinstance(error, openai.APIConnectionError):
+        return True
+    return getattr(error, "status_code", None) in TRANSIENT_STATUS_CODES
+
+
+def _retry_after(error: Exception) -> float:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after", 0))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class HedgeBudget:
+    """
+    Token bucket capping hedges to a fraction of calls
+
+    Every call deposits `ratio` tokens (up to `burst`); a hedge spends one.
+    Over time at most `ratio` extra requests are sent per call, so a slow
+    provider cannot be hit with double load.
+    """
+
+    def __init__(self, ratio: float, burst: float = 10.0):
+        self.ratio = ratio
+        self.burst = burst
+        self._tokens = 0.0
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return True
+            return False
+
+
+hedge_budget = HedgeBudget(settings.hedge_max_ratio)
+
+
+def hedge_delay(stage: str) -> Optional[float]:
+    """Recent p95 attempt latency of a stage, or None until enough samples exist"""
+    snapshot = attempt_duration.snapshot(stage=stage)
+    if snapshot["count"] < MIN_SAMPLES_FOR_HEDGING:
+        return None
+    return max(settings.hedge_min_delay, snapshot["p95"])
+
+
+async def _timed_attempt(stage: str, factory: Callable[[], Awaitable[T]]) -> T:
+    started = time.perf_counter()
+    result = await factory()
+    attempt_duration.observe(time.perf_counter() - started, stage=stage)
+    return result
+
+
+async def _hedged_attempt(stage: str, factory: Callable[[], Awaitable[T]]) -> T:
+    """Run one attempt; if it is slower than the p95, race a duplicate against it"""
+    hedge_budget.deposit()
+    primary = asyncio.ensure_future(_timed_attempt(stage, factory))
+    tasks = [primary]
+    try:
+        delay = hedge_delay(stage)
+        if delay is None:
+            return await primary
+
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+        if not hedge_budget.try_spend():
+            hedges_total.inc(stage=stage, outcome="denied")
+            return await primary
+
+        hedges_total.inc(stage=stage, outcome="sent")
+        backup = asyncio.ensure_future(_timed_attempt(stage, factory))
+        tasks.append(backup)
+
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    hedges_total.inc(stage=stage, outcome="won" if task is backup else "lost")
+                    return task.result()
+        # Both attempts failed: report the primary's error
+        return primary.result()
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+def _deadline_exceeded(stage: str, timeout: float) -> asyncio.TimeoutError:
+    deadline_exceeded_total.inc(stage=stage)
+    logger.warning(f"Stage {stage} exceeded its {timeout:.1f}s budget")
+    return asyncio.TimeoutError()
+
+
+async def call_with_policy(
+    stage: str,
+    factory: Callable[[], Awaitable[T]],
+    timeout: float,
+    max_retries: Optional[int] = None
+) -> T:
+    """
+    Run a provider call within a stage deadline, retrying transient errors
+
+    Args:
+        stage: Stage name (retrieval, llm_answer, llm_follow_ups), used for metrics and hedging
+        factory: Creates a fresh awaitable per attempt, e.g. `lambda: llm.ainvoke(messages)`
+        timeout: Time budget in seconds for all attempts and backoffs together; while
+            retries remain, an attempt is cut off after PROVIDER_ATTEMPT_TIMEOUT_RATIO
+            of it and retried
+        max_retries: Retries after the first attempt (default PROVIDER_MAX_RETRIES)
+
+    Returns:
+        The first successful result
+
+    Raises:
+        asyncio.TimeoutError when the budget runs out, or the last error
+    """
+    if max_retries is None:
+        max_retries = settings.provider_max_retries
+    hedge = settings.hedging_enabled and stage in settings.hedge_stages_list
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    attempt = 0
+
+    while True:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            raise _deadline_exceeded(stage, timeout)
+        # While retries remain, one stalled attempt may not use up the whole budget
+        attempt_timeout = remaining
+        if attempt < max_retries:
+            attempt_timeout = min(remaining, timeout * settings.provider_attempt_timeout_ratio)
+        try:
+            call = _hedged_attempt(stage, factory) if hedge else _timed_attempt(stage, factory)
+            return await asyncio.wait_for(call, attempt_timeout)
+        except Exception as e:
+            timed_out = isinstance(e, asyncio.TimeoutError)
+            if timed_out and loop.time() >= deadline:
+                raise _deadline_exceeded(stage, timeout) from e
+            if attempt >= max_retries or not is_transient(e):
+                raise
+            # Full jitter: spread retries so clients do not retry in lockstep
+            backoff = random.uniform(0, min(
+                settings.provider_retry_max_delay,
+                settings.provider_retry_base_delay * (2 ** attempt)
+            ))
+            backoff = max(backoff, _retry_after(e))
+            if loop.time() + backoff >= deadline:
+                if timed_out:
+                    raise _deadline_exceeded(stage, timeout) from e
+                raise
+
+            attempt += 1
+            retries_total.inc(stage=stage)
+            reason = f"attempt timed out after {attempt_timeout:.1f}s" if timed_out else str(e)
+            logger.warning(f"Retrying {stage} in {backoff:.2f}s (attempt {attempt}/{max_retries}): {reason}")
+            await asyncio.sleep(backoff)
@@ -0,0 +1,289 @@
+"""
+Retention and compaction of stored conversations and audio, run in the background
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional
+from config import settings
+from services.admission import llm_admission
+from services.audio_cache import get_audio_cache
+from services.conversation_archive import get_conversation_archive
+from services.conversation_service import ConversationService
+from services.metrics import registry
+from services.search_index import get_search_index
+import logging
+
+logger = logging.getLogger(__name__)
+
+LOCK_FILENAME = ".retention.lock"
+# A lock file older than this was left by a crashed run
+STALE_LOCK_SECONDS = 6 * 3600
+# Empty conversations' metadata is a few hundred bytes; larger files are not parsed to check
+EMPTY_CONVERSATION_MAX_BYTES = 1024
+# While chat requests are queued, wait this long between checks (at most BUSY_MAX_WAIT per step)
+BUSY_BACKOFF_SECONDS = 1.0
+BUSY_MAX_WAIT_SECONDS = 60.0
+
+files_total = registry.counter(
+    "retention_files_total",
+    "Files removed or archived by retention, by store and action",
+    labels=("store", "action")
+)
+bytes_reclaimed_total = registry.counter(
+    "retention_bytes_reclaimed_total",
+    "Disk bytes reclaimed by retention and compaction, by store",
+    labels=("store",)
+)
+
+
+def _lower_priority():
+    """Run the retention thread at the lowest CPU priority (Linux sets it per thread)"""
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+    except (AttributeError, OSError):
+        pass
+
+
+class _Pacer:
+    """
+    Spaces file operations to RETENTION_MAX_FILES_PER_SECOND, stops after
+    RETENTION_MAX_FILES_PER_RUN or when the scheduler stops, and backs off
+    while chat requests are waiting for an LLM slot
+    """
+
+    def __init__(self, stop: threading.Event):
+        rate = settings.retention_max_files_per_second
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.remaining = settings.retention_max_files_per_run
+        self.stop = stop
+        self._next = time.monotonic()
+
+    def step(self) -> bool:
+        """Wait for the next slot; False once the run should end"""
+        if self.remaining <= 0 or self.stop.is_set():
+            return False
+        self.remaining -= 1
+
+        waited = 0.0
+        while llm_admission.stats()["queued"] > 0 and waited < BUSY_MAX_WAIT_SECONDS:
+            if self.stop.wait(BUSY_BACKOFF_SECONDS):
+                return False
+            waited += BUSY_BACKOFF_SECONDS
+
+        delay = self._next - time.monotonic()
+        if delay > 0 and self.stop.wait(delay):
+            return False
+        self._next = max(self._next, time.monotonic()) + self.interval
+        return True
+
+
+def _is_abandoned(file_path: Path) -> bool:
+    """An untitled conversation nobody wrote a message in"""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return (
+        not data.get("messages")
+        and not data.get("message_count")
+        and data.get("title") == "New Conversation"
+    )
+
+
+class RetentionScheduler:
+    """
+    Periodic retention and compaction pass, off the request path
+
+    Each pass (every RETENTION_INTERVAL seconds, on a single low-priority
+    thread, file operations paced by _Pacer):
+
+    - deletes empty "New Conversation" files untouched for
+      RETENTION_EMPTY_CONVERSATION_HOURS
+    - archives conversations idle for RETENTION_ARCHIVE_AFTER_DAYS into
+      compressed bundles (restored transparently when opened again)
+    - rewrites bundles holding restored or deleted conversations
+    - deletes audio not played for RETENTION_AUDIO_DAYS, stale temp files
+      and empty shard directories
+    - merges search index segments and truncates its WAL
+
+    A lock file keeps worker processes sharing the data directory from
+    running passes at the same time. The last report is kept for
+    GET /api/admin/retention.
+    """
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="retention", initializer=_lower_priority
+        )
+        self._running = threading.Lock()
+        self._stop = threading.Event()
+        self._last_report: Optional[Dict[str, Any]] = None
+        self._runs = 0
+
+    def _acquire_file_lock(self, path: Path) -> bool:
+        for _ in range(2):
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                try:
+                    if time.time() - path.stat().st_mtime < STALE_LOCK_SECONDS:
+                        return False
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+                continue
+            os.write(fd, str(os.getpid()).encode())
+            os.close(fd)
+            return True
+        return False
+
+    def _conversations(self, pacer: _Pacer, report: Dict[str, Any]):
+        conv_service = ConversationService()
+        archive = get_conversation_archive()
+        now = time.time()
+        empty_hours = settings.retention_empty_conversation_hours
+        archive_days = settings.retention_archive_after_days
+        empty_cutoff = now - empty_hours * 3600 if empty_hours > 0 else None
+        archive_cutoff = now - archive_days * 86400 if archive_days > 0 else None
+        if empty_cutoff is None and archive_cutoff is None:
+            return
+
+        stats = report["conversations"]
+        for file_path in conv_service.conversations_dir.glob("*.json"):
+            try:
+                stat = file_path.stat()
+                if (
+                    empty_cutoff is not None
+                    and stat.st_mtime < empty_cutoff
+                    and stat.st_size <= EMPTY_CONVERSATION_MAX_BYTES
+                    and _is_abandoned(file_path)
+                ):
+                    if not pacer.step():
+                        break
+                    if conv_service.delete_conversation(file_path.stem):
+                        stats["empty_deleted"] += 1
+                        stats["bytes_reclaimed"] += stat.st_size
+                        files_total.inc(store="conversations", action="delete_empty")
+                        bytes_reclaimed_total.inc(stat.st_size, store="conversations")
+                elif archive_cutoff is not None and stat.st_mtime < archive_cutoff:
+                    if not pacer.step():
+                        break
+                    reclaimed = conv_service.archive_conversation(file_path.stem)
+                    if reclaimed is not None:
+                        stats["archived"] += 1
+                        stats["bytes_reclaimed"] += reclaimed
+                        files_total.inc(store="conversations", action="archive")
+                        bytes_reclaimed_total.inc(reclaimed, store="conversations")
+            except FileNotFoundError:
+                # Deleted by a request meanwhile
+                continue
+            except Exception as e:
+                logger.error(f"Retention failed for {file_path}: {str(e)}")
+
+        bundles, reclaimed = archive.compact()
+        report["archive"] = {"bundles_compacted": bundles, "bytes_reclaimed": reclaimed}
+        if reclaimed:
+            bytes_reclaimed_total.inc(reclaimed, store="archive")
+
+    def _audio(self, pacer: _Pacer, report: Dict[str, Any]):
+        cache = get_audio_cache()
+        stats = report["audio"]
+        if settings.retention_audio_days > 0:
+            for audio_hash in cache.idle_hashes(settings.retention_audio_days * 86400):
+                if not pacer.step():
+                    break
+                reclaimed = cache.remove(audio_hash)
+                stats["expired"] += 1
+                stats["bytes_reclaimed"] += reclaimed
+                files_total.inc(store="audio", action="expire")
+                bytes_reclaimed_total.inc(reclaimed, store="audio")
+
+        stats["temp_files"] = cache.sweep_temp_files()
+        stats["empty_shards"] = cache.prune_empty_shards()
+        if stats["temp_files"]:
+            files_total.inc(stats["temp_files"], store="audio", action="delete_temp")
+        cache.flush()
+
+    def run_once(self) -> Dict[str, Any]:
+        """
+        One retention pass (blocking)
+
+        Returns:
+            Report of what was removed, archived and reclaimed, or the reason it was skipped
+        """
+        if not self._running.acquire(blocking=False):
+            return {"skipped": "a retention pass is already running"}
+        lock_path = Path(settings.conversations_dir) / LOCK_FILENAME
+        try:
+            if not self._acquire_file_lock(lock_path):
+                return {"skipped": "another worker is running a retention pass"}
+            try:
+                started = time.perf_counter()
+                report: Dict[str, Any] = {
+                    "started_at": datetime.utcnow().isoformat(),
+                    "conversations": {"empty_deleted": 0, "archived": 0, "bytes_reclaimed": 0},
+                    "archive": {"bundles_compacted": 0, "bytes_reclaimed": 0},
+                    "audio": {"expired": 0, "temp_files": 0, "empty_shards": 0, "bytes_reclaimed": 0},
+                    "search_index": {"bytes_reclaimed": 0}
+                }
+                pacer = _Pacer(self._stop)
+
+                self._conversations(pacer, report)
+                self._audio(pacer, report)
+                if settings.search_enabled:
+                    reclaimed = get_search_index().compact()
+                    report["search_index"]["bytes_reclaimed"] = reclaimed
+                    bytes_reclaimed_total.inc(reclaimed, store="search_index")
+
+                report["budget_exhausted"] = pacer.remaining <= 0
+                report["duration_seconds"] = round(time.perf_counter() - started, 3)
+                report["bytes_reclaimed"] = sum(
+                    section.get("bytes_reclaimed", 0) for section in report.values() if isinstance(section, dict)
+                )
+            finally:
+                lock_path.unlink(missing_ok=True)
+
+            self._last_report = report
+            self._runs += 1
+            conversations, audio = report["conversations"], report["audio"]
+            logger.info(
+                f"Retention pass: {conversations['empty_deleted']} empty conversations deleted, "
+                f"{conversations['archived']} archived, {audio['expired']} audio files expired, "
+                f"{report['bytes_reclaimed']} bytes reclaimed in {report['duration_seconds']}s"
+            )
+            return report
+        finally:
+            self._running.release()
+
+    async def run_now(self) -> Dict[str, Any]:
+        """Run a pass on the retention thread and wait for its report"""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self.run_once)
+
+    async def run_scheduler(self, interval_seconds: int):
+        """Run a pass periodically until cancelled (an interrupted pass stops at its next step)"""
+        try:
+            while True:
+                await asyncio.sleep(interval_seconds)
+                try:
+                    await self.run_now()
+                except Exception as e:
+                    logger.error(f"Retention pass error: {str(e)}", exc_info=True)
+        except asyncio.CancelledError:
+            self._stop.set()
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": settings.retention_enabled,
+            "running": self._running.locked(),
+            "runs": self._runs,
+            "last_report": self._last_report,
+            "archive": get_conversation_archive().stats()
+        }
+
+
+retention = RetentionScheduler()
@@ -0,0 +1,288 @@
+"""
+Full-text search over conversation messages (SQLite FTS5 inverted index)
+"""
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from config import settings
+from services.intent_router import fold
+from services.metrics import registry
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Query words used (the last one also matches as a prefix)
+_MAX_QUERY_TERMS = 10
+# Shorter last words match whole words only (a one-letter prefix matches nearly everything)
+_MIN_PREFIX_CHARS = 2
+# Ranked rows fetched per requested hit, so one long conversation cannot fill the page
+_OVERFETCH = 5
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    conversation_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    timestamp TEXT,
+    content TEXT NOT NULL,
+    UNIQUE (conversation_id, position)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS message_terms USING fts5(body, prefix='2 3');
+CREATE TABLE IF NOT EXISTS conversations (
+    conversation_id TEXT PRIMARY KEY,
+    title TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+index_errors_total = registry.counter(
+    "search_index_errors_total",
+    "Search index updates that failed (the conversation file is still written)",
+    labels=("operation",)
+)
+
+
+def _fold_with_offsets(text: str) -> Tuple[str, List[int]]:
+    """Folded text and, per folded character, the index of the original character it came from"""
+    folded, origin = [], []
+    for index, char in enumerate(text):
+        for folded_char in fold(char):
+            folded.append(folded_char)
+            origin.append(index)
+    return "".join(folded), origin
+
+
+def make_snippet(content: str, terms: List[str], width: int) -> str:
+    """
+    Window of the original text around the first match, matches in **bold**
+
+    Args:
+        content: Original message text
+        terms: Folded query terms (the last one also matched as a prefix)
+        width: Approximate snippet length in characters
+    """
+    folded, origin = _fold_with_offsets(content)
+    alternatives = [re.escape(term) + r"\b" for term in terms[:-1]] + [re.escape(terms[-1]) + r"\w*"]
+    pattern = re.compile(r"\b(?:" + "|".join(alternatives) + ")")
+    spans = [
+        (origin[match.start()], origin[match.end() - 1] + 1)
+        for match in pattern.finditer(folded)
+    ]
+    if not spans:
+        return content[:width] + ("…" if len(content) > width else "")
+
+    start = max(0, spans[0][0] - width // 3)
+    end = min(len(content), start + width)
+    # Widen to word boundaries
+    while start > 0 and not content[start - 1].isspace():
+        start -= 1
+    while end < len(content) and not content[end].isspace():
+        end += 1
+
+    parts, cursor = [], start
+    for span_start, span_end in spans:
+        if span_start < cursor or span_end > end:
+            continue
+        parts.append(content[cursor:span_start])
+        parts.append(f"**{content[span_start:span_end]}**")
+        cursor = span_end
+    parts.append(content[cursor:end])
+    snippet = " ".join("".join(parts).split())
+    return ("…" if start > 0 else "") + snippet + ("…" if end < len(content) else "")
+
+
+class SearchIndex:
+    """
+    Inverted index of message content, folded for diacritic-insensitive matching
+
+    Messages are indexed as ConversationService writes them and dropped when
+    a conversation is deleted; ranking is BM25. An index file that was never
+    filled is built from the conversation files by `ensure_built()`.
+
+        hits = get_search_index().search("phu quoc", limit=20)
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def _insert(self, conversation_id: str, position: int, role: str, content: str, timestamp: Optional[str]):
+        cursor = self._db.execute(
+            "INSERT OR IGNORE INTO messages (conversation_id, position, role, timestamp, content) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (conversation_id, position, role, timestamp, content)
+        )
+        if cursor.rowcount:
+            self._db.execute(
+                "INSERT INTO message_terms (rowid, body) VALUES (?, ?)",
+                (cursor.lastrowid, fold(content))
+            )
+
+    def add_message(
+        self,
+        conversation_id: str,
+        position: int,
+        role: str,
+        content: str,
+        timestamp: Optional[str] = None
+    ):
+        """Index one message (already indexed positions are ignored)"""
+        with self._lock, self._db:
+            self._insert(conversation_id, position, role, content, timestamp)
+
+    def set_title(self, conversation_id: str, title: str):
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO conversations (conversation_id, title) VALUES (?, ?)",
+                (conversation_id, title)
+            )
+
+    def remove_conversation(self, conversation_id: str):
+        """Drop every message of a conversation"""
+        with self._lock, self._db:
+            self._db.execute(
+                "DELETE FROM message_terms WHERE rowid IN "
+                "(SELECT id FROM messages WHERE conversation_id = ?)",
+                (conversation_id,)
+            )
+            self._db.execute("DELETE FROM messages WHERE conversation_id = ?", (conversation_id,))
+            self._db.execute("DELETE FROM conversations WHERE conversation_id = ?", (conversation_id,))
+
+    def index_conversation(self, conversation_id: str, title: str, messages: List[Dict[str, Any]]):
+        """Index every message of a stored conversation"""
+        with self._lock, self._db:
+            for position, message in enumerate(messages):
+                self._insert(conversation_id, position, message["role"], message["content"], message.get("timestamp"))
+            self._db.execute(
+                "INSERT OR REPLACE INTO conversations (conversation_id, title) VALUES (?, ?)",
+                (conversation_id, title)
+            )
+
+    def ensure_built(self, conversations: Iterable[Tuple[str, str, List[Dict[str, Any]]]]) -> int:
+        """
+        Index existing conversations once, when the index is new
+
+        Messages written meanwhile are indexed by ConversationService as
+        usual; positions already present are skipped.
+
+        Args:
+            conversations: (conversation_id, title, messages) of every stored
+                conversation, consumed only if the index needs building
+
+        Returns:
+            Number of conversations indexed (0 if the index was already built)
+        """
+        with self._lock:
+            built = self._db.execute("SELECT value FROM meta WHERE key = 'built'").fetchone()
+        if built:
+            return 0
+
+        count = 0
+        for conversation_id, title, messages in conversations:
+            try:
+                self.index_conversation(conversation_id, title, messages)
+                count += 1
+            except Exception as e:
+                logger.error(f"Error indexing conversation {conversation_id}: {str(e)}")
+
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('built', '1')")
+        logger.info(f"Search index built from {count} conversations")
+        return count
+
+    def search(self, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Best-matching message per conversation, best first
+
+        Every query word must match (diacritics and case ignored); the last
+        word also matches as a prefix, for search-as-you-type. Only the
+        SEARCH_MAX_CANDIDATES most recent matching messages are ranked, which
+        bounds the cost of queries made of very common words.
+
+        Returns:
+            Hits with conversation_id, title, position, role, timestamp, snippet and score
+        """
+        terms = _WORD_RE.findall(fold(query))[:_MAX_QUERY_TERMS]
+        if not terms:
+            return []
+        expression = " ".join(f'"{term}"' for term in terms)
+        if len(terms[-1]) >= _MIN_PREFIX_CHARS:
+            expression += "*"
+
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT m.conversation_id, c.title, m.position, m.role, m.timestamp, m.content, ranked.rank "
+                "FROM (SELECT rowid, bm25(message_terms) AS rank FROM message_terms "
+                "      WHERE message_terms MATCH ? ORDER BY rowid DESC LIMIT ?) AS ranked "
+                "JOIN messages m ON m.id = ranked.rowid "
+                "LEFT JOIN conversations c ON c.conversation_id = m.conversation_id "
+                "ORDER BY ranked.rank LIMIT ?",
+                (expression, settings.search_max_candidates, limit * _OVERFETCH)
+            ).fetchall()
+
+        hits, seen = [], set()
+        for conversation_id, title, position, role, timestamp, content, rank in rows:
+            if conversation_id in seen:
+                continue
+            seen.add(conversation_id)
+            hits.append({
+                "conversation_id": conversation_id,
+                "title": title or "Untitled",
+                "position": position,
+                "role": role,
+                "timestamp": timestamp,
+                "snippet": make_snippet(content, terms, settings.search_snippet_chars),
+                "score": round(-rank, 4)
+            })
+            if len(hits) == limit:
+                break
+        return hits
+
+    def compact(self, pages: int = 200) -> int:
+        """
+        Merge index segments a bounded amount at a time and truncate the WAL
+
+        Returns:
+            Bytes reclaimed on disk
+        """
+        files = [self.path, self.path.with_name(self.path.name + "-wal")]
+        size_before = sum(path.stat().st_size for path in files if path.exists())
+        with self._lock, self._db:
+            self._db.execute("INSERT INTO message_terms (message_terms, rank) VALUES ('merge', ?)", (pages,))
+        with self._lock:
+            self._db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return max(0, size_before - sum(path.stat().st_size for path in files if path.exists()))
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            messages = self._db.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+            conversations = self._db.execute("SELECT COUNT(DISTINCT conversation_id) FROM messages").fetchone()[0]
+        return {"messages": messages, "conversations": conversations}
+
+
+_search_index: Optional[SearchIndex] = None
+_search_index_lock = threading.Lock()
+
+
+def get_search_index() -> SearchIndex:
+    """Process-wide search index (SEARCH_INDEX_FILE), created on first use"""
+    global _search_index
+    if _search_index is None:
+        with _search_index_lock:
+            if _search_index is None:
+                _search_index = SearchIndex(Path(settings.search_index_file))
+    return _search_index
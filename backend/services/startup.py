@@ -0,0 +1,198 @@
+"""
+Startup: background provider initialization, readiness state and cold-start timing
+"""
+import asyncio
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+from config import settings
+from services.metrics import registry
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Set when main.py imports this module, before the routers and services
+IMPORT_STARTED = time.perf_counter()
+
+cold_start = registry.gauge(
+    "app_cold_start_seconds",
+    "Seconds from app import to serving (import) and to all dependencies ready (ready)",
+    labels=("phase",)
+)
+
+
+class Readiness:
+    """
+    Status of each dependency initialized in the background
+
+    A component is `pending` until its check has run, then `ready` or
+    `failed` with the check's latency and error.
+    """
+
+    def __init__(self):
+        self._components: Dict[str, Dict[str, Any]] = {}
+
+    def register(self, name: str):
+        self._components.setdefault(name, {"status": "pending", "latency_ms": None, "error": None})
+
+    def check(self, name: str, probe: Callable[[], Any]) -> bool:
+        """
+        Run a (blocking) probe and record the outcome
+
+        The component fails if the probe raises or returns False.
+        """
+        started = time.perf_counter()
+        try:
+            ok = probe() is not False
+            error = None if ok else "unavailable"
+        except Exception as e:
+            ok, error = False, str(e)
+        return self._record(name, ok, error, started)
+
+    async def check_async(self, name: str, probe: Callable[[], Awaitable[Any]]) -> bool:
+        """Like check(), for a coroutine probe"""
+        started = time.perf_counter()
+        try:
+            ok = await probe() is not False
+            error = None if ok else "unavailable"
+        except Exception as e:
+            ok, error = False, str(e)
+        return self._record(name, ok, error, started)
+
+    def _record(self, name: str, ok: bool, error: Optional[str], started: float) -> bool:
+        latency_ms = (time.perf_counter() - started) * 1000
+        previous = self.status(name)
+        self._components[name] = {
+            "status": "ready" if ok else "failed",
+            "latency_ms": round(latency_ms, 1),
+            "error": error,
+            "checked_at": time.time()
+        }
+        if ok and previous != "ready":
+            logger.info(f"{name} ready in {latency_ms:.0f}ms")
+        elif not ok:
+            logger.error(f"{name} failed after {latency_ms:.0f}ms: {error}")
+        return ok
+
+    def status(self, name: str) -> Optional[str]:
+        component = self._components.get(name)
+        return component["status"] if component else None
+
+    @property
+    def ready(self) -> bool:
+        return bool(self._components) and all(
+            component["status"] == "ready" for component in self._components.values()
+        )
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {name: dict(component) for name, component in self._components.items()}
+
+
+readiness = Readiness()
+for _component in ("providers", "vector_store", "destinations", "external_links"):
+    readiness.register(_component)
+if settings.readiness_warmup_list:
+    readiness.register("warmup")
+
+
+def _load_providers():
+    # Heavy imports (langchain, openai, pinecone) happen here, off the request path
+    from services.llm_router import get_chat_router, get_embedding_router
+    import services.rag_service  # noqa: F401
+    get_chat_router()
+    get_embedding_router()
+
+
+def _verify_vector_store() -> bool:
+    from services.rag_service import verify_vector_store
+    return verify_vector_store()
+
+
+def _load_destinations():
+    from services.data_index import load_json
+    if not load_json(Path(settings.mock_data_dir) / "destinations.json"):
+        raise ValueError("no destinations")
+
+
+def _load_external_links():
+    from services.data_index import load_json
+    load_json(Path(settings.mock_data_dir) / "external_links.json")
+
+
+# Blocking checks run at startup and again every READINESS_CHECK_INTERVAL while failing
+# (the vector store is re-verified even while ready, so an outage takes the worker out)
+CHECKS: Dict[str, Callable[[], Any]] = {
+    "providers": _load_providers,
+    "destinations": _load_destinations,
+    "external_links": _load_external_links,
+    "vector_store": _verify_vector_store
+}
+RECHECK_WHEN_READY = ("vector_store",)
+
+
+async def _warm_up():
+    """Run the configured queries end to end to prime clients, pools and the tokenizer"""
+    from services.rag_service import RAGService
+    rag_service = RAGService()
+    for language, query in settings.readiness_warmup_list:
+        try:
+            await rag_service.generate_response(query, [], language=language)
+        except Exception as e:
+            # A failing warm-up query should not keep the worker out of rotation
+            logger.warning(f"Warm-up query failed: {str(e)}")
+
+
+def record_serving():
+    """Called when the app starts serving: import-to-serving time"""
+    seconds = time.perf_counter() - IMPORT_STARTED
+    cold_start.set(seconds, phase="import")
+    logger.info(f"Serving {seconds * 1000:.0f}ms after import")
+
+
+# Fire-and-forget startup tasks, referenced until done (the loop keeps only weak references)
+_background_tasks: Set[asyncio.Task] = set()
+
+
+def _task_done(name: str, task: asyncio.Task):
+    _background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Startup task {name} failed: {task.exception()}")
+
+
+def _run_in_background(coroutine: Awaitable[Any], name: str):
+    task = asyncio.ensure_future(coroutine)
+    _background_tasks.add(task)
+    task.add_done_callback(lambda done: _task_done(name, done))
+
+
+async def initialize():
+    """
+    Run the readiness checks in worker threads, warm up, then keep re-checking
+
+    Failed checks are retried every READINESS_CHECK_INTERVAL seconds; the
+    warm-up runs once, after every other component is ready.
+    """
+    from services.usage_service import load_tokenizer
+    # Not a readiness check: token counts are estimated until it loads
+    _run_in_background(asyncio.to_thread(load_tokenizer), "tokenizer load")
+
+    for name, probe in CHECKS.items():
+        await asyncio.to_thread(readiness.check, name, probe)
+
+    recorded = False
+    while True:
+        if readiness.status("warmup") == "pending" and all(
+            readiness.status(name) == "ready" for name in CHECKS
+        ):
+            await readiness.check_async("warmup", _warm_up)
+
+        if readiness.ready and not recorded:
+            recorded = True
+            seconds = time.perf_counter() - IMPORT_STARTED
+            cold_start.set(seconds, phase="ready")
+            logger.info(f"All dependencies ready {seconds * 1000:.0f}ms after import")
+
+        await asyncio.sleep(settings.readiness_check_interval)
+        for name, probe in CHECKS.items():
+            if name in RECHECK_WHEN_READY or readiness.status(name) != "ready":
+                await asyncio.to_thread(readiness.check, name, probe)
@@ -0,0 +1,184 @@
+"""
+Speculative TTS pre-rendering of assistant answers
+"""
+import asyncio
+import heapq
+import itertools
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from config import settings
+from services.tts_service import TTSService, active_syntheses
+from services.metrics import registry
+import logging
+
+logger = logging.getLogger(__name__)
+
+# How many completed pre-renders to remember when measuring usage
+_MAX_TRACKED_RENDERS = 10000
+
+
+class PrerenderQueue:
+    """
+    Bounded priority queue of answers to synthesize before anyone clicks play
+
+    The newest answer has the highest priority, since it is the one users
+    listen to. A new answer in a conversation cancels that conversation's
+    pending job. When the queue is full, superseded jobs and then the oldest
+    answer are dropped to make room, so chat never blocks. The worker waits
+    while interactive syntheses occupy the TTS pool, so pre-rendering only
+    uses idle capacity. All methods run on the event loop.
+    """
+
+    def __init__(self, max_size: int):
+        self._max_size = max_size
+        self._heap: List[Tuple[int, str, str, str]] = []  # (-sequence, conversation_id, text, language)
+        self._ready = asyncio.Event()
+        self._sequence = itertools.count()
+        self._pending: Dict[str, int] = {}  # conversation_id -> job sequence
+        self._rendered: "OrderedDict[str, None]" = OrderedDict()  # audio hashes awaiting first play
+        self._lock = threading.Lock()
+        self._tts = TTSService()
+
+        self._stats = {
+            "enqueued": 0,
+            "dropped": 0,
+            "cancelled": 0,
+            "completed": 0,
+            "skipped_cached": 0,
+            "failed": 0,
+            "used": 0
+        }
+
+    async def submit(self, conversation_id: str, text: str, language: str) -> bool:
+        """
+        Enqueue an answer for pre-rendering
+
+        Async so it runs on the event loop when scheduled as a background task.
+
+        Returns:
+            False when the queue was full and an older answer was dropped for it
+        """
+        sequence = next(self._sequence)
+
+        if conversation_id in self._pending:
+            self._stats["cancelled"] += 1
+        self._pending[conversation_id] = sequence
+
+        dropped = False
+        if len(self._heap) >= self._max_size:
+            dropped = self._make_room()
+
+        # Negative sequence: most recent answer first
+        heapq.heappush(self._heap, (-sequence, conversation_id, text, language))
+        self._ready.set()
+        self._stats["enqueued"] += 1
+        return not dropped
+
+    def _make_room(self) -> bool:
+        """Discard superseded jobs, or else the oldest one; True if a live job was dropped"""
+        live = [job for job in self._heap if self._pending.get(job[1]) == -job[0]]
+        if len(live) < len(self._heap):
+            self._heap = live
+            heapq.heapify(self._heap)
+            return False
+
+        oldest = max(self._heap)
+        self._heap.remove(oldest)
+        heapq.heapify(self._heap)
+        self._pending.pop(oldest[1], None)
+        self._stats["dropped"] += 1
+        logger.info(f"Pre-render queue full, dropped oldest answer for {oldest[1]}")
+        return True
+
+    def cancel(self, conversation_id: str):
+        """Cancel the pending job of a conversation (e.g. on delete)"""
+        if self._pending.pop(conversation_id, None) is not None:
+            self._stats["cancelled"] += 1
+
+    def record_request(self, audio_hash: str):
+        """Count a play request that was served by a pre-rendered file"""
+        with self._lock:
+            if audio_hash in self._rendered:
+                del self._rendered[audio_hash]
+                self._stats["used"] += 1
+
+    def _remember_render(self, audio_hash: str):
+        with self._lock:
+            self._rendered[audio_hash] = None
+            while len(self._rendered) > _MAX_TRACKED_RENDERS:
+                self._rendered.popitem(last=False)
+
+    async def _next_job(self) -> Optional[Tuple[str, str, str]]:
+        """Take the next job, skipping ones superseded or cancelled"""
+        while not self._heap:
+            self._ready.clear()
+            await self._ready.wait()
+        priority, conversation_id, text, language = heapq.heappop(self._heap)
+        if self._pending.get(conversation_id) != -priority:
+            return None
+        del self._pending[conversation_id]
+        return conversation_id, text, language
+
+    async def run_worker(self):
+        """Process jobs until cancelled"""
+        while True:
+            job = await self._next_job()
+            if job is None:
+                continue
+            conversation_id, text, language = job
+
+            # Yield to interactive requests while they keep the pool busy
+            while active_syntheses() >= settings.tts_max_workers:
+                await asyncio.sleep(settings.tts_prerender_backoff)
+
+            try:
+                audio_hash = self._tts.audio_id_for(text, language)
+                if self._tts.cache.path_for(audio_hash).exists():
+                    self._stats["skipped_cached"] += 1
+                    continue
+
+                await self._tts.generate_speech_async(text, language)
+                self._remember_render(audio_hash)
+                self._stats["completed"] += 1
+                logger.info(f"Pre-rendered answer audio for {conversation_id}: {audio_hash}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._stats["failed"] += 1
+                logger.error(f"Error pre-rendering answer audio: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue statistics, including how often a pre-render was played"""
+        completed = self._stats["completed"]
+        return {
+            **self._stats,
+            "queued": len(self._heap),
+            "usage_rate": self._stats["used"] / completed if completed else 0.0
+        }
+
+
+_prerender_queue: Optional[PrerenderQueue] = None
+
+
+def get_prerender_queue() -> PrerenderQueue:
+    """Get the process-wide pre-render queue (created on first use)"""
+    global _prerender_queue
+    if _prerender_queue is None:
+        _prerender_queue = PrerenderQueue(max_size=settings.tts_prerender_queue_size)
+    return _prerender_queue
+
+
+def _collect_prerender_stats():
+    """Gauge callback: pre-render queue statistics by outcome"""
+    if _prerender_queue is None:
+        return {}
+    return {(key,): float(value) for key, value in _prerender_queue.stats().items()}
+
+
+registry.gauge(
+    "tts_prerender_jobs",
+    "Speculative TTS pre-render queue statistics (enqueued, used, dropped, ...)",
+    labels=("stat",),
+    callback=_collect_prerender_stats
+)
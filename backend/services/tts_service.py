@@ -1,15 +1,67 @@
 """
 Text-to-Speech service using Google TTS (gTTS)
 """
-from gtts import gTTS
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, List, Tuple
+import asyncio
 import hashlib
+import os
 import re
+import tempfile
+import time
 from config import settings
+from services.audio_cache import get_audio_cache
+from services.markdown_stripper import strip_markdown
+from services.metrics import registry, timed
 import logging
 
 logger = logging.getLogger(__name__)
 
+# gTTS is blocking network I/O: run it on a bounded pool, off the event loop
+_synthesis_executor = ThreadPoolExecutor(
+    max_workers=settings.tts_max_workers,
+    thread_name_prefix="tts"
+)
+
+# Single-flight: one synthesis job per audio hash, shared by concurrent requests
+_inflight: Dict[str, asyncio.Future] = {}
+
+# Sentence ends (., !, ?, …) followed by whitespace, or line breaks
+_SENTENCE_BOUNDARY_RE = re.compile(r'(?<=[.!?…])\s+|\n+')
+
+# Time-to-first-audio for streamed synthesis
+_time_to_first_audio = registry.histogram(
+    "tts_time_to_first_audio_seconds",
+    "Time from a streaming TTS request to its first audio segment"
+)
+
+
+def _record_time_to_first_audio(seconds: float):
+    """Record how long a streamed request waited for its first segment"""
+    _time_to_first_audio.observe(seconds)
+    logger.info(f"Time to first audio: {seconds * 1000:.0f}ms")
+
+
+def _tts_class():
+    """gTTS, or its offline stand-in when PROVIDER_MODE=fake (imported on first synthesis)"""
+    if settings.use_fake_providers:
+        from services.fake_providers import FakeTTS
+        return FakeTTS
+    from gtts import gTTS
+    return gTTS
+
+
+def active_syntheses() -> int:
+    """Number of distinct syntheses currently queued or running on the pool"""
+    return len(_inflight)
+
+
+def time_to_first_audio_stats() -> Dict[str, float]:
+    """Count and recent percentiles (seconds) of time-to-first-audio"""
+    return _time_to_first_audio.snapshot()
+
 
 class TTSService:
     """Text-to-Speech service"""
@@ -17,7 +69,9 @@ class TTSService:
     def __init__(self):
         self.audio_dir = Path(settings.audio_dir)
         self.audio_dir.mkdir(parents=True, exist_ok=True)
+        self.cache = get_audio_cache()
     
+    @timed("tts_markdown")
     def _strip_markdown(self, text: str) -> str:
         """
         Remove markdown formatting from text for better TTS output
@@ -28,55 +82,68 @@ class TTSService:
         Returns:
             Plain text without markdown
         """
-        # Remove code blocks (``` ... ```)
-        text = re.sub(r'```[\s\S]*?```', '', text)
-        
-        # Remove inline code (`code`)
-        text = re.sub(r'`([^`]+)`', r'\1', text)
-        
-        # Remove images (![alt](url))
-        text = re.sub(r'!\[([^\]]*)\]\([^\)]+\)', r'\1', text)
-        
-        # Remove links but keep text ([text](url))
-        text = re.sub(r'\[([^\]]+)\]\([^\)]+\)', r'\1', text)
-        
-        # Remove bold (**text** or __text__)
-        text = re.sub(r'\*\*([^\*]+)\*\*', r'\1', text)
-        text = re.sub(r'__([^_]+)__', r'\1', text)
-        
-        # Remove italic (*text* or _text_)
-        text = re.sub(r'\*([^\*]+)\*', r'\1', text)
-        text = re.sub(r'_([^_]+)_', r'\1', text)
+        return strip_markdown(text)
+    
+    def _hash(self, clean_text: str, language: str) -> str:
+        """Cache key for clean text in a language"""
+        return hashlib.md5(f"{clean_text}_{language}".encode()).hexdigest()
+    
+    def _prepare(self, text: str, language: str) -> Tuple[str, str, Path]:
+        """
+        Clean text and derive its cache key
+
+        Returns:
+            Tuple of (clean_text, text_hash, audio_file)
+        """
+        # Strip markdown formatting from text
+        clean_text = self._strip_markdown(text)
         
-        # Remove strikethrough (~~text~~)
-        text = re.sub(r'~~([^~]+)~~', r'\1', text)
+        if not clean_text:
+            logger.warning("Text is empty after markdown stripping")
+            clean_text = "No content available"
         
-        # Remove headers (# ## ### etc)
-        text = re.sub(r'^#{1,6}\s+', '', text, flags=re.MULTILINE)
+        # Create filename based on text hash (for caching)
+        text_hash = self._hash(clean_text, language)
+        audio_file = self.cache.path_for(text_hash)
         
-        # Remove horizontal rules (--- or *** or ___)
-        text = re.sub(r'^[\-\*_]{3,}\s*$', '', text, flags=re.MULTILINE)
+        return clean_text, text_hash, audio_file
+    
+    def audio_id_for(self, text: str, language: str = "vi") -> str:
+        """Cache key (audio ID) that generate_speech would use for this text"""
+        _, text_hash, _ = self._prepare(text, language)
+        return text_hash
+    
+    @timed("tts_synthesize")
+    def _synthesize(self, clean_text: str, language: str, audio_file: Path):
+        """
+        Run gTTS and atomically publish the result
         
-        # Remove blockquotes (> text)
-        text = re.sub(r'^>\s+', '', text, flags=re.MULTILINE)
+        Audio is written to a temp file in the same directory and renamed
+        into place, so readers never observe a partially written MP3.
+        """
+        logger.info(f"Generating speech for text length: {len(clean_text)}")
         
-        # Remove list markers (- * + or 1. 2. etc)
-        text = re.sub(r'^[\-\*\+]\s+', '', text, flags=re.MULTILINE)
-        text = re.sub(r'^\d+\.\s+', '', text, flags=re.MULTILINE)
+        # Map language codes
+        lang_code = "vi" if language == "vi" else "en"
         
-        # Remove HTML tags (if any)
-        text = re.sub(r'<[^>]+>', '', text)
+        tts = _tts_class()(text=clean_text, lang=lang_code, slow=False)
         
-        # Clean up extra whitespace
-        text = re.sub(r'\n{3,}', '\n\n', text)  # Max 2 consecutive newlines
-        text = re.sub(r' {2,}', ' ', text)  # Remove multiple spaces
-        text = text.strip()
+        audio_file.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=audio_file.parent, suffix=".mp3.tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                tts.write_to_fp(f)
+            os.replace(tmp_path, audio_file)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
         
-        return text
+        self.cache.store(audio_file.stem, language)
+        logger.info(f"Speech generated successfully: {audio_file}")
     
     def generate_speech(self, text: str, language: str = "vi") -> str:
         """
-        Generate speech from text and return file path
+        Generate speech from text and return file path (blocking)
         
         Args:
             text: Text to convert to speech (may contain markdown)
@@ -86,35 +153,141 @@ class TTSService:
             Path to generated audio file
         """
         try:
-            # Strip markdown formatting from text
-            clean_text = self._strip_markdown(text)
-            
-            if not clean_text:
-                logger.warning("Text is empty after markdown stripping")
-                clean_text = "No content available"
-            
-            # Create filename based on text hash (for caching)
-            text_hash = hashlib.md5(f"{clean_text}_{language}".encode()).hexdigest()
-            audio_file = self.audio_dir / f"{text_hash}.mp3"
+            clean_text, text_hash, audio_file = self._prepare(text, language)
             
             # Return cached file if exists
-            if audio_file.exists():
+            if self.cache.lookup(text_hash):
                 logger.info(f"Using cached audio file: {audio_file}")
                 return str(audio_file)
             
-            # Generate speech
-            logger.info(f"Generating speech for text length: {len(clean_text)} (original: {len(text)})")
-            
-            # Map language codes
-            lang_code = "vi" if language == "vi" else "en"
-            
-            tts = gTTS(text=clean_text, lang=lang_code, slow=False)
-            tts.save(str(audio_file))
+            self._synthesize(clean_text, language, audio_file)
+            return str(audio_file)
             
-            logger.info(f"Speech generated successfully: {audio_file}")
+        except Exception as e:
+            logger.error(f"Error generating speech: {str(e)}", exc_info=True)
+            raise
+    
+    async def _ensure_audio(self, clean_text: str, language: str) -> Path:
+        """
+        Return the cached file for clean text, synthesizing it on the pool if needed
+        
+        Concurrent callers for the same text and language share one job.
+        """
+        text_hash = self._hash(clean_text, language)
+        audio_file = self.cache.path_for(text_hash)
+        
+        if self.cache.lookup(text_hash):
+            logger.info(f"Using cached audio file: {audio_file}")
+            return audio_file
+        
+        future = _inflight.get(text_hash)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(
+                _synthesis_executor, self._synthesize, clean_text, language, audio_file
+            )
+            _inflight[text_hash] = future
+            future.add_done_callback(lambda _: _inflight.pop(text_hash, None))
+        else:
+            logger.info(f"Joining in-flight synthesis: {text_hash}")
+        
+        # Shield so one client disconnecting does not cancel the shared job
+        await asyncio.shield(future)
+        return audio_file
+    
+    async def generate_speech_async(self, text: str, language: str = "vi") -> str:
+        """
+        Generate speech without blocking the event loop
+        
+        Synthesis runs on the TTS thread pool. Concurrent requests for the
+        same text and language wait on a single shared job.
+        
+        Args:
+            text: Text to convert to speech (may contain markdown)
+            language: Language code (vi or en)
+        
+        Returns:
+            Path to generated audio file
+        """
+        try:
+            clean_text, _, _ = self._prepare(text, language)
+            audio_file = await self._ensure_audio(clean_text, language)
             return str(audio_file)
             
         except Exception as e:
             logger.error(f"Error generating speech: {str(e)}", exc_info=True)
             raise
-
+    
+    def _split_sentences(self, clean_text: str) -> List[str]:
+        """
+        Split clean text into sentence-sized chunks for streaming synthesis
+        
+        Fragments shorter than `tts_stream_min_chunk_chars` are merged into the
+        following sentence so gTTS is not called for a lone "Ok." or bullet.
+        """
+        sentences = [part.strip() for part in _SENTENCE_BOUNDARY_RE.split(clean_text) if part.strip()]
+        
+        chunks = []
+        pending = ""
+        for sentence in sentences:
+            pending = f"{pending} {sentence}" if pending else sentence
+            if len(pending) >= settings.tts_stream_min_chunk_chars:
+                chunks.append(pending)
+                pending = ""
+        
+        if pending:
+            if chunks:
+                chunks[-1] = f"{chunks[-1]} {pending}"
+            else:
+                chunks.append(pending)
+        
+        return chunks
+    
+    async def stream_speech(self, text: str, language: str = "vi") -> AsyncIterator[bytes]:
+        """
+        Synthesize text sentence by sentence and yield MP3 segments in order
+        
+        Up to `tts_stream_prefetch` segments are synthesized ahead of the one
+        being sent, so a long answer cannot monopolize the shared pool. Each
+        segment is cached under its own hash and reused across answers.
+        
+        Args:
+            text: Text to convert to speech (may contain markdown)
+            language: Language code (vi or en)
+        
+        Yields:
+            MP3 bytes of each segment
+        """
+        started = time.perf_counter()
+        clean_text, _, _ = self._prepare(text, language)
+        chunks = self._split_sentences(clean_text)
+        logger.info(f"Streaming speech in {len(chunks)} segments (text length: {len(clean_text)})")
+        
+        pending: Deque[Tuple[str, asyncio.Task]] = deque()
+        next_chunk = 0
+        first_audio = True
+        
+        try:
+            while next_chunk < len(chunks) or pending:
+                while next_chunk < len(chunks) and len(pending) < settings.tts_stream_prefetch:
+                    chunk = chunks[next_chunk]
+                    pending.append((chunk, asyncio.ensure_future(self._ensure_audio(chunk, language))))
+                    next_chunk += 1
+                
+                chunk, task = pending.popleft()
+                segment_file = await task
+                try:
+                    data = await asyncio.to_thread(segment_file.read_bytes)
+                except FileNotFoundError:
+                    # Evicted or expired since it was ready: synthesize it again
+                    segment_file = await self._ensure_audio(chunk, language)
+                    data = await asyncio.to_thread(segment_file.read_bytes)
+                
+                if first_audio:
+                    first_audio = False
+                    _record_time_to_first_audio(time.perf_counter() - started)
+                
+                yield data
+        finally:
+            for _, task in pending:
+                task.cancel()
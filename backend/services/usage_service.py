@@ -0,0 +1,221 @@
+"""
+Token usage and cost accounting for LLM and embedding calls
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Any, Deque, Dict, Optional
+from config import settings
+from services.metrics import registry
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Conversations kept in memory for per-conversation totals (least recent dropped)
+_MAX_TRACKED_CONVERSATIONS = 10000
+
+tokens_total = registry.counter(
+    "llm_tokens_total",
+    "Tokens consumed by stage, kind (prompt/completion) and language",
+    labels=("stage", "kind", "language")
+)
+cost_total = registry.counter(
+    "llm_cost_usd_total",
+    "Estimated spend in USD by stage and language",
+    labels=("stage", "language")
+)
+budget_alerts_total = registry.counter(
+    "llm_budget_alerts_total",
+    "Budget threshold crossings by scope (conversation/day)",
+    labels=("scope",)
+)
+
+_encoding = None
+
+
+def load_tokenizer():
+    """
+    Load the tiktoken encoding (blocking; may download it on first use)
+
+    Run once at startup in a worker thread; until it finishes, or if it
+    fails (e.g. offline), count_tokens estimates from length.
+    """
+    global _encoding
+    try:
+        import tiktoken
+        _encoding = tiktoken.get_encoding("cl100k_base")
+        logger.info("tiktoken encoding loaded")
+    except Exception as e:
+        logger.warning(f"tiktoken unavailable, estimating tokens from length: {str(e)}")
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count tokens with tiktoken (cl100k_base), used for embedding calls whose
+    responses carry no usage. Falls back to ~4 characters per token while the
+    encoding is not loaded (see load_tokenizer).
+    """
+    encoding = _encoding
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return max(1, len(text) // 4)
+
+
+def usage_from_message(message: Any) -> Dict[str, int]:
+    """Extract prompt/completion token counts from a LangChain chat response"""
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        return {
+            "prompt_tokens": int(usage.get("input_tokens", 0)),
+            "completion_tokens": int(usage.get("output_tokens", 0))
+        }
+
+    token_usage = (getattr(message, "response_metadata", None) or {}).get("token_usage") or {}
+    return {
+        "prompt_tokens": int(token_usage.get("prompt_tokens", 0)),
+        "completion_tokens": int(token_usage.get("completion_tokens", 0))
+    }
+
+
+def _empty_totals() -> Dict[str, float]:
+    return {"prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0, "calls": 0}
+
+
+def _add(totals: Dict[str, float], prompt_tokens: int, completion_tokens: int, cost: float):
+    totals["prompt_tokens"] += prompt_tokens
+    totals["completion_tokens"] += completion_tokens
+    totals["cost_usd"] += cost
+    totals["calls"] += 1
+
+
+class UsageTracker:
+    """
+    Aggregates token usage in memory by stage, language, conversation and day
+
+    Prices come from settings (USD per 1K tokens). When a conversation or the
+    current UTC day crosses its budget, a warning is logged once, the alert is
+    kept for the admin endpoint and `llm_budget_alerts_total` is incremented.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = _empty_totals()
+        self._by_stage: Dict[str, Dict[str, float]] = {}
+        self._by_language: Dict[str, Dict[str, float]] = {}
+        self._by_day: Dict[str, Dict[str, float]] = {}
+        self._by_conversation: "OrderedDict[str, Dict[str, float]]" = OrderedDict()
+        self._alerted: set = set()
+        self._alerts: Deque[Dict[str, Any]] = deque(maxlen=100)
+
+    def _cost(self, stage: str, prompt_tokens: int, completion_tokens: int) -> float:
+        if stage == "embedding":
+            return prompt_tokens / 1000 * settings.embedding_price_per_1k
+        return (
+            prompt_tokens / 1000 * settings.llm_prompt_price_per_1k
+            + completion_tokens / 1000 * settings.llm_completion_price_per_1k
+        )
+
+    def record(
+        self,
+        stage: str,
+        prompt_tokens: int,
+        completion_tokens: int = 0,
+        conversation_id: Optional[str] = None,
+        language: str = "unknown"
+    ):
+        """
+        Record one LLM or embedding call
+
+        Args:
+            stage: Call site (llm_answer, llm_follow_ups, embedding, ...)
+            prompt_tokens: Input tokens
+            completion_tokens: Output tokens (0 for embeddings)
+            conversation_id: Conversation the call belongs to, if any
+            language: Conversation language
+        """
+        cost = self._cost(stage, prompt_tokens, completion_tokens)
+        day = datetime.utcnow().date().isoformat()
+
+        tokens_total.inc(prompt_tokens, stage=stage, kind="prompt", language=language)
+        if completion_tokens:
+            tokens_total.inc(completion_tokens, stage=stage, kind="completion", language=language)
+        cost_total.inc(cost, stage=stage, language=language)
+
+        with self._lock:
+            _add(self._totals, prompt_tokens, completion_tokens, cost)
+            _add(self._by_stage.setdefault(stage, _empty_totals()), prompt_tokens, completion_tokens, cost)
+            _add(self._by_language.setdefault(language, _empty_totals()), prompt_tokens, completion_tokens, cost)
+
+            day_totals = self._by_day.setdefault(day, _empty_totals())
+            _add(day_totals, prompt_tokens, completion_tokens, cost)
+            day_cost = day_totals["cost_usd"]
+
+            conversation_cost = None
+            if conversation_id:
+                conversation_totals = self._by_conversation.pop(conversation_id, None) or _empty_totals()
+                _add(conversation_totals, prompt_tokens, completion_tokens, cost)
+                self._by_conversation[conversation_id] = conversation_totals
+                while len(self._by_conversation) > _MAX_TRACKED_CONVERSATIONS:
+                    self._by_conversation.popitem(last=False)
+                conversation_cost = conversation_totals["cost_usd"]
+
+        if settings.daily_budget_usd and day_cost > settings.daily_budget_usd:
+            self._alert("day", day, day_cost, settings.daily_budget_usd)
+        if (
+            conversation_cost is not None
+            and settings.conversation_budget_usd
+            and conversation_cost > settings.conversation_budget_usd
+        ):
+            self._alert("conversation", conversation_id, conversation_cost, settings.conversation_budget_usd)
+
+    def _alert(self, scope: str, key: str, spent: float, budget: float):
+        """Raise a budget alert once per conversation / day"""
+        with self._lock:
+            if (scope, key) in self._alerted:
+                return
+            self._alerted.add((scope, key))
+            self._alerts.append({
+                "scope": scope,
+                "key": key,
+                "spent_usd": spent,
+                "budget_usd": budget,
+                "at": time.time()
+            })
+
+        budget_alerts_total.inc(scope=scope)
+        logger.warning(f"Budget exceeded for {scope} {key}: ${spent:.6f} > ${budget:.6f}")
+
+    def conversation_usage(self, conversation_id: str) -> Optional[Dict[str, float]]:
+        """Totals for one conversation (None if unknown)"""
+        with self._lock:
+            totals = self._by_conversation.get(conversation_id)
+            return dict(totals) if totals else None
+
+    def summary(self, top_conversations: int = 10) -> Dict[str, Any]:
+        """Aggregated usage for the admin endpoint"""
+        with self._lock:
+            top = sorted(
+                self._by_conversation.items(),
+                key=lambda item: item[1]["cost_usd"],
+                reverse=True
+            )[:top_conversations]
+            return {
+                "totals": dict(self._totals),
+                "by_stage": {key: dict(value) for key, value in self._by_stage.items()},
+                "by_language": {key: dict(value) for key, value in self._by_language.items()},
+                "by_day": {key: dict(value) for key, value in self._by_day.items()},
+                "top_conversations": [
+                    {"conversation_id": conversation_id, **totals}
+                    for conversation_id, totals in top
+                ],
+                "budgets": {
+                    "daily_usd": settings.daily_budget_usd,
+                    "conversation_usd": settings.conversation_budget_usd
+                },
+                "alerts": list(self._alerts)
+            }
+
+
+# Global usage tracker
+usage_tracker = UsageTracker()